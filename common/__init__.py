@@ -0,0 +1,11 @@
+"""YouTube版とKindle版の両アプリで共有するモジュール。
+
+- gemini_client: Geminiクライアントと共有イベントループ
+- llm_cache: LLMの応答のディスクキャッシュ
+- telemetry: LLM呼び出しの計測と集計
+- resilience: リトライ・同時実行数の自動調整・サーキットブレーカー
+
+各アプリは`common_setup`を読み込んでリポジトリ直下を`sys.path`に加えてから、
+`from common.gemini_client import get_client`のように読み込む。
+LLMキャッシュ・呼び出しログなどのデータは`common_setup`が環境変数で各アプリのディレクトリに向ける。
+"""
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any, Coroutine, TypeVar
+
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
+
+T = TypeVar("T")
+
+
+class GeminiClientManager:
+    """プロセス全体で共有するGeminiクライアントを管理する。
+
+    `genai.Client`の生成（認証情報の探索・HTTPクライアント構築）とTLSハンドシェイクは
+    1回だけ行い、以降はコネクションプール上の確立済み接続を使い回す。
+    httpxのクライアントはスレッドセーフなので、QThreadPoolのワーカーから同時に使ってよい。
+    google-genaiの読み込みは重いので、最初にクライアントが必要になるまで遅らせる。
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        max_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._client: genai.Client | None = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._connections_opened = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    # ---- httpxトレース --------------------------------------------
+    def _trace(self, event_name: str, info: dict[str, Any]) -> None:
+        # 新規TCP接続が張られたときだけ呼ばれるイベント。来なければ既存接続の再利用。
+        if event_name == "connection.connect_tcp.complete":
+            with self._stats_lock:
+                self._connections_opened += 1
+
+    async def _atrace(self, event_name: str, info: dict[str, Any]) -> None:
+        self._trace(event_name, info)
+
+    def _on_request(self, request: Any) -> None:
+        with self._stats_lock:
+            self._requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _on_arequest(self, request: Any) -> None:
+        with self._stats_lock:
+            self._requests += 1
+        request.extensions["trace"] = self._atrace
+
+    def _http_options(self) -> types.HttpOptions:
+        import httpx
+        from google.genai import types
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        return types.HttpOptions(
+            base_url=self.base_url,
+            client_args={"limits": limits, "event_hooks": {"request": [self._on_request]}},
+            async_client_args={
+                "limits": limits,
+                "event_hooks": {"request": [self._on_arequest]},
+            },
+        )
+
+    # ---- public API -------------------------------------------------
+    @property
+    def client(self) -> genai.Client:
+        """共有クライアントを返す（初回呼び出し時にだけ生成する）。"""
+
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+
+                    self._client = genai.Client(
+                        api_key=self.api_key, http_options=self._http_options()
+                    )
+        return self._client
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        # 非同期クライアントの接続はイベントループに紐づくため、
+        # asyncio.runを毎回呼ぶのではなく常駐ループを1本だけ持って使い回す。
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(
+                        target=loop.run_forever, name="gemini-async-loop", daemon=True
+                    )
+                    thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def run_coroutine(self, coro: Coroutine[Any, Any, T]) -> T:
+        """共有イベントループ上でコルーチンを実行し、完了まで待つ。
+
+        Args:
+            coro (Coroutine): `client.aio`を使うコルーチン。
+
+        Returns:
+            T: コルーチンの戻り値。
+        """
+
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def stats(self) -> dict[str, int]:
+        """リクエスト数と接続の新規作成・再利用回数を返す。
+
+        Returns:
+            dict[str, int]: `requests`・`connections_opened`・`connections_reused`。
+        """
+
+        with self._stats_lock:
+            requests = self._requests
+            opened = self._connections_opened
+        return {
+            "requests": requests,
+            "connections_opened": opened,
+            "connections_reused": max(requests - opened, 0),
+        }
+
+    def reset(self) -> None:
+        """クライアントを破棄する。次回アクセス時に作り直される。"""
+
+        with self._lock:
+            self._client = None
+        with self._stats_lock:
+            self._requests = 0
+            self._connections_opened = 0
+
+
+_default_manager: GeminiClientManager | None = None
+_default_lock = threading.Lock()
+
+
+def get_client_manager() -> GeminiClientManager:
+    """プロセス共通のGeminiClientManagerを返す。"""
+
+    global _default_manager
+    if _default_manager is None:
+        with _default_lock:
+            if _default_manager is None:
+                _default_manager = GeminiClientManager()
+    return _default_manager
+
+
+def configure_client(**kwargs: Any) -> GeminiClientManager:
+    """共通マネージャーを設定し直す（スタブエンドポイントでの検証用）。
+
+    Args:
+        **kwargs: `GeminiClientManager`のコンストラクタ引数。
+
+    Returns:
+        GeminiClientManager: 新しく設定されたマネージャー。
+    """
+
+    global _default_manager
+    with _default_lock:
+        _default_manager = GeminiClientManager(**kwargs)
+    return _default_manager
+
+
+def get_client() -> genai.Client:
+    """共有のgenai.Clientを返すショートカット。"""
+
+    return get_client_manager().client
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / ".llm_cache"
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+
+
+def make_key(model: str, contents: str, params: dict[str, Any] | None = None) -> str:
+    """モデル名・プロンプト・生成パラメータからキャッシュキーを作る。
+
+    Args:
+        model (str): 使用するモデル名。
+        contents (str): LLMに渡すプロンプト全文。
+        params (dict[str, Any] | None): 生成パラメータ（温度など）。
+
+    Returns:
+        str: SHA-256の16進文字列。
+    """
+
+    payload = json.dumps(
+        {"model": model, "contents": contents, "params": params or {}},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """コンテンツアドレス方式でLLMの応答をディスクに保存するキャッシュ。
+
+    1エントリ＝1ファイル（`<dir>/<key先頭2文字>/<key>.json`）。
+    最終アクセス時刻はファイルのmtimeで表し、合計サイズが上限を超えたら
+    アクセスの古い順（LRU）に削除する。TTLを過ぎたエントリはミス扱いで削除する。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_seconds: float | None = DEFAULT_TTL_SECONDS,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, int] | None = None
+        self._total_bytes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load_index(self) -> OrderedDict[str, int]:
+        # 初回だけディレクトリを走査し、mtime順（古い→新しい）にLRU順序を復元する
+        if self._index is None:
+            entries: list[tuple[float, str, int]] = []
+            if self.cache_dir.is_dir():
+                for p in self.cache_dir.glob("*/*.json"):
+                    try:
+                        st = p.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, p.stem, st.st_size))
+            entries.sort()
+            self._index = OrderedDict((key, size) for _, key, size in entries)
+            self._total_bytes = sum(size for _, _, size in entries)
+        return self._index
+
+    def _discard(self, key: str) -> None:
+        index = self._load_index()
+        size = index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def get(self, key: str) -> str | None:
+        """キーに対応する応答を返す。存在しない・期限切れならNone。"""
+
+        with self._lock:
+            index = self._load_index()
+            path = self._path(key)
+            if key not in index:
+                self.misses += 1
+                return None
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                self._discard(key)
+                self.misses += 1
+                return None
+            if self.ttl_seconds is not None and time.time() - entry["created"] > self.ttl_seconds:
+                self._discard(key)
+                self.misses += 1
+                return None
+            # ヒットしたらLRUの末尾（最新）へ移動し、mtimeも更新して次回起動時に順序を復元できるようにする
+            index.move_to_end(key)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self.hits += 1
+            return entry["text"]
+
+    def put(self, key: str, text: str) -> None:
+        """応答を保存し、必要ならLRU順に古いエントリを追い出す。"""
+
+        data = json.dumps({"created": time.time(), "text": text}, ensure_ascii=False)
+        encoded = data.encode("utf-8")
+        with self._lock:
+            index = self._load_index()
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(encoded)
+            os.replace(tmp, path)
+            old = index.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old
+            index[key] = len(encoded)
+            self._total_bytes += len(encoded)
+            while self._total_bytes > self.max_bytes and len(index) > 1:
+                oldest = next(iter(index))
+                self._discard(oldest)
+
+    def clear(self) -> None:
+        """全エントリを削除する。"""
+
+        with self._lock:
+            for key in list(self._load_index()):
+                self._discard(key)
+
+    def stats(self) -> dict[str, int]:
+        """ヒット数・ミス数・エントリ数・合計バイト数を返す。"""
+
+        with self._lock:
+            index = self._load_index()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(index),
+                "bytes": self._total_bytes,
+            }
+
+
+_default_cache: LLMCache | None = None
+_default_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """プロセス共通のLLMCacheを返す。
+
+    保存先・上限サイズ・TTLは環境変数`LLM_CACHE_DIR`・`LLM_CACHE_MAX_MB`・`LLM_CACHE_TTL_DAYS`で
+    変更できる。`LLM_CACHE_TTL_DAYS=0`で期限なしになる。
+    """
+
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                max_mb = float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024))
+                ttl_days = float(os.getenv("LLM_CACHE_TTL_DAYS", DEFAULT_TTL_SECONDS / 86400))
+                _default_cache = LLMCache(
+                    cache_dir=Path(os.getenv("LLM_CACHE_DIR", DEFAULT_CACHE_DIR)),
+                    max_bytes=int(max_mb * 1024 * 1024),
+                    ttl_seconds=ttl_days * 86400 if ttl_days > 0 else None,
+                )
+    return _default_cache
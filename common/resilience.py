@@ -0,0 +1,534 @@
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Generic, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# 429（レート制限）と503（過負荷）は「送りすぎ」の合図として同時実行数を絞る
+THROTTLE_STATUSES = frozenset({429, 503})
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+@dataclass
+class Failure:
+    """失敗した呼び出しの分類結果。"""
+
+    retryable: bool
+    throttled: bool
+    retry_after: float | None = None
+    status: int | None = None
+
+
+def parse_retry_after(value: Any) -> float | None:
+    """Retry-Afterヘッダの値（秒数またはHTTP日付）を待ち秒数にする。解釈できなければNone。"""
+
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def _status_code(exc: BaseException) -> int | None:
+    # genaiのAPIError・urllibのHTTPErrorは`code`、requests/httpxは`response.status_code`
+    for obj in (exc, getattr(exc, "response", None)):
+        for name in ("code", "status_code"):
+            value = getattr(obj, name, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    for obj in (exc, getattr(exc, "response", None)):
+        headers = getattr(obj, "headers", None)
+        if headers is not None and hasattr(headers, "get"):
+            delay = parse_retry_after(headers.get("Retry-After"))
+            if delay is not None:
+                return delay
+    # Geminiは429の本文にgoogle.rpc.RetryInfo（"retryDelay": "17s"）で待ち時間を入れてくる
+    details = getattr(exc, "details", None)
+    if isinstance(details, dict):
+        details = (details.get("error") or details).get("details")
+    for item in details if isinstance(details, list) else []:
+        if isinstance(item, dict) and str(item.get("@type", "")).endswith("RetryInfo"):
+            try:
+                return max(float(str(item.get("retryDelay", "")).rstrip("s")), 0.0)
+            except ValueError:
+                return None
+    return None
+
+
+def _is_transport_error(exc: BaseException) -> bool:
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if isinstance(getattr(exc, "reason", None), (ConnectionError, TimeoutError)):
+        return True  # urllibのURLError
+    # httpx・requestsの接続/タイムアウト例外（依存を増やさないようクラス名で判定する）
+    if type(exc).__module__.split(".")[0] not in ("httpx", "httpcore", "requests", "urllib3"):
+        return False
+    names = {"TransportError", "TimeoutException", "ConnectionError", "Timeout"}
+    return any(cls.__name__ in names for cls in type(exc).__mro__)
+
+
+def classify(exc: BaseException) -> Failure:
+    """例外がリトライしてよい一時的な失敗か、スロットリングかを判定する。
+
+    Args:
+        exc (BaseException): 呼び出しで送出された例外。
+
+    Returns:
+        Failure: リトライ可否・スロットリングか・サーバーが指定した待ち秒数・HTTPステータス。
+    """
+
+    status = _status_code(exc)
+    if status is None:
+        return Failure(retryable=_is_transport_error(exc), throttled=False)
+    return Failure(status in RETRYABLE_STATUSES, status in THROTTLE_STATUSES, _retry_after(exc), status)
+
+
+@dataclass
+class RetryPolicy:
+    """指数バックオフ（Full Jitter）のリトライ方針。"""
+
+    max_attempts: int = 6
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    max_retry_after: float = 600.0
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """`attempt`回目（1始まり）の失敗のあと、次に送るまで待つ秒数。
+
+        サーバーがRetry-Afterを指定していればそれより早くは送らない。指定時刻に全員が
+        一斉に送り直さないよう、どちらの場合もランダムにずらす。
+        """
+
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is None:
+            return backoff
+        return min(retry_after, self.max_retry_after) + random.uniform(0, self.base_delay)
+
+
+class AdaptiveLimiter:
+    """AIMD（加算増加・乗算減少）で同時実行数の上限を調整するリミッター。
+
+    成功するたびに上限を`increase / 上限`ずつ（上限の件数だけ成功するとおよそ+1）増やし、
+    スロットリングを受けたら`decrease`倍に減らす。同時に送っていた呼び出しがまとめて
+    429を受けても1回分しか減らさないよう、前回減らした後に始まった呼び出しの失敗だけを数える。
+    スレッドからは`acquire`、イベントループからは`acquire_async`で使い、どちらも同じ上限を共有する。
+    待っている呼び出しには到着順にスロットを渡す。
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiters: deque[Callable[[], None]] = deque()
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _try_acquire(self) -> bool:
+        if not self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            return True
+        return False
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            self._waiters.popleft()()
+
+    def acquire(self) -> float:
+        """スロットが空くまで待って確保する。
+
+        Returns:
+            float: 確保した時刻（`time.monotonic()`）。`on_throttle`に渡す。
+        """
+
+        with self._lock:
+            if self._try_acquire():
+                return time.monotonic()
+            granted = threading.Event()
+            self._waiters.append(granted.set)
+        granted.wait()
+        return time.monotonic()
+
+    async def acquire_async(self) -> float:
+        """`acquire`のコルーチン版。待っている間もイベントループを止めない。"""
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return time.monotonic()
+            future: asyncio.Future[None] = loop.create_future()
+
+            def resolve() -> None:
+                if future.cancelled():
+                    self.release()
+                else:
+                    future.set_result(None)
+
+            def grant() -> None:
+                loop.call_soon_threadsafe(resolve)
+
+            self._waiters.append(grant)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(grant)
+                except ValueError:
+                    pass
+            if future.done() and not future.cancelled():
+                self.release()  # スロットを渡された直後に取り消された
+            raise
+        return time.monotonic()
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._wake()
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._limit = min(float(self.max_limit), self._limit + self.increase / self._limit)
+            self._wake()
+
+    def on_throttle(self, started: float) -> bool:
+        """スロットリングを受けたので上限を減らす。
+
+        Args:
+            started (float): その呼び出しがスロットを確保した時刻。
+
+        Returns:
+            bool: 上限を減らしたらTrue（前回減らす前に始まった呼び出しならFalse）。
+        """
+
+        with self._lock:
+            if started < self._last_decrease:
+                return False
+            self._limit = max(float(self.min_limit), self._limit * self.decrease)
+            self._last_decrease = time.monotonic()
+            return True
+
+
+class CircuitBreaker:
+    """一時的な失敗が続いたら回路を開き、しばらくすべての呼び出しを止めるブレーカー。
+
+    開いている間の呼び出しは失敗させずに待たせるので、キューに積まれた仕事は一時停止する。
+    待ち時間が明けたら1件だけ試しに通し（半開）、成功すれば閉じて再開する。
+    試しの呼び出しも失敗したら待ち時間を倍にして開き直す。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        max_reset_timeout: float = 300.0,
+        probe_interval: float = 0.2,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probe_interval = probe_interval
+        self.state = self.CLOSED
+        self.opened = 0
+        self._failures = 0
+        self._timeout = reset_timeout
+        self._open_until = 0.0
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> float:
+        """呼び出す前に待つべき秒数を返す。0なら今すぐ呼んでよい（半開の試しの1件を含む）。"""
+
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0.0
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now < self._open_until:
+                    return self._open_until - now
+                self.state = self.HALF_OPEN
+                self._probe_started = now
+                return 0.0
+            # 半開: 試しの呼び出しの結果を待つ。結果が返らないまま時間が経ったら次の1件を試す
+            if now - self._probe_started >= self._timeout:
+                self._probe_started = now
+                return 0.0
+            return self.probe_interval
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                print("サーキットブレーカー: 応答が戻ったので再開します")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._timeout = self.reset_timeout
+
+    def record_failure(self, retry_after: float | None = None) -> bool:
+        """一時的な失敗を記録する。
+
+        Args:
+            retry_after (float | None): サーバーが指定した待ち秒数。開くときの待ち時間の下限にする。
+
+        Returns:
+            bool: この失敗で回路を開いたらTrue。
+        """
+
+        with self._lock:
+            self._failures += 1
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if retry_after is not None:
+                    self._open_until = max(self._open_until, now + retry_after)
+                return False
+            if self.state == self.HALF_OPEN:
+                self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+            elif self._failures < self.failure_threshold:
+                return False
+            wait = max(self._timeout, retry_after or 0.0)
+            self.state = self.OPEN
+            self._open_until = now + wait
+            self.opened += 1
+            print(f"サーキットブレーカー: 失敗が{self._failures}回続いたため{wait:.1f}秒停止します")
+            return True
+
+
+class Resilience:
+    """リトライ・AIMDリミッター・サーキットブレーカーをまとめた、外部API呼び出しの共通の入口。
+
+    一時的な失敗（429・5xx・接続エラー）はバックオフして送り直し、それ以外の例外はそのまま送出する。
+    ブレーカーが開いている間の待ち時間はリトライ回数に数えない。
+    """
+
+    def __init__(
+        self,
+        policy: RetryPolicy | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        breaker: CircuitBreaker | None = None,
+        name: str = "gemini",
+        verbose: bool = True,
+    ):
+        self.policy = policy or RetryPolicy()
+        self.limiter = limiter or AdaptiveLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.name = name
+        self.verbose = verbose
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._retries = 0
+        self._throttled = 0
+        self._gave_up = 0
+
+    # ---- 成否の記録 -------------------------------------------------
+    def _after_success(self) -> None:
+        self.limiter.on_success()
+        self.breaker.record_success()
+        with self._stats_lock:
+            self._calls += 1
+
+    def _after_failure(self, exc: Exception, attempt: int, started: float) -> float | None:
+        # リトライするなら待ち秒数、しないならNoneを返す
+        failure = classify(exc)
+        if not failure.retryable:
+            if failure.status is not None:
+                self.breaker.record_success()  # 応答は返っている（リクエスト側の誤り）
+            with self._stats_lock:
+                self._calls += 1
+            return None
+        if failure.throttled:
+            self.limiter.on_throttle(started)
+        self.breaker.record_failure(failure.retry_after)
+        with self._stats_lock:
+            self._throttled += failure.throttled
+            if attempt >= self.policy.max_attempts:
+                self._calls += 1
+                self._gave_up += 1
+                return None
+            self._retries += 1
+        delay = self.policy.delay(attempt, failure.retry_after)
+        if self.verbose:
+            reason = failure.status or type(exc).__name__
+            print(f"{self.name} {reason}: {delay:.1f}秒後に再試行します ({attempt}/{self.policy.max_attempts - 1})")
+        return delay
+
+    # ---- 呼び出し ---------------------------------------------------
+    def call(self, fn: Callable[[], T]) -> tuple[T, int]:
+        """`fn`を呼び、一時的な失敗ならバックオフして呼び直す。
+
+        Args:
+            fn (Callable[[], T]): 1回分のリクエストを送る関数。
+
+        Returns:
+            tuple[T, int]: `fn`の戻り値と、成功までに行ったリトライ回数。
+
+        Raises:
+            Exception: リトライできない例外、または`max_attempts`回目の失敗の例外。
+        """
+
+        attempt = 0
+        while True:
+            while (wait := self.breaker.wait_time()) > 0:
+                time.sleep(wait)
+            attempt += 1
+            started = self.limiter.acquire()
+            try:
+                result = fn()
+            except Exception as exc:
+                delay = self._after_failure(exc, attempt, started)
+                if delay is None:
+                    raise
+            else:
+                self._after_success()
+                return result, attempt - 1
+            finally:
+                self.limiter.release()
+            time.sleep(delay)
+
+    async def acall(self, fn: Callable[[], Awaitable[T]]) -> tuple[T, int]:
+        """`call`のコルーチン版。`fn`はコルーチンを返す関数。"""
+
+        attempt = 0
+        while True:
+            while (wait := self.breaker.wait_time()) > 0:
+                await asyncio.sleep(wait)
+            attempt += 1
+            started = await self.limiter.acquire_async()
+            try:
+                result = await fn()
+            except Exception as exc:
+                delay = self._after_failure(exc, attempt, started)
+                if delay is None:
+                    raise
+            else:
+                self._after_success()
+                return result, attempt - 1
+            finally:
+                self.limiter.release()
+            await asyncio.sleep(delay)
+
+    def stream(self, fn: Callable[[], Iterable[T]]) -> "ResilientStream[T]":
+        """ストリーミング呼び出し版。最初の要素を受け取る前の失敗だけをリトライする。
+
+        途中まで受け取った後に送り直すと出力が重複するので、その場合は例外をそのまま送出する。
+        スロットはストリームを読み終えるまで確保したままにする。
+        """
+
+        return ResilientStream(self, fn)
+
+    def stats(self) -> dict[str, Any]:
+        """呼び出し数・リトライ数・スロットリング回数・諦めた回数と、現在の上限・ブレーカーの状態を返す。"""
+
+        with self._stats_lock:
+            return {
+                "calls": self._calls,
+                "retries": self._retries,
+                "throttled": self._throttled,
+                "gave_up": self._gave_up,
+                "limit": self.limiter.limit,
+                "breaker": self.breaker.state,
+                "breaker_opened": self.breaker.opened,
+            }
+
+
+class ResilientStream(Generic[T]):
+    """`Resilience.stream`の戻り値。読み終えた後の`retries`にリトライ回数が入る。"""
+
+    def __init__(self, resilience: Resilience, fn: Callable[[], Iterable[T]]):
+        self._resilience = resilience
+        self._fn = fn
+        self.retries = 0
+
+    def __iter__(self) -> Iterator[T]:
+        res = self._resilience
+        attempt = 0
+        while True:
+            while (wait := res.breaker.wait_time()) > 0:
+                time.sleep(wait)
+            attempt += 1
+            started = res.limiter.acquire()
+            received = False
+            try:
+                for item in self._fn():
+                    received = True
+                    yield item
+            except Exception as exc:
+                delay = res._after_failure(exc, res.policy.max_attempts if received else attempt, started)
+                if delay is None:
+                    raise
+            else:
+                res._after_success()
+                self.retries = attempt - 1
+                return
+            finally:
+                res.limiter.release()
+            time.sleep(delay)
+
+
+_default_resilience: Resilience | None = None
+_default_lock = threading.Lock()
+
+
+def get_resilience() -> Resilience:
+    """プロセス共通のResilienceを返す。Geminiへのすべての呼び出しでリミッターとブレーカーを共有する。"""
+
+    global _default_resilience
+    if _default_resilience is None:
+        with _default_lock:
+            if _default_resilience is None:
+                _default_resilience = Resilience()
+    return _default_resilience
+
+
+def configure_resilience(**kwargs: Any) -> Resilience:
+    """共通のResilienceを設定し直す（検証用にバックオフを短くする場合など）。
+
+    Args:
+        **kwargs: `Resilience`のコンストラクタ引数。
+
+    Returns:
+        Resilience: 新しく設定されたResilience。
+    """
+
+    global _default_resilience
+    with _default_lock:
+        _default_resilience = Resilience(**kwargs)
+    return _default_resilience
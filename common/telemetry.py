@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+DEFAULT_TELEMETRY_PATH = Path(__file__).parent / "telemetry" / "llm_calls.jsonl"
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+@dataclass
+class CallRecord:
+    """LLM呼び出し1回分の計測値。"""
+
+    stage: str
+    model: str
+    latency: float
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    retries: int = 0
+    cache: str = "miss"  # hit / miss / bypass
+    status: str = "ok"  # ok / error
+    ttft: float | None = None
+    ts: float = field(default_factory=time.time)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[pos]
+
+
+class _StageStats:
+    def __init__(self, window: int):
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.requests: dict[tuple[str, str], int] = defaultdict(int)
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.retries = 0
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, record: CallRecord) -> None:
+        self.requests[(record.cache, record.status)] += 1
+        self.prompt_tokens += record.prompt_tokens
+        self.response_tokens += record.response_tokens
+        self.retries += record.retries
+        self.latency_sum += record.latency
+        self.latency_count += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if record.latency <= bound:
+                self.buckets[i] += 1
+        # パーセンタイルはAPIを実際に呼んだものだけで見る（キャッシュヒットは除外）
+        if record.cache != "hit":
+            self.latencies.append(record.latency)
+
+
+class Telemetry:
+    """LLM呼び出しの計測値をJSONLへ記録し、集計とPrometheus形式の出力を提供する。
+
+    JSONLは`max_bytes`でローテーションする。集計はプロセス内で保持し、起動時に
+    現在のJSONLファイルを読み込んで前回までの分も含める。
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_TELEMETRY_PATH,
+        max_bytes: int = 5 * 1024 * 1024,
+        backup_count: int = 3,
+        window: int = 1000,
+    ):
+        self.path = Path(path)
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages: dict[str, _StageStats] = {}
+        self._load_existing()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            self.path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger = logging.getLogger(f"{__name__}.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(handler)
+
+    def _stage(self, stage: str) -> _StageStats:
+        stats = self._stages.get(stage)
+        if stats is None:
+            stats = self._stages[stage] = _StageStats(self.window)
+        return stats
+
+    def _load_existing(self) -> None:
+        if not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    self._stage_add(CallRecord(**json.loads(line)))
+                except (json.JSONDecodeError, TypeError):
+                    continue
+
+    def _stage_add(self, record: CallRecord) -> None:
+        self._stage(record.stage).add(record)
+
+    def record(self, record: CallRecord) -> None:
+        """1回分の計測値を記録する。"""
+
+        with self._lock:
+            self._stage_add(record)
+        self._logger.info(json.dumps(asdict(record), ensure_ascii=False))
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """ステージごとの件数・レイテンシのp50/p95・トークン数を返す。"""
+
+        with self._lock:
+            result: dict[str, dict[str, Any]] = {}
+            for stage, stats in sorted(self._stages.items()):
+                latencies = list(stats.latencies)
+                hits = sum(n for (cache, _), n in stats.requests.items() if cache == "hit")
+                errors = sum(n for (_, status), n in stats.requests.items() if status == "error")
+                result[stage] = {
+                    "count": stats.latency_count,
+                    "cache_hits": hits,
+                    "errors": errors,
+                    "retries": stats.retries,
+                    "p50": _percentile(latencies, 0.5),
+                    "p95": _percentile(latencies, 0.95),
+                    "prompt_tokens": stats.prompt_tokens,
+                    "response_tokens": stats.response_tokens,
+                }
+            return result
+
+    def render_prometheus(self) -> str:
+        """集計をPrometheusのテキスト形式（exposition format）で返す。"""
+
+        lines = [
+            "# HELP llm_requests_total LLM calls by stage, cache status and result.",
+            "# TYPE llm_requests_total counter",
+        ]
+        with self._lock:
+            stages = sorted(self._stages.items())
+            for stage, stats in stages:
+                for (cache, status), n in sorted(stats.requests.items()):
+                    lines.append(
+                        f'llm_requests_total{{stage="{stage}",cache="{cache}",status="{status}"}} {n}'
+                    )
+            lines += [
+                "# HELP llm_tokens_total Tokens reported by usage metadata.",
+                "# TYPE llm_tokens_total counter",
+            ]
+            for stage, stats in stages:
+                lines.append(f'llm_tokens_total{{stage="{stage}",kind="prompt"}} {stats.prompt_tokens}')
+                lines.append(f'llm_tokens_total{{stage="{stage}",kind="response"}} {stats.response_tokens}')
+            lines += [
+                "# HELP llm_retries_total Retries performed before a call completed.",
+                "# TYPE llm_retries_total counter",
+            ]
+            for stage, stats in stages:
+                lines.append(f'llm_retries_total{{stage="{stage}"}} {stats.retries}')
+            lines += [
+                "# HELP llm_latency_seconds End-to-end latency of LLM calls.",
+                "# TYPE llm_latency_seconds histogram",
+            ]
+            for stage, stats in stages:
+                for bound, n in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append(f'llm_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {n}')
+                lines.append(
+                    f'llm_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {stats.latency_count}'
+                )
+                lines.append(f'llm_latency_seconds_sum{{stage="{stage}"}} {stats.latency_sum:.6f}')
+                lines.append(f'llm_latency_seconds_count{{stage="{stage}"}} {stats.latency_count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path) -> None:
+        """node_exporterのtextfile collector向けに.promファイルを書き出す。"""
+
+        path = Path(path)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(self.render_prometheus(), encoding="utf-8")
+        tmp.replace(path)
+
+
+def usage_tokens(usage: Any) -> tuple[int, int]:
+    """GenerateContentResponse.usage_metadataからプロンプト・応答のトークン数を取り出す。"""
+
+    if usage is None:
+        return 0, 0
+    prompt = getattr(usage, "prompt_token_count", None) or 0
+    response = getattr(usage, "candidates_token_count", None) or 0
+    return prompt, response
+
+
+_default_telemetry: Telemetry | None = None
+_default_lock = threading.Lock()
+
+
+def get_telemetry() -> Telemetry:
+    """プロセス共通のTelemetryを返す。記録先は環境変数`LLM_TELEMETRY_PATH`で変更できる。"""
+
+    global _default_telemetry
+    if _default_telemetry is None:
+        with _default_lock:
+            if _default_telemetry is None:
+                _default_telemetry = Telemetry(Path(os.getenv("LLM_TELEMETRY_PATH", DEFAULT_TELEMETRY_PATH)))
+    return _default_telemetry
+
+
+def record_call(
+    stage: str,
+    model: str,
+    latency: float,
+    usage: Any = None,
+    cache: str = "miss",
+    status: str = "ok",
+    retries: int = 0,
+    ttft: float | None = None,
+) -> None:
+    """LLM呼び出し1回分を共通のTelemetryに記録するショートカット。
+
+    Args:
+        stage (str): 呼び出し元（summary / quiz / kindle-summary / kindle-problem など）。
+        model (str): 使用したモデル名。
+        latency (float): 所要時間（秒）。
+        usage (Any): レスポンスの`usage_metadata`。キャッシュヒット時はNone。
+        cache (str): `hit`・`miss`・`bypass`のいずれか。
+        status (str): `ok`または`error`。
+        retries (int): 成功までに行ったリトライ回数。
+        ttft (float | None): ストリーミング時の最初のチャンクまでの時間（秒）。
+    """
+
+    prompt_tokens, response_tokens = usage_tokens(usage)
+    get_telemetry().record(
+        CallRecord(
+            stage=stage,
+            model=model,
+            latency=latency,
+            prompt_tokens=prompt_tokens,
+            response_tokens=response_tokens,
+            retries=retries,
+            cache=cache,
+            status=status,
+            ttft=ttft,
+        )
+    )
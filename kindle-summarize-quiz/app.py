@@ -2,132 +2,292 @@
 # # import
 
 # %%
-import os
-import re
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Callable
 from dotenv import load_dotenv
-from google import genai
-import json
+
+from checkpoint import DEFAULT_CHECKPOINT_PATH, STAGE_DONE, STAGE_SUMMARY, Checkpoint, file_sha256
+import common_setup  # noqa: F401  共有パッケージcommonを読み込めるようにする
+from common.gemini_client import get_client
+from highlight_delta import BookState, highlight_hash, section_hash, split_sections
+from highlight_parser import format_frontmatter, highlights_markdown, parse_highlight_file, split_frontmatter
+from common.llm_cache import get_llm_cache, make_key
+from common.resilience import get_resilience
+from common.telemetry import get_telemetry, record_call
+
+# %% [markdown]
+# # 設定
+
+# %%
+HIGHLIGHT_DIR = Path("highlight")
+SUMMARY_DIR = Path("summary")
+PROBLEM_DIR = Path("problem_bank")
+
+SUMMARY_PROMPT = (
+    "以下は書籍のハイライトをMarkdown形式にまとめたものです。"
+    "要約してください。"
+    "ただし、出力はMarkdown形式のみで行い、"
+    "要約に関係ない説明文や前置きは一切書かないでください。"
+    "見出し・箇条書きを適宜使って整理してください。\n\n"
+)
+
+PROBLEM_PROMPT = (
+    "以下は書籍の一部を要約した文章です。"
+    "この要約の内容を網羅するように問題を作成してください。"
+    "出題は必ず複数の観点を含めてください（定義確認・理由説明・比較・応用シナリオ）。"
+    "各問題は必ずMarkdown形式で次のフォーマットに従ってください：\n\n"
+    "### （ここに問題文そのものを一つだけ書く）\n"
+    "**解答**　（ここに解答を書く）\n"
+    "**解説**　（ここに解説を書く）\n\n"
+    "問題作成に関係ない説明文や前置きは一切書かないでください。\n\n"
+)
+
+_UNSAFE_FILENAME_TABLE = str.maketrans({ch: "-" for ch in '\\/:*?"<>|'})
+
+UPDATE_PROMPT = (
+    "以下は書籍のハイライトから作成した既存の要約と、その後に追加されたハイライトです。"
+    "追加のハイライトの内容を既存の要約に反映し、更新後の要約全体を出力してください。"
+    "既存の要約の見出し構成と記述はできるだけそのまま残し、関係する見出しに追記するか、"
+    "新しい話題であれば見出しを追加してください。"
+    "ただし、出力はMarkdown形式のみで行い、"
+    "要約に関係ない説明文や前置きは一切書かないでください。\n\n"
+)
+
+# (contents, stage) -> 生成テキスト。ベンチマークでは遅延を入れた偽のLLMに差し替える
+Generate = Callable[[str, str], str]
 
 # %% [markdown]
 # # 関数定義
 
 
 # %%
-def LLM_gen(contents: str) -> str:
-    client = genai.Client()
+def LLM_gen(contents: str, stage: str, model: str = "gemini-2.5-flash") -> str:
+    # 入力が同じなら前回の応答をキャッシュから返す（変更のない書籍は再要約しない）
+    # 429・503は共通のResilienceでバックオフして送り直し、続く場合はブレーカーで全スレッドを待たせる
+    start = time.perf_counter()
+    cache = get_llm_cache()
+    key = make_key(model, contents)
+    cached = cache.get(key)
+    if cached is not None:
+        record_call(stage, model, time.perf_counter() - start, cache="hit")
+        return cached
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash", contents=contents
-    )
-    return response.text
+    client = get_client()
+
+    try:
+        response, retries = get_resilience().call(
+            lambda: client.models.generate_content(model=model, contents=contents)
+        )
+    except Exception:
+        record_call(stage, model, time.perf_counter() - start, status="error")
+        raise
+    record_call(stage, model, time.perf_counter() - start, response.usage_metadata, retries=retries)
+    text = response.text
+    if text:
+        cache.put(key, text)
+    return text
 
 
 # %% [markdown]
 # # ハイライトの読み込みと要約
 
 # %%
-# APIKEYの読み込み
-load_dotenv()
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-
-# ハイライトディレクトリの読み込み
-highlight_dir = Path("highlight")
-if not highlight_dir.is_dir():
-    raise NotADirectoryError(f"{highlight_dir} is not a directory")
-for f in highlight_dir.iterdir():
-    text = f.read_text(encoding="utf-8")
-    lines = text.splitlines()
-
-    # 書籍のプロティの作成
-    property = {}
-    for l in lines:
-        if "title" in l:
-            title = l.split(":")[1]
-            title = title.strip()  # 空白を除去しないとエラーになる
-        if "author" in l:
-            author = l.split(":")[1]
-
-    property["title"] = title
-    property["author"] = author
-    property["tags"] = ["kindle", "quize"]
-
-    frontmatter = "---\n"
-    for v in property:
-        if type(property[v]) == list:
-            frontmatter += v + ": " + json.dumps(property[v]) + "\n"
-        if type(property[v]) == str:
-            frontmatter += v + ": " + property[v] + "\n"
-    frontmatter += "---\n"
-    # print(frontmatter)
-
-    # Highlight箇所の抽出
-    highlightAfterPattern = r"##\s*Highlights\n*(.*)—\slocation"
-    dashWrappedPattern = r"---\n*(.*)\n*—\slocation"
-    matches = re.findall(highlightAfterPattern, text)
-    matches += re.findall(dashWrappedPattern, text)
-    # print(matches)
-
-    highlightMarkdown = ""
-    for text in matches:
-        highlightMarkdown += "- " + text + "\n"
-    # print(highlightMarkdown)
-
-    # mdファイルの要約
-    contents = (
-        "以下は書籍のハイライトをMarkdown形式にまとめたものです。"
-        "要約してください。"
-        "ただし、出力はMarkdown形式のみで行い、"
-        "要約に関係ない説明文や前置きは一切書かないでください。"
-        "見出し・箇条書きを適宜使って整理してください。\n\n" + highlightMarkdown
-    )
-    res = LLM_gen(contents)
-    # print(res)
+def safe_filename(title: str) -> str:
+    """ファイル名に使えない文字を`-`に置き換える。"""
+
+    return title.translate(_UNSAFE_FILENAME_TABLE).strip()
+
+
+def summarize_book(path: Path, generate: Generate = LLM_gen, full: bool = False) -> Path:
+    """1冊分のハイライトを要約し、summary/<title>.mdに保存する。
+
+    要約済みのハイライトのハッシュを要約の隣（`<title>.highlights.json`）に記録しておき、
+    次回からは新しく増えたハイライトだけを既存の要約に反映させる。
+
+    Args:
+        path (Path): ハイライトファイル。
+        generate (Generate): LLM呼び出し関数。
+        full (bool): Trueなら記録を無視して全ハイライトから要約し直す。
+
+    Returns:
+        Path: 要約ファイル。
+    """
+
+    book = parse_highlight_file(path)
+    frontmatter = format_frontmatter({"title": book.title, "author": book.author, "tags": ["kindle", "quize"]})
+
+    SUMMARY_DIR.mkdir(exist_ok=True)
+    filename = SUMMARY_DIR / f"{safe_filename(book.title)}.md"
+    state = BookState() if full or not filename.is_file() else BookState.load(filename)
+
+    if state.highlights:
+        additions = state.new_highlights(book.highlights)
+        if not additions:
+            print(f"{filename} 新しいハイライトなし")
+            return filename
+        # 差分だけを既存の要約に反映する
+        _, _, current = split_frontmatter(filename.read_text(encoding="utf-8"))
+        contents = (
+            UPDATE_PROMPT
+            + "[既存の要約]\n" + current.strip() + "\n\n"
+            + "[追加のハイライト]\n" + highlights_markdown(additions)
+        )
+        res = generate(contents, "kindle-summary-update")
+        print(f"{filename} ハイライト{len(additions)}件を反映")
+    else:
+        # mdファイルの要約
+        res = generate(SUMMARY_PROMPT + highlights_markdown(book.highlights), "kindle-summary")
+        print(filename)
 
     # 要約をMarkdownファイルとして出力
-    save_dir = Path("summary")
-    save_dir.mkdir(exist_ok=True)
-    filename = save_dir / f"{title}.md"
-    print(filename)
-    text = frontmatter + res
-    filename.write_text(text, encoding="utf-8")
+    filename.write_text(frontmatter + res, encoding="utf-8")
+    state.highlights = [highlight_hash(h) for h in book.highlights]
+    state.save(filename)
+    return filename
+
 
 # %% [markdown]
 # # 問題生成
 
 # %%
-# 問題保管ディレクトリの作成
-save_dir = Path("problem_bank")
-save_dir.mkdir(exist_ok=True)
-
-summary_dir = Path("summary")
-if not summary_dir.is_dir():
-    raise NotADirectoryError(f"{summary_dir} is not a directory")
-
-# 要約の読み込みと問題の作成
-for f in summary_dir.iterdir():
-    text = f.read_text(encoding="utf-8")
-    # print(text)
-    pattern = r"---\n(.*)\n(.*)\n(.*)\n---"
-    matches = re.search(pattern, text)
-    frontmatter = matches.group(0)
-    title = matches.group(1).split(":")[1]
-    title = title.strip()  # 空白を除去しないとエラーになる
-    # print(frontmatter)
-
-    contents = (
-        "以下は書籍の一部を要約した文章です。"
-        "この要約の内容を網羅するように問題を作成してください。"
-        "出題は必ず複数の観点を含めてください（定義確認・理由説明・比較・応用シナリオ）。"
-        "各問題は必ずMarkdown形式で次のフォーマットに従ってください：\n\n"
-        "### （ここに問題文そのものを一つだけ書く）\n"
-        "**解答**　（ここに解答を書く）\n"
-        "**解説**　（ここに解説を書く）\n\n"
-        "問題作成に関係ない説明文や前置きは一切書かないでください。\n\n" + text
-    )
-
-    res = LLM_gen(contents)
-    # print(res)
-
-    file_path = save_dir / Path(title + ".md")
-    file_path.write_text(frontmatter + "\n" + res, encoding="utf-8")
+def make_problems(summary_path: Path, generate: Generate = LLM_gen, full: bool = False) -> Path:
+    """要約から問題を作成し、problem_bank/<title>.mdに保存する。
+
+    問題を作成済みの要約セクション（見出し単位）のハッシュを記録しておき、要約が更新された
+    ときは新規・変更のあったセクションについてだけ問題を作って問題ファイルに追記する。
+
+    Args:
+        summary_path (Path): 要約ファイル。
+        generate (Generate): LLM呼び出し関数。
+        full (bool): Trueなら記録を無視して要約全体から問題を作り直す。
+
+    Returns:
+        Path: 問題ファイル。
+    """
+
+    text = summary_path.read_text(encoding="utf-8")
+    properties, frontmatter, body = split_frontmatter(text)
+    title = str(properties.get("title") or summary_path.stem)
+
+    PROBLEM_DIR.mkdir(exist_ok=True)
+    file_path = PROBLEM_DIR / f"{safe_filename(title)}.md"
+    state = BookState.load(summary_path)
+    sections = split_sections(body)
+    regenerate = full or not state.sections or not file_path.is_file()
+    changed = sections if regenerate else state.changed_sections(sections)
+
+    if regenerate:
+        res = generate(PROBLEM_PROMPT + text, "kindle-problem")
+        file_path.write_text(frontmatter + "\n" + res, encoding="utf-8")
+    elif changed:
+        contents = PROBLEM_PROMPT + frontmatter + "\n" + "\n\n".join(changed)
+        res = generate(contents, "kindle-problem-update")
+        with file_path.open("a", encoding="utf-8") as f:
+            f.write("\n\n" + res)
+        print(f"{file_path} 変更のあった{len(changed)}セクションの問題を追加")
+    else:
+        print(f"{file_path} 要約に変更なし")
+
+    state.sections = [section_hash(s) for s in sections]
+    state.save(summary_path)
+    return file_path
+
+
+# %% [markdown]
+# # ジョブ実行
+
+# %%
+def process_book(path: Path, checkpoint: Checkpoint, generate: Generate = LLM_gen, full: bool = False) -> str:
+    """1冊分の要約→問題生成を行う。チェックポイントで終わっている段階は飛ばす。
+
+    Returns:
+        str: `skipped`（完了済み）・`resumed`（要約済みから再開）・`done`のいずれか。
+    """
+
+    key = path.name
+    sha = file_sha256(path)
+    stage = checkpoint.stage(key, sha)
+    if stage == STAGE_DONE:
+        return "skipped"
+
+    summary_path = Path(checkpoint.get(key).get("summary", "")) if stage == STAGE_SUMMARY else None
+    resumed = summary_path is not None and summary_path.is_file()
+    if not resumed:
+        summary_path = summarize_book(path, generate, full)
+        checkpoint.mark(key, sha, STAGE_SUMMARY, summary=str(summary_path))
+
+    problem_path = make_problems(summary_path, generate, full)
+    checkpoint.mark(key, sha, STAGE_DONE, summary=str(summary_path), problem=str(problem_path))
+    return "resumed" if resumed else "done"
+
+
+def run(
+    jobs: int = 4,
+    highlight_dir: Path = HIGHLIGHT_DIR,
+    checkpoint: Checkpoint | None = None,
+    generate: Generate = LLM_gen,
+    full: bool = False,
+) -> dict[str, int]:
+    """ハイライトディレクトリの全書籍を`jobs`並列で処理する。
+
+    1冊ごとに要約と問題生成を続けて行うので、ある書籍の問題生成と別の書籍の要約が
+    同時に進む。完了した段階はチェックポイントに記録され、中断しても次回は未完了の書籍だけを処理する。
+
+    Args:
+        jobs (int): 同時に処理する書籍数。
+        highlight_dir (Path): ハイライトファイルのディレクトリ。
+        checkpoint (Checkpoint | None): 進捗の記録先。省略時は既定のパス。
+        generate (Generate): LLM呼び出し関数。
+        full (bool): Trueなら差分を使わず全ハイライトから要約・問題を作り直す。
+
+    Returns:
+        dict[str, int]: 結果ごとの書籍数（done / resumed / skipped / failed）。
+    """
+
+    if not highlight_dir.is_dir():
+        raise NotADirectoryError(f"{highlight_dir} is not a directory")
+    checkpoint = checkpoint or Checkpoint()
+    books = sorted(f for f in highlight_dir.iterdir() if f.is_file())
+    counts = {"done": 0, "resumed": 0, "skipped": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {pool.submit(process_book, f, checkpoint, generate, full): f for f in books}
+        for future in as_completed(futures):
+            try:
+                counts[future.result()] += 1
+            except Exception as exc:  # noqa: BLE001
+                counts["failed"] += 1
+                print(f"{futures[future].name} 処理失敗：{exc}")
+    return counts
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Kindleハイライトの要約と問題生成")
+    parser.add_argument("--jobs", "-j", type=int, default=4, help="同時に処理する書籍数")
+    parser.add_argument("--highlight-dir", type=Path, default=HIGHLIGHT_DIR)
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="チェックポイントを消して最初から処理する")
+    parser.add_argument("--full", action="store_true", help="差分更新を使わず全ハイライトから作り直す")
+    args = parser.parse_args(argv)
+
+    # APIKEYの読み込み（genai.ClientがGEMINI_API_KEYを参照する）
+    load_dotenv()
+
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.restart or args.full:
+        checkpoint.clear()
+    start = time.perf_counter()
+    counts = run(args.jobs, args.highlight_dir, checkpoint, full=args.full)
+    print(f"完了 {counts} ({time.perf_counter() - start:.1f}s)")
+
+    print(f"LLMキャッシュ: {get_llm_cache().stats()}")
+    print(f"リトライ: {get_resilience().stats()}")
+    for stage, stats in get_telemetry().summary().items():
+        print(f"{stage}: {stats}")
+
+
+if __name__ == "__main__":
+    main()
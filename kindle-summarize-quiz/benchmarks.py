@@ -0,0 +1,213 @@
+"""Kindleパイプラインの簡易ベンチマーク。
+
+APIには接続せず、遅延を入れた偽のLLMと合成ハイライトで計測する。
+
+    python benchmarks.py runner parser delta
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def _write_library(highlight_dir: Path, books: int, highlights: int) -> None:
+    """Obsidianのsync your kindle highlights形式の合成ハイライトを書き出す。"""
+
+    highlight_dir.mkdir(parents=True, exist_ok=True)
+    for b in range(books):
+        lines = [
+            "---",
+            f"title: 書籍{b}",
+            "author: 著者",
+            "---",
+            "",
+            "## Highlights",
+        ]
+        for h in range(highlights):
+            link = f"[{h * 10}](kindle://book?action=open&location={h * 10})"
+            if h % 10 == 9:
+                # 複数行にわたるハイライト
+                lines += [f"書籍{b}のハイライト{h}。", f"重要な考え方の説明。 — location: {link}"]
+            else:
+                lines.append(f"書籍{b}のハイライト{h}。重要な考え方の説明。 — location: {link}")
+            if h % 7 == 6:
+                lines.append("メモ: あとで読み返す")
+            lines += ["", "---"]
+        (highlight_dir / f"book{b}.md").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def bench_runner(books: int = 50, latency: float = 0.05) -> None:
+    """偽のLLMで、書籍数`books`のライブラリを--jobsごとの所要時間と中断後の再開で比べる。"""
+
+    import app
+    from checkpoint import Checkpoint
+
+    calls = 0
+    lock = threading.Lock()
+
+    def fake_llm(contents: str, stage: str) -> str:
+        nonlocal calls
+        with lock:
+            calls += 1
+        time.sleep(latency)
+        return f"# {stage}\n- {contents[-20:]}"
+
+    # 前回の要約（summary/*.highlights.json）が残っていると差分更新でLLMを呼ばなくなるので、
+    # 計測ごとに新しいディレクトリでライブラリを作り直す
+    @contextmanager
+    def fresh_library():
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                _write_library(Path("highlight"), books, 20)
+                yield
+            finally:
+                os.chdir(cwd)
+
+    print(f"books={books} latency={latency * 1000:.0f}ms (1冊あたり要約+問題の2回)")
+    baseline = None
+    for jobs in (1, 4, 8):
+        with fresh_library():
+            calls = 0
+            start = time.perf_counter()
+            counts = app.run(jobs, Path("highlight"), Checkpoint(Path("checkpoint.json")), fake_llm)
+            elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"  --jobs {jobs:<2} {elapsed:6.2f}s  x{baseline / elapsed:.1f}  calls={calls} {counts}")
+
+    # 途中で落ちた実行を再開したときに、完了済みの書籍を呼び直さないこと
+    limit = books  # 半分の冊数分の呼び出しで落とす
+
+    def crashing_llm(contents: str, stage: str) -> str:
+        if calls >= limit:
+            raise RuntimeError("crash")
+        return fake_llm(contents, stage)
+
+    with fresh_library():
+        checkpoint = Checkpoint(Path("checkpoint.json"))
+        calls = 0
+        first = app.run(4, Path("highlight"), checkpoint, crashing_llm)
+        first_calls, calls = calls, 0
+        second = app.run(4, Path("highlight"), checkpoint, fake_llm)
+    print(f"  resume: 1回目 calls={first_calls} {first} / 2回目 calls={calls} {second}")
+
+
+def bench_parser(highlights: int = 10000) -> None:
+    """1万件のハイライトを持つ合成ライブラリで、旧方式（行ごとの部分一致＋正規表現2回）と1パスパーサーを比べる。"""
+
+    import re
+
+    from highlight_parser import parse_highlight_file
+
+    def legacy(path: Path) -> list[str]:
+        text = path.read_text(encoding="utf-8")
+        for l in text.splitlines():
+            if "title" in l:
+                l.split(":")[1]
+            if "author" in l:
+                l.split(":")[1]
+        matches = re.findall(r"##\s*Highlights\n*(.*)—\slocation", text)
+        matches += re.findall(r"---\n*(.*)\n*—\slocation", text)
+        return matches
+
+    with tempfile.TemporaryDirectory() as tmp:
+        highlight_dir = Path(tmp)
+        _write_library(highlight_dir, 1, highlights)
+        path = highlight_dir / "book0.md"
+        print(f"highlights={highlights} size={path.stat().st_size / 1024 / 1024:.1f}MB")
+
+        start = time.perf_counter()
+        matches = legacy(path)
+        print(f"  legacy    {time.perf_counter() - start:6.3f}s highlights={len(matches)}")
+
+        start = time.perf_counter()
+        book = parse_highlight_file(path)
+        elapsed = time.perf_counter() - start
+        print(
+            f"  one-pass  {elapsed:6.3f}s highlights={len(book.highlights)} "
+            f"title={book.title!r} locations={sum(h.location is not None for h in book.highlights)}"
+        )
+
+
+def bench_delta(highlights: int = 300, added: int = 3) -> None:
+    """ハイライトが`added`件増えた書籍で、全件の作り直しと差分更新の送信量を比べる。"""
+
+    import app
+
+    sent: dict[str, int] = {}
+
+    def fake_llm(contents: str, stage: str) -> str:
+        sent[stage] = sent.get(stage, 0) + len(contents)
+        time.sleep(len(contents) / 200_000)  # 入力が長いほど遅い
+        if stage == "kindle-summary-update":
+            current, additions = contents.split("[既存の要約]\n", 1)[1].split("\n\n[追加のハイライト]\n", 1)
+            return current + "\n\n## 追加された内容\n" + additions
+        if stage.startswith("kindle-summary"):
+            bullets = [line for line in contents.split("\n") if line.startswith("- ")]
+            return "\n\n".join(
+                f"## 見出し{i // 20}\n" + "\n".join(bullets[i:i + 20]) for i in range(0, len(bullets), 20)
+            )
+        return "### 問題\n**解答**　...\n**解説**　..."
+
+    def measure(full: bool) -> tuple[float, dict[str, int]]:
+        sent.clear()
+        start = time.perf_counter()
+        app.process_book(path, Checkpoint(Path(f"checkpoint-{full}.json")), fake_llm, full)
+        return time.perf_counter() - start, dict(sent)
+
+    from checkpoint import Checkpoint
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            _write_library(Path("highlight"), 1, highlights)
+            path = Path("highlight") / "book0.md"
+            app.process_book(path, Checkpoint(Path("initial.json")), fake_llm)
+            with path.open("a", encoding="utf-8") as f:
+                for h in range(added):
+                    f.write(f"追加のハイライト{h}。新しい視点。 — location: [{90000 + h}](kindle://x)\n\n---\n")
+
+            state_path = Path("summary") / "書籍0.highlights.json"
+            saved_state = state_path.read_text(encoding="utf-8")
+            saved_summary = (Path("summary") / "書籍0.md").read_text(encoding="utf-8")
+            print(f"highlights={highlights} added={added}")
+            elapsed, chars = measure(full=True)
+            print(f"  full   {elapsed:6.3f}s sent_chars={sum(chars.values()):>7} {chars}")
+
+            # 全件作り直し前の状態に戻して差分更新を測る
+            state_path.write_text(saved_state, encoding="utf-8")
+            (Path("summary") / "書籍0.md").write_text(saved_summary, encoding="utf-8")
+            elapsed, chars = measure(full=False)
+            print(f"  delta  {elapsed:6.3f}s sent_chars={sum(chars.values()):>7} {chars}")
+        finally:
+            os.chdir(cwd)
+
+
+BENCHMARKS = {
+    "runner": bench_runner,
+    "parser": bench_parser,
+    "delta": bench_delta,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("names", nargs="*", help=f"実行するベンチマーク {list(BENCHMARKS)}（省略時は全部）")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CHECKPOINT_PATH = Path(".kindle_checkpoint.json")
+
+# 書籍ごとの進み具合。problemまで終われば完了
+STAGE_SUMMARY = "summary"
+STAGE_DONE = "done"
+
+
+def file_sha256(path: Path) -> str:
+    """ファイル内容のsha256を返す。"""
+
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class Checkpoint:
+    """書籍ごとの処理済みステージをJSONファイルに記録し、中断した実行を再開できるようにする。
+
+    ハイライトファイルの内容ハッシュも一緒に記録するので、ハイライトが増えた書籍は
+    完了済みでも未処理として扱う。書き込みは一時ファイルからのrenameで行い、
+    途中で落ちてもファイルが壊れないようにしている。
+    """
+
+    def __init__(self, path: Path = DEFAULT_CHECKPOINT_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._books: dict[str, dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                self._books = json.loads(self.path.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                print(f"チェックポイントを読み込めないため最初から実行します : {self.path}")
+
+    def stage(self, key: str, sha256: str) -> str | None:
+        """記録済みのステージを返す。ハイライトの内容が変わっていればNone。"""
+
+        with self._lock:
+            book = self._books.get(key)
+        if book is None or book.get("sha256") != sha256:
+            return None
+        return book.get("stage")
+
+    def get(self, key: str) -> dict[str, Any]:
+        with self._lock:
+            return dict(self._books.get(key, {}))
+
+    def mark(self, key: str, sha256: str, stage: str, **fields: Any) -> None:
+        """書籍`key`が`stage`まで終わったことを記録してファイルへ保存する。"""
+
+        with self._lock:
+            book = self._books.get(key, {})
+            if book.get("sha256") != sha256:
+                book = {}
+            book.update(fields, sha256=sha256, stage=stage)
+            self._books[key] = book
+            self._save()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._books = {}
+            self.path.unlink(missing_ok=True)
+
+    def _save(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._books, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp.replace(self.path)
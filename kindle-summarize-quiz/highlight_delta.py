@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from highlight_parser import Highlight
+
+_SECTION_HEADING_REGEX = re.compile(r"^#{1,6}\s")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def highlight_hash(highlight: Highlight) -> str:
+    """ハイライト1件の内容ハッシュ。本文かメモが変われば別のハイライトとみなす。"""
+
+    return _digest(f"{highlight.text.strip()}\n{(highlight.note or '').strip()}")
+
+
+def split_sections(markdown: str) -> list[str]:
+    """要約Markdownを見出しごとのセクションに分ける。最初の見出しより前の部分も1セクションにする。"""
+
+    sections: list[list[str]] = [[]]
+    for line in markdown.split("\n"):
+        if _SECTION_HEADING_REGEX.match(line) and any(l.strip() for l in sections[-1]):
+            sections.append([])
+        sections[-1].append(line)
+    return ["\n".join(lines).strip() for lines in sections if any(l.strip() for l in lines)]
+
+
+def section_hash(section: str) -> str:
+    """セクションの内容ハッシュ（前後の空白の違いは無視する）。"""
+
+    return _digest("\n".join(line.rstrip() for line in section.strip().split("\n")))
+
+
+@dataclass
+class BookState:
+    """要約済みのハイライトと、問題を作成済みの要約セクションのハッシュ。
+
+    `summary/<title>.md`の隣に`<title>.highlights.json`として保存する。
+    """
+
+    highlights: list[str] = field(default_factory=list)
+    sections: list[str] = field(default_factory=list)
+
+    @staticmethod
+    def path_for(summary_path: Path) -> Path:
+        return summary_path.with_name(summary_path.stem + ".highlights.json")
+
+    @classmethod
+    def load(cls, summary_path: Path) -> "BookState":
+        path = cls.path_for(summary_path)
+        if not path.exists():
+            return cls()
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            return cls()
+        return cls(list(data.get("highlights", [])), list(data.get("sections", [])))
+
+    def save(self, summary_path: Path) -> None:
+        path = self.path_for(summary_path)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(self), indent=1), encoding="utf-8")
+        tmp.replace(path)
+
+    def new_highlights(self, highlights: list[Highlight]) -> list[Highlight]:
+        """まだ要約に反映していないハイライトを返す。"""
+
+        known = set(self.highlights)
+        return [h for h in highlights if highlight_hash(h) not in known]
+
+    def changed_sections(self, sections: list[str]) -> list[str]:
+        """まだ問題を作成していない（新規または内容が変わった）セクションを返す。"""
+
+        known = set(self.sections)
+        return [s for s in sections if section_hash(s) not in known]
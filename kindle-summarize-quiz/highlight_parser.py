@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import itertools
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+# Obsidianの「Kindle Highlights」(sync your kindle highlights) プラグインの出力形式
+#
+#   ---
+#   kindle-sync:
+#     title: 書名
+#     author: 著者
+#   ---
+#   # 書名
+#   ## Metadata
+#   ...
+#   ## Highlights
+#   ハイライト本文 — location: [123](kindle://book?action=open&asin=...&location=123) ^ref-1
+#   （メモがあれば次の行）
+#
+#   ---
+#   次のハイライト ...
+_FENCE_REGEX = re.compile(r"^---\s*$")
+_KEY_VALUE_REGEX = re.compile(r"^(\s*)([^:#\s][^:]*?)\s*:(?:\s+(.*?))?\s*$")
+_HIGHLIGHTS_HEADING_REGEX = re.compile(r"^##\s*Highlights\s*$", re.IGNORECASE)
+_HEADING_REGEX = re.compile(r"^#{1,6}\s")
+_LOCATION_REGEX = re.compile(
+    r"^(.*?)\s*—\s*(?:location|page|位置No\.|ページ)\s*:?\s*"
+    r"(?:\[([^\]]*)\]\([^)]*\)|(\S+))"
+    r"(?:\s*\^ref-\S+)?\s*$"
+)
+_NOTE_PREFIX_REGEX = re.compile(r"^(?:\*\*)?(?:note|メモ)(?:\*\*)?\s*:\s*", re.IGNORECASE)
+_NEEDS_QUOTE_REGEX = re.compile(r"^[\s\[\]{}>|*&!%@`'\",#?-]|:\s|\s#|\s$")
+
+
+@dataclass
+class Highlight:
+    """ハイライト1件。`location`・`note`はない場合None。"""
+
+    text: str
+    location: str | None = None
+    note: str | None = None
+
+
+@dataclass
+class BookHighlights:
+    """1冊分のハイライトファイルの内容。"""
+
+    title: str
+    author: str
+    frontmatter: dict[str, Any] = field(default_factory=dict)
+    highlights: list[Highlight] = field(default_factory=list)
+
+
+def _scalar(value: str | None) -> Any:
+    if value is None or value == "":
+        return None
+    if value[0] in "'\"" and value[-1] == value[0] and len(value) >= 2:
+        if value[0] == '"':
+            try:
+                return json.loads(value)
+            except json.JSONDecodeError:
+                pass
+        return value[1:-1].replace("''", "'")
+    if value.startswith("["):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    return value
+
+
+def parse_frontmatter(lines: Iterable[str]) -> dict[str, Any]:
+    """YAML Frontmatterの本文（`---`の内側）を辞書にする。
+
+    プラグインやこのアプリが出力する範囲（`key: value`と1段のネスト、
+    引用符付き文字列、フロー形式のリスト）だけを扱う簡易パーサー。
+    """
+
+    result: dict[str, Any] = {}
+    parent: dict[str, Any] | None = None
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        match = _KEY_VALUE_REGEX.match(line)
+        if match is None:
+            continue
+        indent, key, value = match.groups()
+        if indent and parent is not None:
+            parent[key] = _scalar(value)
+            continue
+        if value is None or value == "":
+            parent = result[key] = {}
+        else:
+            parent = None
+            result[key] = _scalar(value)
+    return result
+
+
+def _frontmatter_value(frontmatter: dict[str, Any], key: str) -> str:
+    value = frontmatter.get(key)
+    if value is None:
+        # プラグインは`kindle-sync:`の下にまとめて書く
+        for nested in frontmatter.values():
+            if isinstance(nested, dict) and nested.get(key) is not None:
+                value = nested[key]
+                break
+    return "" if value is None else str(value).strip()
+
+
+def format_frontmatter(properties: dict[str, Any]) -> str:
+    """辞書を`---`で囲んだYAML Frontmatterにする（末尾改行付き）。
+
+    記号を含む文字列はJSON形式（YAMLとしても有効）で引用する。
+    """
+
+    lines = ["---"]
+    for key, value in properties.items():
+        if isinstance(value, str):
+            text = json.dumps(value, ensure_ascii=False) if _NEEDS_QUOTE_REGEX.search(value) else value
+        else:
+            text = json.dumps(value, ensure_ascii=False)
+        lines.append(f"{key}: {text}")
+    lines.append("---")
+    return "\n".join(lines) + "\n"
+
+
+def split_frontmatter(text: str) -> tuple[dict[str, Any], str, str]:
+    """Markdownを(Frontmatterの辞書, Frontmatterのブロック, 本文)に分ける。
+
+    ブロックは`---`から閉じの`---`まで（末尾改行なし）。Frontmatterがなければ空。
+    """
+
+    lines = text.split("\n")
+    if not lines or not _FENCE_REGEX.match(lines[0]):
+        return {}, "", text
+    for i in range(1, len(lines)):
+        if _FENCE_REGEX.match(lines[i]):
+            block = "\n".join(lines[: i + 1])
+            body = "\n".join(lines[i + 1:])
+            return parse_frontmatter(lines[1:i]), block, body
+    return {}, "", text
+
+
+def _make_highlight(text_lines: list[str], location: str | None, note_lines: list[str]) -> Highlight | None:
+    text = " ".join(text_lines).strip()
+    if not text:
+        return None
+    note = None
+    if note_lines:
+        note = _NOTE_PREFIX_REGEX.sub("", " ".join(note_lines)).strip() or None
+    return Highlight(text, location, note)
+
+
+def iter_highlights(lines: Iterable[str]) -> Iterator[Highlight]:
+    """`## Highlights`以降の行からハイライトを順に返す。
+
+    1行ずつ処理し、ファイル全体を読み込まない。ハイライトは`---`の行で区切られ、
+    `— location: [...]`の行までが本文、その後の行がメモになる。本文が複数行にわたる
+    ハイライトや、位置情報のないハイライトもそのまま1件として扱う。
+
+    Args:
+        lines (Iterable[str]): ハイライトセクションの行（ファイルオブジェクトの続きをそのまま渡せる）。
+
+    Yields:
+        Highlight: ハイライト。
+    """
+
+    text_lines: list[str] = []
+    note_lines: list[str] = []
+    location: str | None = None
+    located = False
+
+    for raw in lines:
+        line = raw.strip()
+        if line == "---":
+            highlight = _make_highlight(text_lines, location, note_lines)
+            if highlight is not None:
+                yield highlight
+            text_lines, note_lines, location, located = [], [], None, False
+            continue
+        if not line:
+            continue
+        if located:
+            note_lines.append(line)
+            continue
+        if line[0] == "#" and _HEADING_REGEX.match(line):
+            continue  # 章見出しなど
+        if "—" in line:
+            match = _LOCATION_REGEX.match(line)
+            if match is not None:
+                if match[1]:
+                    text_lines.append(match[1])
+                location = match[2] or match[3]
+                located = True
+                continue
+        text_lines.append(line)
+
+    highlight = _make_highlight(text_lines, location, note_lines)
+    if highlight is not None:
+        yield highlight
+
+
+def parse_highlight_file(path: Path) -> BookHighlights:
+    """ハイライトファイルを1回の走査で読み、書籍情報とハイライトを返す。
+
+    タイトル・著者はFrontmatterから取り（`kindle-sync:`の下でもよい）、
+    なければファイル名をタイトルにする。`## Highlights`見出しより前の
+    メタデータ部分はハイライトとして扱わない。
+
+    Args:
+        path (Path): ハイライトのMarkdownファイル。
+
+    Returns:
+        BookHighlights: 書籍情報とハイライトの一覧。
+    """
+
+    with path.open(encoding="utf-8-sig") as f:
+        lines = iter(f)
+        frontmatter: dict[str, Any] = {}
+        first = next(lines, "")
+        if _FENCE_REGEX.match(first):
+            block: list[str] = []
+            for line in lines:
+                if _FENCE_REGEX.match(line):
+                    break
+                block.append(line)
+            frontmatter = parse_frontmatter(block)
+        else:
+            lines = itertools.chain([first], lines)
+        # 本文の`## Highlights`見出しまで読み飛ばす（見出しのないファイルは本文全体を対象にする）
+        preamble: list[str] = []
+        for line in lines:
+            if _HIGHLIGHTS_HEADING_REGEX.match(line.strip()):
+                highlights = list(iter_highlights(lines))
+                break
+            preamble.append(line)
+        else:
+            highlights = list(iter_highlights(preamble))
+
+    title = _frontmatter_value(frontmatter, "title") or path.stem
+    author = _frontmatter_value(frontmatter, "author")
+    return BookHighlights(title, author, frontmatter, highlights)
+
+
+def highlights_markdown(highlights: Iterable[Highlight]) -> str:
+    """ハイライトを要約プロンプト用の箇条書きにする。メモは子項目にする。"""
+
+    parts: list[str] = []
+    for highlight in highlights:
+        parts.append(f"- {highlight.text}\n")
+        if highlight.note:
+            parts.append(f"    - メモ: {highlight.note}\n")
+    return "".join(parts)
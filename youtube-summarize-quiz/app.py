@@ -2,6 +2,9 @@ from __future__ import annotations
 
 import signal
 import sys
+import time
+from collections import Counter
+from pathlib import Path
 from typing import Optional
 
 from PySide6 import QtCore, QtGui, QtWidgets
@@ -9,14 +12,25 @@ from PySide6 import QtCore, QtGui, QtWidgets
 from ui.constants import (
     MARKDOWN_PREVIEW_STR,
     SUMMARY_DIR,
+    STATS_STR,
     SUMMARIZE_STR,
     YOUTUBE_SUMMARIZE_STR,
 )
 from ui.pages.markdown import MarkdownPreviewPage
+from ui.pages.stats import StatsPage
 from ui.pages.summarize import SummarizePage
 from ui.pages.youtube import YouTubeSummarizePage
-from ui.workers import QuizWorker, SummarizeWorker
-from summarizer_core import load_gemini_api_key, save_json, summarize_json
+from ui.file_watcher import DirectoryWatcher
+from ui.workers import IndexWorker, PipelineWorker, QuizWorker, RenderWorker, SummarizeWorker
+from search_index import get_search_index
+from srt_parser import load_transcript
+from summarizer_core import load_gemini_api_key, register_urls
+from context_packer import ContextPacker
+from preview_cache import PreviewCache, RenderedPreview
+from quiz_store import ALL_SUMMARIES_SOURCE, content_hash, get_quiz_store, source_key
+import common_setup  # noqa: F401  共有パッケージcommonを読み込めるようにする
+from common.llm_cache import get_llm_cache
+from common.telemetry import get_telemetry
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -28,6 +42,15 @@ class MainWindow(QtWidgets.QMainWindow):
         self._summarize_worker: Optional[SummarizeWorker] = None
         self._markdown_quiz_worker: Optional[QuizWorker] = None
         self._youtube_quiz_worker: Optional[QuizWorker] = None
+        self._pipeline_worker: Optional[PipelineWorker] = None
+        self._context_packer = ContextPacker()
+        self._index_worker: Optional[IndexWorker] = None
+        self._index_dirty = False
+        self._preview_cache = PreviewCache()
+        self._preview_request = 0
+        self._preview_path: Optional[Path] = None
+        self._markdown_quiz_source: Optional[str] = None
+        self._youtube_quiz_hash: Optional[str] = None
 
         self.stack = QtWidgets.QStackedWidget()
         self.setCentralWidget(self.stack)
@@ -35,22 +58,42 @@ class MainWindow(QtWidgets.QMainWindow):
         self.summarize_page = SummarizePage()
         self.markdown_page = MarkdownPreviewPage()
         self.youtube_page = YouTubeSummarizePage()
+        self.stats_page = StatsPage()
 
         self.stack.addWidget(self.markdown_page)
         self.stack.addWidget(self.youtube_page)
         self.stack.addWidget(self.summarize_page)
+        self.stack.addWidget(self.stats_page)
 
         self.summarize_page.summarizeRequested.connect(self._on_summarize_requested)
         self.markdown_page.fileSelected.connect(self._on_markdown_file_selected)
         self.markdown_page.quizRequested.connect(self._on_markdown_quiz_requested)
-        self.youtube_page.urlSubmitted.connect(self._on_url_submitted)
+        self.markdown_page.searchRequested.connect(self._on_search_requested)
+        self.markdown_page.searchHitSelected.connect(self._on_search_hit_selected)
+        self.youtube_page.urlsSubmitted.connect(self._on_urls_submitted)
         self.youtube_page.summarizeRequested.connect(self._on_youtube_summarize_requested)
+        self.youtube_page.cancelRequested.connect(self._on_youtube_cancel_requested)
         self.youtube_page.quizRequested.connect(self._on_youtube_quiz_requested)
+        self.stats_page.refreshRequested.connect(self._refresh_stats)
 
         self.pool = QtCore.QThreadPool.globalInstance()
 
+        # summary/ の増減はF5を待たずに一覧へ反映する
+        self._summary_watcher = DirectoryWatcher(SUMMARY_DIR, "*.md", self)
+        self._summary_watcher.filesAdded.connect(self._on_summary_files_added)
+        self._summary_watcher.filesRemoved.connect(self._on_summary_files_removed)
+        self._summary_watcher.fileChanged.connect(self._on_preview_file_changed)
+
         self._build_menu()
 
+        self.cache_label = QtWidgets.QLabel()
+        self.statusBar().addPermanentWidget(self.cache_label)
+        self._cache_timer = QtCore.QTimer(self)
+        self._cache_timer.setInterval(1000)
+        self._cache_timer.timeout.connect(self._refresh_cache_status)
+        self._cache_timer.start()
+        self._refresh_cache_status()
+
         self.load_file_list()
         self.statusBar().showMessage("準備完了")
 
@@ -77,6 +120,11 @@ class MainWindow(QtWidgets.QMainWindow):
         act_youtube.triggered.connect(lambda: self.switch_page(2))
         menu_view.addAction(act_youtube)
 
+        act_stats = QtGui.QAction(STATS_STR + "(&T)", self)
+        act_stats.setShortcut("Ctrl+4")
+        act_stats.triggered.connect(lambda: self.switch_page(3))
+        menu_view.addAction(act_stats)
+
         menu_view.addSeparator()
 
         act_reload = QtGui.QAction("ファイル一覧を再読込(&R)", self)
@@ -101,6 +149,13 @@ class MainWindow(QtWidgets.QMainWindow):
             + " \nF5: ファイル一覧再読込",
         )
 
+    @QtCore.Slot()
+    def _refresh_cache_status(self) -> None:
+        stats = get_llm_cache().stats()
+        self.cache_label.setText(
+            f"キャッシュ hit: {stats['hits']} / miss: {stats['misses']}"
+        )
+
     # ---------------------------
     # 画面切替
     # ---------------------------
@@ -110,35 +165,146 @@ class MainWindow(QtWidgets.QMainWindow):
             name = SUMMARIZE_STR
         elif index == 1:
             name = MARKDOWN_PREVIEW_STR
+        elif index == 3:
+            name = STATS_STR
+            self._refresh_stats()
         else:
             name = YOUTUBE_SUMMARIZE_STR
         self.statusBar().showMessage(f"{name} に切り替えました")
 
+    @QtCore.Slot()
+    def _refresh_stats(self) -> None:
+        telemetry = get_telemetry()
+        self.stats_page.set_summary(telemetry.summary(), telemetry.render_prometheus())
+
     # ---------------------------
     # Markdown一覧・表示
     # ---------------------------
     def load_file_list(self) -> None:
-        self.markdown_page.set_files([])
+        self._refresh_search_index()
+        files = self._summary_watcher.rescan()
+        self.markdown_page.set_files(files)
         if SUMMARY_DIR.exists():
-            files = sorted(f.name for f in SUMMARY_DIR.glob("*.md"))
-            self.markdown_page.set_files(files)
             self.statusBar().showMessage("Markdownファイル一覧を更新しました")
         else:
             self.statusBar().showMessage("summary フォルダが見つかりません")
 
+    @QtCore.Slot(list)
+    def _on_summary_files_added(self, names: list) -> None:
+        self.markdown_page.add_files(names)
+        self._refresh_search_index()
+
+    @QtCore.Slot(list)
+    def _on_summary_files_removed(self, names: list) -> None:
+        self.markdown_page.remove_files(names)
+        for name in names:
+            self._preview_cache.discard(SUMMARY_DIR / name)
+        self._refresh_search_index()
+
     @QtCore.Slot(str)
     def _on_markdown_file_selected(self, filename: str) -> None:
-        file_path = SUMMARY_DIR / filename
+        self._show_markdown_file(SUMMARY_DIR / filename)
+
+    def _show_markdown_file(self, file_path: Path) -> None:
+        """描画済みならすぐ表示し、なければ描画スレッドで読み込んでから表示する。"""
+
+        self._preview_request += 1
+        self._preview_path = file_path
+        self._summary_watcher.watch_file(file_path)
+        cached = self._preview_cache.get(file_path)
+        if cached is not None:
+            self._show_preview(cached)
+            return
+
+        self.statusBar().showMessage(f"読み込み中: {file_path.name}")
+        worker = RenderWorker(self._preview_request, file_path, self._preview_cache)
+        worker.signals.finished.connect(self._on_preview_rendered)
+        self.pool.start(worker)
+
+    def _show_preview(self, preview: RenderedPreview) -> None:
+        self.markdown_page.set_markdown_content(preview.markdown, preview.html)
+        self._show_stored_quiz(source_key(Path(preview.path)), preview.markdown)
+        self.statusBar().showMessage(f"読み込み: {Path(preview.path).name}")
+
+    def _show_stored_quiz(self, source: str, content: str) -> None:
+        """保存済みの問題があれば表示する（LLMは呼ばない）。"""
+
+        self._markdown_quiz_source = source
+        stored = get_quiz_store().get(source, content)
+        self.markdown_page.populate_quiz(self._format_quiz_pairs(stored, len(stored)))
+
+    def _on_preview_rendered(self, request_id: int, status: str, payload: object) -> None:
+        if request_id != self._preview_request:
+            return  # 描画中に別のファイルが選ばれた（結果はキャッシュに残っている）
+        if status == "ok":
+            self._show_preview(payload)
+            return
+        self.markdown_page.set_markdown_content("")
+        self.statusBar().showMessage("読み込みに失敗しました")
+        QtWidgets.QMessageBox.warning(self, "エラー", f"読み込みに失敗しました: {payload}")
+
+    @QtCore.Slot(str)
+    def _on_preview_file_changed(self, path: str) -> None:
+        # 書き換えられたファイルはキャッシュから外し、表示中なら描画し直す
+        self._preview_cache.discard(Path(path))
+        if self._preview_path is not None and str(self._preview_path) == path and Path(path).exists():
+            self._show_markdown_file(self._preview_path)
+
+    # ---------------------------
+    # Markdownページ：検索
+    # ---------------------------
+    def _refresh_search_index(self) -> None:
+        if self._index_worker is not None:
+            self._index_dirty = True  # 実行中の更新が終わったらもう一度走らせる
+            return
+        self._index_dirty = False
+        worker = IndexWorker()
+        worker.signals.finished.connect(self._on_index_finished)
+        self._index_worker = worker
+        self.pool.start(worker)
+
+    def _on_index_finished(self, status: str, payload: object) -> None:
+        self._index_worker = None
+        if status != "ok":
+            print(f"検索インデックスの更新に失敗しました: {payload}")
+        elif any(payload.values()):
+            print(f"検索インデックスを更新しました: {payload}")
+        if self._index_dirty:
+            self._refresh_search_index()
+
+    @QtCore.Slot(str)
+    def _on_search_requested(self, query: str) -> None:
+        if not query:
+            self.markdown_page.set_search_results(None)
+            return
+        start = time.perf_counter()
+        hits = get_search_index().search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.markdown_page.set_search_results(
+            (f"[{hit.label}] {hit.title}", hit.path) for hit in hits
+        )
+        self.statusBar().showMessage(f"検索: {len(hits)}件（{elapsed:.0f}ms）")
+
+    @QtCore.Slot(str)
+    def _on_search_hit_selected(self, path: str) -> None:
+        file_path = Path(path)
+        if file_path.suffix == ".md":
+            self._show_markdown_file(file_path)
+            return
+        self._preview_request += 1  # 描画中のMarkdownがあっても上書きさせない
+        self._preview_path = None
+        self._summary_watcher.watch_file(None)
         try:
-            content = file_path.read_text(encoding="utf-8")
+            lines, _ = load_transcript(file_path)
+            content = "\n\n".join(lines)
         except Exception as exc:  # noqa: BLE001
             self.markdown_page.set_markdown_content("")
-            self.markdown_page.populate_quiz([])
             self.statusBar().showMessage("読み込みに失敗しました")
             QtWidgets.QMessageBox.warning(self, "エラー", f"読み込みに失敗しました: {exc}")
             return
 
         self.markdown_page.set_markdown_content(content)
+        self._show_stored_quiz(source_key(file_path), content)
         self.statusBar().showMessage(f"読み込み: {file_path.name}")
 
     # ---------------------------
@@ -147,10 +313,19 @@ class MainWindow(QtWidgets.QMainWindow):
     @QtCore.Slot(str, int)
     def _on_summarize_requested(self, text: str, max_sentences: int) -> None:
         worker = SummarizeWorker(text, max_sentences)
+        worker.signals.chunk.connect(self.summarize_page.append_chunk)
+        worker.signals.timing.connect(self._on_summarize_timing)
         worker.signals.finished.connect(self._on_summarize_finished)
         self._summarize_worker = worker
         self.pool.start(worker)
 
+    @QtCore.Slot(float, float)
+    def _on_summarize_timing(self, first_token: float, total: float) -> None:
+        print(f"summarize: ttft={first_token:.2f}s total={total:.2f}s")
+        self.statusBar().showMessage(
+            f"要約完了（初回応答 {first_token:.1f}秒 / 合計 {total:.1f}秒）"
+        )
+
     def _on_summarize_finished(self, status: str, payload: str) -> None:
         self._summarize_worker = None
         self.summarize_page.set_busy(False)
@@ -164,29 +339,33 @@ class MainWindow(QtWidgets.QMainWindow):
     # ---------------------------
     @QtCore.Slot(str)
     def _on_markdown_quiz_requested(self, content: str) -> None:
-        worker = QuizWorker(content, 10)
+        # 保存済みの問題に10問追加する（要約が書き換えられていれば作り直す）
+        worker = QuizWorker(content, 10, self._markdown_quiz_source)
         worker.signals.finished.connect(self._on_markdown_quiz_finished)
         self._markdown_quiz_worker = worker
         self.pool.start(worker)
 
     def _on_markdown_quiz_finished(self, status: str, payload: object) -> None:
+        source = self._markdown_quiz_worker.source if self._markdown_quiz_worker else None
         self._markdown_quiz_worker = None
         self.markdown_page.set_busy(False)
 
+        if status == "ok" and source != self._markdown_quiz_source:
+            # 生成中に別のファイルへ移った（問題は保存済みなので、開き直せば表示される）
+            self.statusBar().showMessage("クイズを生成して保存しました")
+            return
         if status == "ok":
             qa_raw = payload if isinstance(payload, list) else []
-            formatted = self._format_quiz_pairs(qa_raw, 10)
+            formatted = self._format_quiz_pairs(qa_raw, len(qa_raw))
             if formatted:
                 self.markdown_page.populate_quiz(formatted)
-                self.statusBar().showMessage("選択したMarkdownからクイズを生成しました（10問）")
+                self.statusBar().showMessage(f"選択したMarkdownからクイズを生成しました（保存済み{len(formatted)}問）")
             else:
-                self.markdown_page.populate_quiz([])
                 self.statusBar().showMessage("クイズを生成できませんでした")
                 QtWidgets.QMessageBox.warning(
                     self, "エラー", "クイズを生成できませんでした。要約内容を確認してください。"
                 )
         else:
-            self.markdown_page.populate_quiz([])
             self.statusBar().showMessage("クイズ生成に失敗しました")
             QtWidgets.QMessageBox.warning(
                 self, "エラー", f"クイズ生成に失敗しました: {payload}"
@@ -195,20 +374,56 @@ class MainWindow(QtWidgets.QMainWindow):
     # ---------------------------
     # YouTubeページ
     # ---------------------------
-    @QtCore.Slot(str)
-    def _on_url_submitted(self, url: str) -> None:
-        print(f"{url=}")
-        result = save_json(url)
-        if result:
-            self.youtube_page.clear_url()
-            self.statusBar().showMessage("URLを登録しました")
+    @QtCore.Slot(list)
+    def _on_urls_submitted(self, urls: list) -> None:
+        results = register_urls(urls)
+        counts = Counter(result.status for result in results)
+        invalid = [result.url for result in results if result.status == "invalid"]
+        message = (
+            f"URLを登録しました（新規{counts['added']}件・登録済み{counts['exists']}件"
+            f"・重複{counts['duplicate']}件・無効{counts['invalid']}件）"
+        )
+        print(message)
+        self.statusBar().showMessage(message)
+        if invalid:
+            # 無効なURLだけ入力欄に残して直せるようにする
+            self.youtube_page.set_urls(invalid)
+            QtWidgets.QMessageBox.warning(self, "error", "Invalid URL\n" + "\n".join(invalid[:20]))
         else:
-            QtWidgets.QMessageBox.warning(self, "error", "Invalid URL")
-            self.statusBar().showMessage("URLの登録に失敗しました")
+            self.youtube_page.clear_url()
 
     @QtCore.Slot()
     def _on_youtube_summarize_requested(self) -> None:
-        summarize_json()
+        if self._pipeline_worker is not None:
+            return
+        self.youtube_page.set_pipeline_busy(True)
+        self.statusBar().showMessage("字幕取得と要約を実行中…")
+        worker = PipelineWorker()
+        worker.signals.progress.connect(self.youtube_page.set_pipeline_progress)
+        worker.signals.finished.connect(self._on_youtube_summarize_finished)
+        self._pipeline_worker = worker
+        self.pool.start(worker)
+
+    @QtCore.Slot()
+    def _on_youtube_cancel_requested(self) -> None:
+        if self._pipeline_worker is None:
+            return
+        self._pipeline_worker.cancel()
+        self.youtube_page.set_pipeline_cancelling()
+        self.statusBar().showMessage("中止しています…")
+
+    def _on_youtube_summarize_finished(self, status: str, payload: object) -> None:
+        self._pipeline_worker = None
+        self.youtube_page.set_pipeline_busy(False)
+        # 新しい要約はファイル監視で一覧に入る。上書きされた要約のために索引だけ更新する
+        self._refresh_search_index()
+        if status == "ok":
+            self.statusBar().showMessage(f"要約が完了しました（{payload}件）")
+        elif status == "cancelled":
+            self.statusBar().showMessage(f"要約を中止しました（{payload}件保存済み）")
+        else:
+            self.statusBar().showMessage("要約に失敗しました")
+            QtWidgets.QMessageBox.warning(self, "エラー", f"要約に失敗しました: {payload}")
 
     @QtCore.Slot()
     def _on_youtube_quiz_requested(self) -> None:
@@ -221,8 +436,18 @@ class MainWindow(QtWidgets.QMainWindow):
             self.statusBar().showMessage("生成可能な要約が見つかりませんでした")
             return
 
+        # 要約の集合が前回と同じなら、まず保存済みの問題を表示する。表示中にもう一度押したら10問追加する
+        stored = get_quiz_store().get(ALL_SUMMARIES_SOURCE, combined_summary)
+        summary_hash = content_hash(combined_summary)
+        if stored and self._youtube_quiz_hash != summary_hash:
+            self._youtube_quiz_hash = summary_hash
+            self.youtube_page.populate_quiz(self._format_quiz_pairs(stored, len(stored)))
+            self.statusBar().showMessage(f"保存済みのクイズを表示しました（{len(stored)}問）")
+            return
+
         self.youtube_page.set_quiz_busy(True)
-        worker = QuizWorker(combined_summary, 10)
+        self._youtube_quiz_hash = summary_hash
+        worker = QuizWorker(combined_summary, 10, ALL_SUMMARIES_SOURCE)
         worker.signals.finished.connect(self._on_youtube_quiz_finished)
         self._youtube_quiz_worker = worker
         self.pool.start(worker)
@@ -233,18 +458,16 @@ class MainWindow(QtWidgets.QMainWindow):
 
         if status == "ok":
             qa_raw = payload if isinstance(payload, list) else []
-            formatted = self._format_quiz_pairs(qa_raw, 10)
+            formatted = self._format_quiz_pairs(qa_raw, len(qa_raw))
             if formatted:
                 self.youtube_page.populate_quiz(formatted)
-                self.statusBar().showMessage("クイズを生成しました（10問）")
+                self.statusBar().showMessage(f"クイズを生成しました（保存済み{len(formatted)}問）")
             else:
-                self.youtube_page.populate_quiz([])
                 self.statusBar().showMessage("クイズを生成できませんでした")
                 QtWidgets.QMessageBox.warning(
                     self, "エラー", "クイズを生成できませんでした。要約内容を確認してください。"
                 )
         else:
-            self.youtube_page.populate_quiz([])
             self.statusBar().showMessage("クイズ生成に失敗しました")
             QtWidgets.QMessageBox.warning(
                 self, "エラー", f"クイズ生成に失敗しました: {payload}"
@@ -269,13 +492,8 @@ class MainWindow(QtWidgets.QMainWindow):
         return formatted
 
     def _collect_all_summaries(self) -> str:
-        collected: list[str] = []
-        for summary_file in sorted(SUMMARY_DIR.glob("*.md")):
-            try:
-                collected.append(summary_file.read_text(encoding="utf-8"))
-            except OSError:
-                continue
-        return "\n\n".join(collected)
+        # 要約が増えてもプロンプトがトークン予算を超えないよう、各動画の代表的な箇条書きだけを詰める
+        return self._context_packer.pack(SUMMARY_DIR)
 
 
 def _install_cli_force_exit(app: QtWidgets.QApplication) -> None:
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable
+
+from tokens import estimate_tokens
+
+
+class TokenBucket:
+    """一定速度で補充されるトークンバケット。
+
+    `capacity`個まで貯まり、1秒あたり`rate`個補充される。
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """`amount`個のトークンが貯まるまで待ってから消費する。"""
+
+        # バケットより大きい要求は永久に満たせないので容量で頭打ちにする
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+class RateLimiter:
+    """リクエスト数/分とトークン数/分の両方を制限する共有リミッター。
+
+    Noneを指定した制限は無効になる。
+    """
+
+    def __init__(self, rpm: int | None = None, tpm: int | None = None):
+        self.requests = TokenBucket(rpm, rpm / 60) if rpm else None
+        self.tokens = TokenBucket(tpm, tpm / 60) if tpm else None
+
+    async def acquire(self, tokens: int) -> None:
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(tokens)
+
+
+@dataclass
+class SummaryJob:
+    """要約1件分の入力。`key`は結果の保存先を決める識別子（タイトルなど）。"""
+
+    key: str
+    contents: str
+
+
+ResultCallback = Callable[[SummaryJob, "str | None", "Exception | None"], None]
+JobProcessor = Callable[[SummaryJob], Awaitable[str]]
+
+
+class AsyncSummarizeEngine:
+    """最大N件を同時に投げる非同期要約エンジン。
+
+    `generate`はプロンプトを受け取って生成テキストを返すコルーチン関数。
+    本番ではGeminiの非同期クライアントを、計測では遅延を入れた偽クライアントを渡す。
+    同時実行数とレート制限は`call`単位で掛かるので、1ジョブが複数回LLMを呼ぶ場合
+    （長い文字起こしの分割要約など）も合計N件までしか同時に投げない。
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str], Awaitable[str]],
+        concurrency: int = 4,
+        rpm: int | None = None,
+        tpm: int | None = None,
+    ):
+        self.generate = generate
+        self.concurrency = max(1, concurrency)
+        self.limiter = RateLimiter(rpm, tpm)
+        self._semaphore: asyncio.Semaphore | None = None
+
+    async def call(self, contents: str) -> str:
+        """同時実行数とレート制限を守ってLLMを1回呼ぶ。"""
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            await self.limiter.acquire(estimate_tokens(contents))
+            return await self.generate(contents)
+
+    async def run(
+        self,
+        jobs: Iterable[SummaryJob],
+        on_result: ResultCallback,
+        process: JobProcessor | None = None,
+        cancelled: Callable[[], bool] | None = None,
+    ) -> int:
+        """全ジョブを処理し、完了した順に`on_result`を呼ぶ。
+
+        `cancelled`がTrueを返すと新しいジョブを取り出さずに終わる。処理中のジョブは
+        最後まで行うので、ジョブの途中で止まることはない。
+
+        Args:
+            jobs (Iterable[SummaryJob]): 要約するジョブ。
+            on_result (ResultCallback): `(job, text, error)`で呼ばれるコールバック。
+                成功時は`error`がNone、失敗時は`text`がNone。
+            process (JobProcessor | None): 1ジョブを処理するコルーチン関数。
+                省略時は`job.contents`をそのまま`call`に渡す。
+            cancelled (Callable[[], bool] | None): 中止要求を確認する関数。
+
+        Returns:
+            int: 成功した件数。
+        """
+
+        if process is None:
+            process = lambda job: self.call(job.contents)  # noqa: E731
+        queue: asyncio.Queue[SummaryJob] = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        succeeded = 0
+
+        async def worker() -> None:
+            nonlocal succeeded
+            while cancelled is None or not cancelled():
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    text = await process(job)
+                except Exception as exc:  # noqa: BLE001
+                    on_result(job, None, exc)
+                else:
+                    succeeded += 1
+                    on_result(job, text, None)
+
+        workers = min(self.concurrency, queue.qsize())
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return succeeded
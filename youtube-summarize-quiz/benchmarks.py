@@ -0,0 +1,787 @@
+"""パイプライン各部の簡易ベンチマーク。
+
+APIやネットワークには接続せず、偽クライアント・合成データで計測する。
+
+    python benchmarks.py async captions srt quiz context search preview quizlist quizbank playlist register journal resilience
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+
+def bench_async_engine(jobs: int = 100, latency: float = 0.05) -> None:
+    """遅延を入れた偽クライアントで非同期要約エンジンの並列度ごとの所要時間を測る。"""
+
+    from async_engine import AsyncSummarizeEngine, SummaryJob
+
+    async def fake_generate(contents: str) -> str:
+        await asyncio.sleep(latency)
+        return contents[:10]
+
+    work = [SummaryJob(str(i), f"動画{i}の文字起こし") for i in range(jobs)]
+    baseline = None
+    print(f"jobs={jobs} latency={latency * 1000:.0f}ms")
+    for concurrency in (1, 2, 4, 8, 16):
+        engine = AsyncSummarizeEngine(fake_generate, concurrency=concurrency)
+        start = time.perf_counter()
+        asyncio.run(engine.run(work, lambda job, text, error: None))
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"  N={concurrency:<3} {elapsed:7.3f}s  speedup x{baseline / elapsed:.1f}")
+
+
+def bench_caption_fetch(videos: int = 40, latency: float = 0.05, setup: float = 0.02) -> None:
+    """偽のYoutubeDLで、旧方式（毎回生成・2回問い合わせ・逐次）と並列1回取得を比べる。"""
+
+    from caption_fetcher import CaptionFetcher
+
+    class FakeYoutubeDL:
+        def __init__(self, opts: dict) -> None:
+            time.sleep(setup)  # インスタンス生成時の初期化コスト
+
+        def download(self, urls: list[str]) -> int:
+            time.sleep(latency)
+            return 0
+
+        def extract_info(self, url: str, download: bool = True) -> dict:
+            time.sleep(latency)
+            return {"id": url[-11:], "title": f"title-{url[-11:]}"}
+
+    urls = [f"https://www.youtube.com/watch?v={i:011d}" for i in range(videos)]
+    print(f"videos={videos} latency={latency * 1000:.0f}ms setup={setup * 1000:.0f}ms")
+
+    start = time.perf_counter()
+    for url in urls:
+        ydl = FakeYoutubeDL({})
+        ydl.download([url])
+        ydl.extract_info(url, download=False)
+    legacy = time.perf_counter() - start
+    print(f"  legacy          {legacy:7.3f}s")
+
+    for workers in (1, 4, 8):
+        fetcher = CaptionFetcher(max_workers=workers, extractor_factory=FakeYoutubeDL)
+        start = time.perf_counter()
+        fetcher.fetch_all(((url, url) for url in urls), lambda key, info, error: None)
+        elapsed = time.perf_counter() - start
+        print(f"  single-pass N={workers:<2} {elapsed:7.3f}s  x{legacy / elapsed:.1f}")
+
+
+def _write_rolling_srt(path, target_bytes: int) -> int:
+    """YouTube自動字幕のようなローリング表示のSRTを指定サイズまで書き出す。"""
+
+    words = ["今日は", "機械学習の", "基礎について", "説明します", "まず", "データを", "集めて", "前処理を", "行います"]
+    written = 0
+    index = 0
+    previous = ""
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target_bytes:
+            index += 1
+            line = "".join(words[(index + k) % len(words)] for k in range(3))
+            start = index * 2
+            block = (
+                f"{index}\n00:{start // 60 % 60:02d}:{start % 60:02d},000 --> "
+                f"00:{(start + 2) // 60 % 60:02d}:{(start + 2) % 60:02d},000\n"
+                f"{previous}\n{line}\n\n"
+            )
+            f.write(block)
+            written += len(block.encode("utf-8"))
+            previous = line
+    return index
+
+
+def bench_srt_parser(megabytes: int = 10) -> None:
+    """10MBのローリング字幕で、旧正規表現方式とストリーミングパーサーを比べる。"""
+
+    import re
+    import tempfile
+    import tracemalloc
+    from pathlib import Path
+
+    from srt_parser import load_transcript
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.ja.srt"
+        cues = _write_rolling_srt(path, megabytes * 1024 * 1024)
+        print(f"size={path.stat().st_size / 1024 / 1024:.1f}MB cues={cues}")
+
+        def legacy() -> list[str]:
+            text = path.read_text(encoding="utf-8")
+            return re.findall(r"\d\n.*\n(.*)\n", text)
+
+        def measure(func):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            # メモリ計測はトレースのオーバーヘッドが大きいので別に1回実行する
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return result, elapsed, peak
+
+        lines, elapsed, peak = measure(legacy)
+        print(
+            f"  regex     {elapsed:6.2f}s peak={peak / 1024 / 1024:6.1f}MB lines={len(lines)} "
+            f"chars={sum(map(len, lines))} (2行目以降のキュー行は欠落)"
+        )
+        (lines, stats), elapsed, peak = measure(lambda: load_transcript(path))
+        print(
+            f"  streaming {elapsed:6.2f}s peak={peak / 1024 / 1024:6.1f}MB lines={len(lines)} "
+            f"chars={sum(map(len, lines))} tokens {stats.original_tokens}->{stats.kept_tokens}"
+        )
+
+        # 間を置いて前のキューと同じ言葉で始まる発話は残し、続けて伸びていく行だけを削る
+        repeat = Path(tmp) / "repeat.ja.srt"
+        repeat.write_text(
+            "1\n00:00:01,000 --> 00:00:01,500\nはい\n\n"
+            "2\n00:00:03,000 --> 00:00:05,000\nはい、では始めます\n\n"
+            "3\n00:00:05,000 --> 00:00:07,000\nはい、では始めます 今日は\n\n",
+            encoding="utf-8",
+        )
+        expected = ["はい", "はい、では始めます", "今日は"]
+        lines, _ = load_transcript(repeat)
+        print(f"  repeated words {lines} ok={lines == expected}")
+
+
+def bench_quiz_batch(docs: int = 40, n_per_doc: int = 3, latency: float = 0.05, fail_rate: float = 0.1) -> None:
+    """偽のLLMで、要約1件ずつのクイズ生成とまとめて生成する経路のリクエスト数・トークン数を比べる。
+
+    偽のLLMはまとめたリクエストの一部の文書をわざと欠落させ、フォールバックも計測に含める。
+    """
+
+    import json
+    import random
+    import re
+
+    from quiz_batch import SINGLE_QUIZ_PROMPT, make_quiz_batch, qa_pairs
+    from tokens import estimate_tokens
+
+    rng = random.Random(0)
+    section = "## 見出し\n- 機械学習のモデルは学習データから特徴を学ぶ。\n- 過学習を防ぐために正則化を行う。\n"
+    summaries = {f"video-{i}.md": f"# 動画{i}\n" + section * 20 for i in range(docs)}
+    calls = {"requests": 0, "tokens": 0}
+
+    def quiz(n: int) -> list[dict[str, str]]:
+        return [{"Q": f"問題{k}", "A": f"解答{k}"} for k in range(n)]
+
+    def fake_llm(prompt: str) -> str:
+        calls["requests"] += 1
+        calls["tokens"] += estimate_tokens(prompt)
+        time.sleep(latency)
+        ids = re.findall(r'<doc id="(d\d+)">', prompt)
+        if not ids:
+            return json.dumps(quiz(n_per_doc), ensure_ascii=False)
+        return json.dumps({i: quiz(n_per_doc) for i in ids if rng.random() >= fail_rate}, ensure_ascii=False)
+
+    def single(markdown: str, n: int) -> list[tuple[str, str]]:
+        return qa_pairs(json.loads(fake_llm(SINGLE_QUIZ_PROMPT.format(n=n) + markdown)), n)
+
+    print(f"docs={docs} n_per_doc={n_per_doc} latency={latency * 1000:.0f}ms fail_rate={fail_rate:.0%}")
+    start = time.perf_counter()
+    for markdown in summaries.values():
+        single(markdown, n_per_doc)
+    elapsed = time.perf_counter() - start
+    print(f"  single  {elapsed:6.2f}s requests={calls['requests']:<4} prompt_tokens={calls['tokens']}")
+
+    calls.update(requests=0, tokens=0)
+    start = time.perf_counter()
+    results = make_quiz_batch(summaries, n_per_doc, fake_llm, single)
+    elapsed = time.perf_counter() - start
+    complete = sum(len(pairs) == n_per_doc for pairs in results.values())
+    print(
+        f"  batch   {elapsed:6.2f}s requests={calls['requests']:<4} prompt_tokens={calls['tokens']} "
+        f"complete={complete}/{docs}"
+    )
+
+
+def bench_context_packer(videos: int = 500, budget: int = 12000) -> None:
+    """合成した要約`videos`本で、全文連結とトークン予算付きパックの大きさ・所要時間を比べる。"""
+
+    import random
+    import tempfile
+    from pathlib import Path
+
+    from context_packer import ContextPacker
+    from tokens import estimate_tokens
+
+    rng = random.Random(0)
+    topics = ["機械学習", "統計", "料理", "歴史", "投資", "筋トレ", "英語学習", "睡眠", "プログラミング", "宇宙"]
+    phrases = ["の基本的な考え方", "でよくある誤解", "を続けるコツ", "の具体例", "の注意点", "の歴史的背景"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        summary_dir = Path(tmp)
+        for i in range(videos):
+            topic = topics[i % len(topics)]
+            lines = [f"# 動画{i}: {topic}"]
+            for h in range(4):
+                lines.append(f"## {topic}{phrases[h]}")
+                for b in range(6):
+                    lines.append(f"- {topic}{rng.choice(phrases)}として、動画{i}固有の要点{h}-{b}を説明している。")
+            (summary_dir / f"video{i}.md").write_text("\n".join(lines), encoding="utf-8")
+
+        full = "\n\n".join(p.read_text(encoding="utf-8") for p in sorted(summary_dir.glob("*.md")))
+        print(f"videos={videos} budget={budget} full_tokens={estimate_tokens(full)}")
+
+        packer = ContextPacker(budget)
+        start = time.perf_counter()
+        context = packer.pack(summary_dir)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        packer.pack(summary_dir)
+        cached = time.perf_counter() - start
+        covered = len({line for line in context.splitlines() if line.startswith("# video")})
+        print(
+            f"  packed tokens={estimate_tokens(context)} covered={covered}/{videos} "
+            f"cold={cold * 1000:.0f}ms cached={cached * 1000:.1f}ms"
+        )
+
+
+def bench_search(docs: int = 10000) -> None:
+    """合成した`docs`件の文書で索引の作成時間・差分更新・検索レイテンシを測る。"""
+
+    import random
+    import statistics
+    import tempfile
+    from pathlib import Path
+
+    from search_index import SearchIndex, Source, _load_markdown
+
+    rng = random.Random(0)
+    words = [
+        "機械学習", "統計", "料理", "歴史", "投資", "筋トレ", "英語", "睡眠", "プログラミング", "宇宙",
+        "データ", "モデル", "習慣", "集中", "記憶", "経済", "心理学", "健康", "読書", "文章",
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = Path(tmp) / "summary"
+        source_dir.mkdir()
+        for i in range(docs):
+            body = "\n".join(
+                f"- {rng.choice(words)}と{rng.choice(words)}の関係について説明している。" for _ in range(12)
+            )
+            (source_dir / f"doc{i}.md").write_text(f"# 文書{i}\n{body}\n", encoding="utf-8")
+
+        db_path = Path(tmp) / "index.db"
+        sources = [Source("summary", source_dir, "*.md", _load_markdown)]
+        index = SearchIndex(db_path, sources)
+        start = time.perf_counter()
+        counts = index.refresh()
+        print(f"docs={docs} build={time.perf_counter() - start:.1f}s {counts} {index.stats()}")
+
+        (source_dir / "doc0.md").write_text("# 文書0\n- 量子コンピュータの話\n", encoding="utf-8")
+        start = time.perf_counter()
+        counts = index.refresh()
+        print(f"  incremental refresh {time.perf_counter() - start:.3f}s {counts}")
+
+        # 別インスタンスで開き直しても作り直さずに検索できる
+        index = SearchIndex(db_path, sources)
+        queries = ["機械学習", "心理学と記憶", "量子コンピュータ", "投資", "睡", "プログラミング 習慣"]
+        for query in queries:
+            index.search(query)  # 文書長のロードを除いて計測する
+            latencies = []
+            for _ in range(20):
+                start = time.perf_counter()
+                hits = index.search(query, limit=20)
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            print(
+                f"  {query!r:<22} p50={statistics.median(latencies) * 1000:5.1f}ms "
+                f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:5.1f}ms hits={len(hits)} "
+                f"top={hits[0].title if hits else '-'}"
+            )
+
+
+def bench_preview_cache(files: int = 8, kilobytes: int = 512, clicks: int = 200, render_ms: float = 1.0) -> None:
+    """大きな要約`files`件を行き来するクリックで、毎回の読み込み＋描画とプレビューキャッシュを比べる。
+
+    PySide6なしで動かすため、描画は1KBあたり`render_ms`ミリ秒かかる偽の変換で代用する。
+    """
+
+    import html
+    import tempfile
+    from pathlib import Path
+
+    from preview_cache import PreviewCache
+
+    def fake_render(markdown: str) -> str:
+        time.sleep(len(markdown.encode("utf-8")) / 1024 * render_ms / 1000)
+        return "<p>" + html.escape(markdown) + "</p>"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(files):
+            path = Path(tmp) / f"summary{i}.md"
+            line = f"- 要約{i}の箇条書き。内容の説明がしばらく続く。\n"
+            path.write_text(line * (kilobytes * 1024 // len(line.encode("utf-8"))), encoding="utf-8")
+            paths.append(path)
+        order = [paths[i % 2] for i in range(clicks)]  # 2件を交互にクリックする
+
+        start = time.perf_counter()
+        for path in order[:20]:
+            fake_render(path.read_text(encoding="utf-8"))
+        legacy = (time.perf_counter() - start) / 20
+
+        cache = PreviewCache(max_entries=4)
+        for path in order[:2]:
+            cache.load(path, fake_render)
+        start = time.perf_counter()
+        for path in order:
+            cache.load(path, fake_render)
+        cached = (time.perf_counter() - start) / clicks
+
+        for path in paths:  # 上限を超えて開くと古いものから捨てられる
+            cache.load(path, fake_render)
+        print(
+            f"files={files} size={kilobytes}KB legacy={legacy * 1000:.1f}ms/click "
+            f"cached={cached * 1000:.2f}ms/click {cache.stats()}"
+        )
+
+
+def bench_quiz_list(items: int = 10000) -> None:
+    """`items`問のクイズ表示で、1問ごとのウィジェット生成と仮想化リストの表示・破棄時間を比べる。
+
+    画面なしで動かすためQtのoffscreenプラットフォームを使う。
+    """
+
+    import os
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6 import QtCore, QtWidgets
+
+    from ui.widgets import QuizListView
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    pairs = [(f"問題{i}: {'長めの設問文 ' * (i % 5 + 1)}", f"答え{i}") for i in range(items)]
+
+    def legacy_item(question: str, answer: str) -> QtWidgets.QWidget:
+        # 以前のQAItemと同じ構成（ボタン＋ラベル＋レイアウト）
+        widget = QtWidgets.QWidget()
+        button = QtWidgets.QToolButton()
+        button.setText(question)
+        button.setCheckable(True)
+        button.setArrowType(QtCore.Qt.ArrowType.RightArrow)
+        label = QtWidgets.QLabel(answer)
+        label.setWordWrap(True)
+        label.setVisible(False)
+        layout = QtWidgets.QVBoxLayout(widget)
+        layout.addWidget(button)
+        layout.addWidget(label)
+        return widget
+
+    scroll = QtWidgets.QScrollArea()
+    scroll.setWidgetResizable(True)
+    container = QtWidgets.QWidget()
+    container_layout = QtWidgets.QVBoxLayout(container)
+    scroll.setWidget(container)
+    scroll.resize(600, 400)
+    scroll.show()
+    start = time.perf_counter()
+    for question, answer in pairs:
+        container_layout.addWidget(legacy_item(question, answer))
+    app.processEvents()
+    legacy_fill = time.perf_counter() - start
+    start = time.perf_counter()
+    while container_layout.count():
+        container_layout.takeAt(0).widget().deleteLater()
+    app.sendPostedEvents(None, QtCore.QEvent.Type.DeferredDelete)
+    legacy_clear = time.perf_counter() - start
+    scroll.close()
+
+    view = QuizListView()
+    view.resize(600, 400)
+    view.show()
+    start = time.perf_counter()
+    view.set_pairs(pairs)
+    app.processEvents()
+    shown = time.perf_counter() - start
+    deadline = time.perf_counter() + 30
+    while view.verticalScrollBar().maximum() < items and time.perf_counter() < deadline:
+        app.processEvents()  # Batchedレイアウトが最後の行まで進むのを待つ
+    laid_out = time.perf_counter() - start
+    start = time.perf_counter()
+    view.set_pairs([])
+    app.processEvents()
+    cleared = time.perf_counter() - start
+    view.close()
+
+    print(
+        f"items={items} widgets: fill={legacy_fill:.2f}s clear={legacy_clear:.2f}s  "
+        f"list view: first paint={shown * 1000:.0f}ms full layout={laid_out:.2f}s clear={cleared * 1000:.0f}ms"
+    )
+
+
+def bench_quiz_bank(sources: int = 500, per_source: int = 30) -> None:
+    """`sources`件の要約に`per_source`問ずつ保存した問題バンクから、1件分を読み出す時間を測る。"""
+
+    import statistics
+    import tempfile
+    from pathlib import Path
+
+    from quiz_store import QuizStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = QuizStore(Path(tmp) / "quiz.db")
+        start = time.perf_counter()
+        for i in range(sources):
+            store.add(f"summary/doc{i}.md", f"# 要約{i}", [(f"問題{i}-{j}", f"答え{j}") for j in range(per_source)])
+        build = time.perf_counter() - start
+
+        latencies = []
+        for i in range(0, sources, max(sources // 100, 1)):
+            start = time.perf_counter()
+            pairs = store.get(f"summary/doc{i}.md", f"# 要約{i}")
+            latencies.append(time.perf_counter() - start)
+        print(
+            f"sources={sources} items={store.stats()['items']} insert={build:.2f}s "
+            f"get p50={statistics.median(latencies) * 1000:.2f}ms max={max(latencies) * 1000:.2f}ms ({len(pairs)}問)"
+        )
+
+
+def bench_playlist(videos: int = 1000, latency: float = 0.03) -> None:
+    """ローカルの偽YouTube Data APIで、再生リストの初回取り込み・未変更時・追加時の再取得を測る。"""
+
+    import hashlib
+    import json
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from pathlib import Path
+    from urllib.parse import parse_qs, urlparse
+
+    from playlist_ingest import PAGE_SIZE, PlaylistClient, ingest_playlist
+    from video_store import VideoStore
+
+    playlist = [f"vid{i:08d}" for i in range(videos)]
+    stats = {"requests": 0, "not_modified": 0, "bytes": 0}
+
+    class FakeApi(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self) -> None:
+            time.sleep(latency)
+            query = parse_qs(urlparse(self.path).query)
+            start = int(query.get("pageToken", ["p0"])[0][1:])
+            size = min(int(query["maxResults"][0]), PAGE_SIZE)
+            page = playlist[start:start + size]
+            data = {"items": [{"snippet": {"title": f"動画{v}", "resourceId": {"videoId": v}}} for v in page]}
+            if start + size < len(playlist):
+                data["nextPageToken"] = f"p{start + size}"
+            body = json.dumps(data).encode("utf-8")
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            stats["requests"] += 1
+            if self.headers.get("If-None-Match") == etag:
+                stats["not_modified"] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            stats["bytes"] += len(body)
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_port}/youtube/v3/playlistItems"
+
+    def measure(label: str, client: PlaylistClient, store: VideoStore) -> None:
+        stats.update(requests=0, not_modified=0, bytes=0)
+        start = time.perf_counter()
+        result = ingest_playlist("PLbenchmark000000", store, client)
+        print(
+            f"  {label:<10} {time.perf_counter() - start:.2f}s requests={stats['requests']}"
+            f" 304={stats['not_modified']} body={stats['bytes'] / 1024:.0f}KB"
+            f" total={result.total} added={len(result.added)}"
+        )
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VideoStore(Path(tmp) / "videos.db")
+            client = PlaylistClient("dummy-key", endpoint=endpoint)
+            print(f"playlist={videos} videos, {latency * 1000:.0f}ms/request (旧実装は先頭{PAGE_SIZE}本のみ取得)")
+            measure("initial", client, store)
+            measure("unchanged", client, store)
+            playlist.extend(f"new{i:08d}" for i in range(30))
+            measure("appended", client, store)
+    finally:
+        server.shutdown()
+
+
+def bench_register_urls(urls: int = 500) -> None:
+    """`urls`件のURL貼り付けを、旧JSON方式・1件ずつの登録・`register_urls`で比べる。"""
+
+    import json
+    import random
+    import re
+    import tempfile
+    from pathlib import Path
+
+    from summarizer_core import register_urls
+    from video_store import VideoStore, extract_video_id
+
+    rng = random.Random(0)
+    ids = [f"{i:011d}" for i in range(urls)]
+    forms = [
+        "https://www.youtube.com/watch?v={}",
+        "https://youtu.be/{}?si=abc",
+        "https://youtube.com/shorts/{}",
+        "https://m.youtube.com/watch?feature=share&v={}",
+    ]
+    pasted = [rng.choice(forms).format(video_id) for video_id in ids]
+    pasted += [rng.choice(forms).format(rng.choice(ids)) for _ in range(urls // 10)]  # 重複
+    pasted += ["https://example.com/not-youtube"] * 5
+
+    def legacy_json(path: Path, url: str) -> None:
+        # 元のsave_json: 毎回正規表現を作り、全件を解析して重複を調べ、ファイル全体を書き直す
+        regex = re.compile(r"^(?:https?://)?(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)([\w\-]{11})(?:$|[&#?])")
+        match = regex.search(url.strip())
+        if not match:
+            return
+        links = json.loads(path.read_text(encoding="utf-8"))
+        if any(regex.search(link["url"]).group(1) == match.group(1) for link in links):
+            return
+        links.append({"url": url, "done": False, "title": None, "LLM_gen": False})
+        path.write_text(json.dumps(links, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        links_path = Path(tmp) / "youtube_links.json"
+        links_path.write_text("[]", encoding="utf-8")
+        start = time.perf_counter()
+        for url in pasted:
+            legacy_json(links_path, url)
+        legacy = time.perf_counter() - start
+
+        store = VideoStore(Path(tmp) / "single.db")
+        start = time.perf_counter()
+        for url in pasted:
+            video_id = extract_video_id(url)
+            if video_id is not None:
+                store.add(video_id, url)
+        single = time.perf_counter() - start
+
+        store = VideoStore(Path(tmp) / "bulk.db")
+        start = time.perf_counter()
+        results = register_urls(pasted, store)
+        bulk = time.perf_counter() - start
+        statuses = {s: sum(r.status == s for r in results) for s in ("added", "exists", "duplicate", "invalid")}
+        print(
+            f"urls={len(pasted)} json={legacy:.2f}s per-url={single:.2f}s "
+            f"register_urls={bulk * 1000:.0f}ms {statuses} registered={store.counts()['total']}"
+        )
+
+
+def bench_journal(events: int = 2000) -> None:
+    """状態変化1件ごとの書き込みを、JSON全体の書き直しとジャーナルへの追記でライブラリの大きさ別に比べる。
+
+    あわせて1万件分のジャーナルの再生とスナップショットへの圧縮の時間を測る。
+    """
+
+    import json
+    import tempfile
+    from pathlib import Path
+
+    from pipeline_journal import PipelineJournal
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for size in (100, 1000, 10000):
+            links = [
+                {"url": f"https://www.youtube.com/watch?v={i:011d}", "done": False, "title": None, "LLM_gen": False}
+                for i in range(size)
+            ]
+            links_path = tmp / f"links{size}.json"
+            rounds = max(events * 100 // size, 20)
+            start = time.perf_counter()
+            for i in range(rounds):
+                # 旧方式: 1件の状態が変わるたびにファイル全体を書き直す
+                links[i % size]["done"] = True
+                links_path.write_text(json.dumps(links, ensure_ascii=False, indent=2), encoding="utf-8")
+            rewrite = (time.perf_counter() - start) / rounds
+
+            journal = PipelineJournal(tmp / f"journal{size}.jsonl", tmp / f"snapshot{size}.json")
+            journal.seed({f"{i:011d}": {"url": links[i]["url"]} for i in range(size)})
+            start = time.perf_counter()
+            for i in range(events):
+                journal.append("captioned", f"{i % size:011d}", title=f"動画{i}", captioned=1)
+            journal.flush()
+            append = (time.perf_counter() - start) / events
+            journal.close()
+            print(
+                f"library={size:<6} json rewrite={rewrite * 1e6:8.0f}us/event  "
+                f"journal append={append * 1e6:6.1f}us/event (fsync {journal.fsync_events}件ごと)"
+            )
+
+        journal = PipelineJournal(tmp / "replay.jsonl", tmp / "replay.json", compact_events=10**9)
+        for i in range(10000):
+            journal.append("added", f"{i:011d}", url=f"https://www.youtube.com/watch?v={i:011d}")
+        for i in range(0, 10000, 2):
+            journal.append("summarized", f"{i:011d}", summarized=1)
+        journal.flush()
+        start = time.perf_counter()
+        videos, seq = journal.replay()
+        replay = time.perf_counter() - start
+        start = time.perf_counter()
+        journal.compact()
+        compact = time.perf_counter() - start
+        start = time.perf_counter()
+        journal.replay()
+        after = time.perf_counter() - start
+        journal.close()
+        print(
+            f"replay {seq} events -> {len(videos)} videos: {replay * 1000:.0f}ms  "
+            f"compact: {compact * 1000:.0f}ms  replay after compact: {after * 1000:.0f}ms"
+        )
+
+
+def bench_resilience(jobs: int = 200, workers: int = 16, capacity: int = 4, latency: float = 0.05) -> None:
+    """ローカルの偽Gemini APIで、429・503を返すときのリトライなし・バックオフのみ・Resilienceを比べる。
+
+    偽サーバーは同時に`capacity`件を超えるリクエストに429（Retry-After: 1）を返し、
+    全体の半分を処理した時点から1.5秒間は全リクエストに503を返す（障害）。
+    """
+
+    import json
+    import threading
+    import urllib.error
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    import common_setup  # noqa: F401
+    from common.resilience import AdaptiveLimiter, CircuitBreaker, Resilience, RetryPolicy
+
+    state = {"in_flight": 0, "ok": 0, "429": 0, "503": 0, "outage_until": 0.0, "outage_done": False}
+    lock = threading.Lock()
+
+    class FakeGemini(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                now = time.monotonic()
+                if not state["outage_done"] and state["ok"] >= jobs // 2:
+                    state["outage_done"] = True
+                    state["outage_until"] = now + 1.5
+                if now < state["outage_until"]:
+                    state["503"] += 1
+                    status, headers = 503, {}
+                elif state["in_flight"] >= capacity:
+                    state["429"] += 1
+                    status, headers = 429, {"Retry-After": "1"}
+                else:
+                    state["in_flight"] += 1
+                    status, headers = 200, {}
+            if status == 200:
+                time.sleep(latency)
+                with lock:
+                    state["in_flight"] -= 1
+                    state["ok"] += 1
+            body = json.dumps({"text": "要約"} if status == 200 else {"error": {"code": status}}).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = 128
+
+    server = Server(("127.0.0.1", 0), FakeGemini)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_port}/v1beta/models/fake:generateContent"
+
+    def generate(i: int) -> str:
+        # urllibのHTTPErrorは`code`と`headers`を持つので、genaiのAPIErrorと同じように分類される
+        request = urllib.request.Request(endpoint, data=json.dumps({"contents": f"動画{i}"}).encode(), method="POST")
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())["text"]
+
+    def measure(label: str, call) -> None:
+        with lock:
+            state.update({"ok": 0, "429": 0, "503": 0, "outage_until": 0.0, "outage_done": False})
+        failed = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(call, i) for i in range(jobs)]:
+                try:
+                    future.result()
+                except Exception:  # noqa: BLE001
+                    failed += 1
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {label:<12} {elapsed:5.2f}s  succeeded={jobs - failed:<4} failed={failed:<4}"
+            f" 429={state['429']:<5} 503={state['503']}"
+        )
+
+    def quiet(**kwargs) -> Resilience:
+        return Resilience(verbose=False, **kwargs)
+
+    policy = RetryPolicy(max_attempts=8, base_delay=0.05, max_delay=1.0)
+    try:
+        print(f"jobs={jobs} client threads={workers} server capacity={capacity} latency={latency * 1000:.0f}ms")
+        measure("no retry", generate)
+        backoff_only = quiet(
+            policy=policy,
+            limiter=AdaptiveLimiter(initial=workers, max_limit=workers, decrease=1.0),
+            breaker=CircuitBreaker(failure_threshold=10**9),
+        )
+        measure("backoff only", lambda i: backoff_only.call(lambda: generate(i)))
+        resilience = quiet(
+            policy=policy,
+            limiter=AdaptiveLimiter(initial=workers, max_limit=workers),
+            breaker=CircuitBreaker(failure_threshold=5, reset_timeout=0.5),
+        )
+        measure("resilience", lambda i: resilience.call(lambda: generate(i)))
+        print(f"  resilience stats: {resilience.stats()}")
+    finally:
+        server.shutdown()
+
+
+BENCHMARKS = {
+    "async": bench_async_engine,
+    "captions": bench_caption_fetch,
+    "srt": bench_srt_parser,
+    "quiz": bench_quiz_batch,
+    "context": bench_context_packer,
+    "search": bench_search,
+    "preview": bench_preview_cache,
+    "quizlist": bench_quiz_list,
+    "quizbank": bench_quiz_bank,
+    "playlist": bench_playlist,
+    "register": bench_register_urls,
+    "journal": bench_journal,
+    "resilience": bench_resilience,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("names", nargs="*", help=f"実行するベンチマーク {list(BENCHMARKS)}（省略時は全部）")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
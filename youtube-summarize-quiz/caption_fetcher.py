@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Iterable, Protocol
+
+DEFAULT_YDL_OPTS: dict[str, Any] = {
+    "skip_download": True,
+    "writesubtitles": True,
+    "writeautomaticsub": True,
+    "subtitleslangs": ["ja"],     # 日本語字幕
+    "subtitlesformat": "srt",     # 形式
+    # カレントディレクトリによらずアプリのフォルダのcaptions/に保存する
+    "outtmpl": str(Path(__file__).parent / "captions" / "%(title)s.%(ext)s"),
+}
+
+# 保存しても使わない巨大なフィールド（フォーマット一覧など）は落としておく
+_HEAVY_INFO_KEYS = (
+    "formats",
+    "requested_formats",
+    "thumbnails",
+    "automatic_captions",
+    "subtitles",
+    "heatmap",
+    "http_headers",
+)
+
+
+class Extractor(Protocol):
+    def extract_info(self, url: str, download: bool = True) -> dict[str, Any]: ...
+
+
+def _default_extractor_factory(opts: dict[str, Any]) -> Extractor:
+    import yt_dlp
+
+    return yt_dlp.YoutubeDL(opts)
+
+
+def slim_info(info: dict[str, Any]) -> dict[str, Any]:
+    """info辞書から保存に不要な大きいフィールドを取り除く。"""
+
+    return {key: value for key, value in info.items() if key not in _HEAVY_INFO_KEYS}
+
+
+class CaptionFetcher:
+    """メタデータと字幕を1回の抽出で取得し、複数動画を並列に処理する。
+
+    旧実装は`download()`と`extract_info(download=False)`でYouTubeに2回問い合わせていたが、
+    `extract_info(download=True)`は字幕を書き出したうえでinfo辞書も返すので1回で済む。
+    YoutubeDLのインスタンスはスレッドごとに1つ作って使い回す。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        ydl_opts: dict[str, Any] | None = None,
+        extractor_factory: Callable[[dict[str, Any]], Extractor] = _default_extractor_factory,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.ydl_opts = dict(DEFAULT_YDL_OPTS if ydl_opts is None else ydl_opts)
+        self.extractor_factory = extractor_factory
+        self._local = threading.local()
+        self._created: list[Extractor] = []
+        self._created_lock = threading.Lock()
+
+    def _extractor(self) -> Extractor:
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            ydl = self.extractor_factory(self.ydl_opts)
+            self._local.ydl = ydl
+            with self._created_lock:
+                self._created.append(ydl)
+        return ydl
+
+    def fetch(self, url: str) -> dict[str, Any]:
+        """1本分の字幕を書き出し、メタデータを返す。
+
+        Args:
+            url (str): YouTube動画のURL。
+
+        Returns:
+            dict[str, Any]: yt_dlpのinfo辞書。
+        """
+
+        ydl = self._extractor()
+        info = ydl.extract_info(url, download=True)
+        # JSONに保存できる形へ変換する（YoutubeDL以外の偽抽出器ではそのまま）
+        sanitize = getattr(ydl, "sanitize_info", None)
+        return sanitize(info) if sanitize is not None else info
+
+    def fetch_all(
+        self,
+        items: Iterable[tuple[str, str]],
+        on_result: Callable[[str, "dict[str, Any] | None", "Exception | None"], None],
+        cancelled: Callable[[], bool] | None = None,
+    ) -> int:
+        """複数の動画をスレッドプールで並列に取得する。
+
+        `on_result`は呼び出し元スレッドで完了順に呼ばれるので、レジストリ更新などを
+        ロックなしで行ってよい。`cancelled`がTrueを返したら、まだ始まっていない取得を
+        取り消す（取得中のものは完了を待って`on_result`に渡す）。
+
+        Args:
+            items (Iterable[tuple[str, str]]): `(key, url)`の組。keyは結果の識別に使う。
+            on_result (Callable): `(key, info, error)`で呼ばれるコールバック。
+            cancelled (Callable[[], bool] | None): 中止要求を確認する関数。
+
+        Returns:
+            int: 成功した件数。
+        """
+
+        succeeded = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = {pool.submit(self.fetch, url): key for key, url in items}
+                stopping = False
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    key = futures[future]
+                    try:
+                        info = future.result()
+                    except Exception as exc:  # noqa: BLE001
+                        on_result(key, None, exc)
+                    else:
+                        succeeded += 1
+                        on_result(key, info, None)
+                    if not stopping and cancelled is not None and cancelled():
+                        stopping = True
+                        for pending in futures:
+                            pending.cancel()
+        finally:
+            self.close()
+        return succeeded
+
+    def close(self) -> None:
+        """作成したYoutubeDLインスタンスを閉じる。"""
+
+        with self._created_lock:
+            created, self._created = self._created, []
+        for ydl in created:
+            close = getattr(ydl, "close", None)
+            if close is not None:
+                close()
+        self._local = threading.local()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from video_store import ManifestEntry, VideoStore, replace_chars
+
+CAPTION_NAME_REGEX = re.compile(r"(.*)\.ja\.srt$")
+BASE_DIR = Path(__file__).parent
+CAPTION_DIR = BASE_DIR / "captions"
+
+
+@dataclass
+class PendingCaption:
+    """要約が必要な字幕ファイル。"""
+
+    path: Path
+    video_id: str
+    title: str
+    entry: ManifestEntry
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_key(path: Path) -> str:
+    """マニフェストのキー。アプリのフォルダ内ならそこからの相対パスにして、実行時のカレントディレクトリによらず同じにする。"""
+
+    path = Path(path).resolve()
+    try:
+        return str(path.relative_to(BASE_DIR.resolve()))
+    except ValueError:
+        return str(path)
+
+
+def scan_captions(store: VideoStore, caption_dir: Path) -> list[PendingCaption]:
+    """マニフェストと突き合わせて、要約が必要な字幕ファイルだけを返す。
+
+    サイズとmtimeが記録と同じファイルは、要約済みかどうかによらず開かない（statのみ）。
+    ハッシュはスキャン時に要約とは別に記録しておくので、前回要約に失敗したファイルも
+    ハッシュを取り直さずに要約待ちへ戻せる。変化したファイルだけハッシュを取り直し、
+    内容が変わっていれば既存の要約を無効にする。
+    マニフェストにあるのに消えた字幕ファイルは、その動画を字幕未取得に戻して再取得させる。
+    ディレクトリ自体がない場合は何も消さない（場所の指定違いで全件を未取得に戻さないため）。
+
+    Args:
+        store (VideoStore): 動画レジストリ（マニフェストもここに保存する）。
+        caption_dir (Path): 字幕ファイルのディレクトリ。
+
+    Returns:
+        list[PendingCaption]: 新規または変更があり、要約が必要な字幕。
+    """
+
+    entries = store.manifest_entries()
+    pending: list[PendingCaption] = []
+    seen: set[str] = set()
+    if not caption_dir.is_dir():
+        print(f"字幕フォルダが見つかりません : {caption_dir}")
+        return pending
+    with os.scandir(caption_dir) as it:
+        for dir_entry in it:
+            name_match = CAPTION_NAME_REGEX.match(dir_entry.name)
+            if name_match is None or not dir_entry.is_file():
+                continue
+            path = Path(dir_entry.path)
+            key = manifest_key(path)
+            seen.add(key)
+            st = dir_entry.stat()
+            entry = entries.get(key)
+            title = replace_chars(name_match[1])  # 危険文字の変換
+            if entry is not None and entry.size == st.st_size and entry.mtime_ns == st.st_mtime_ns:
+                # 変更なし。要約がまだ（前回失敗した）なら、記録済みのハッシュのまま要約待ちに戻す
+                if not entry.summary_is_current:
+                    pending.append(PendingCaption(path, entry.video_id, title, entry))
+                continue
+
+            entry = _refresh_entry(store, entry, key, path, st, title)
+            if entry is None:
+                print(title)
+                continue
+            if entry.summary_is_current:
+                continue
+            pending.append(PendingCaption(path, entry.video_id, title, entry))
+
+    for key, entry in entries.items():
+        if key in seen:
+            continue
+        with store.transaction():
+            store.remove_manifest(key)
+            if entry.video_id is not None:
+                video = store.get(entry.video_id)
+                if video is not None:
+                    store.set_captioned(video.video_id, video.title, captioned=False)
+        print(f"字幕ファイルが削除されました : {key}")
+    return pending
+
+
+def _refresh_entry(
+    store: VideoStore,
+    entry: ManifestEntry | None,
+    key: str,
+    path: Path,
+    st: os.stat_result,
+    title: str,
+) -> ManifestEntry | None:
+    if entry is None:
+        video = store.find_by_title(title)
+        if video is None:
+            return None
+        sha = _sha256(path)
+        # 初回登録時、すでに要約済みの動画はその要約を今の内容に対するものとみなす
+        entry = ManifestEntry(
+            path=key,
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            sha256=sha,
+            video_id=video.video_id,
+            summarized_sha256=sha if video.summarized else None,
+        )
+    else:
+        sha = _sha256(path)
+        if entry.sha256 != sha and entry.video_id is not None:
+            # 字幕の内容が変わったので要約は作り直す
+            store.set_summarized(entry.video_id, False)
+            print(f"字幕が変更されたため要約を無効化します : {title}")
+        entry.size = st.st_size
+        entry.mtime_ns = st.st_mtime_ns
+        entry.sha256 = sha
+    store.upsert_manifest(entry)
+    return entry
+
+
+def mark_summarized(store: VideoStore, caption: PendingCaption, summary_path: Path) -> None:
+    """要約の保存完了をレジストリとマニフェストに記録する。"""
+
+    caption.entry.summary_path = str(summary_path)
+    caption.entry.summarized_sha256 = caption.entry.sha256
+    with store.transaction():
+        store.upsert_manifest(caption.entry)
+        store.set_summarized(caption.video_id)
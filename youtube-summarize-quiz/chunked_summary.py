@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Sequence
+
+from tokens import estimate_tokens
+
+DEFAULT_CHUNK_TOKENS = 8000
+DEFAULT_OVERLAP_TOKENS = 200
+
+MAP_PROMPT = (
+    "以下はyoutube動画の文字お越しの一部分（全{total}パート中の第{part}パート）です。"
+    "この部分で述べられている要点を漏れなく箇条書きで要約してください。"
+    "要約に関係ない説明文や前置きは一切書かないでください。\n\n"
+)
+
+REDUCE_PROMPT = (
+    "以下は1本のyoutube動画の文字お越しをパートごとに要約したものです。"
+    "重複をまとめ、動画全体の要約として1つに統合してください。"
+    "ただし、出力はMarkdown形式のみで行い、"
+    "要約に関係ない説明文や前置きは一切書かないでください。"
+    "見出し・箇条書きを適宜使って整理してください。\n\n"
+)
+
+
+def chunk_cues(
+    cues: Sequence[str],
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> list[str]:
+    """字幕のキュー境界でトークン予算ごとに文字起こしを分割する。
+
+    キューの途中では切らない。隣り合うチャンクは末尾`overlap_tokens`分のキューを
+    重ねて持つので、境界をまたぐ話題も片方のチャンクで文脈ごと要約される。
+
+    Args:
+        cues (Sequence[str]): 字幕1キュー分のテキストの列。
+        max_tokens (int): 1チャンクの推定トークン数の上限。
+        overlap_tokens (int): 次のチャンクへ持ち越すトークン数の上限。
+
+    Returns:
+        list[str]: 改行区切りで連結したチャンクのリスト。
+
+    Raises:
+        ValueError: `overlap_tokens`が0以上`max_tokens`未満でない場合。
+    """
+
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError(
+            f"overlap_tokensは0以上max_tokens未満にしてください（overlap_tokens={overlap_tokens}, max_tokens={max_tokens}）"
+        )
+    chunks: list[str] = []
+    current: list[tuple[str, int]] = []
+    current_tokens = 0
+    for cue in cues:
+        cost = estimate_tokens(cue) + 1
+        if current and current_tokens + cost > max_tokens:
+            chunks.append("\n".join(text for text, _ in current))
+            # 末尾から重なり分のキューだけ残して次のチャンクを始める
+            carried: list[tuple[str, int]] = []
+            carried_tokens = 0
+            for text, tokens in reversed(current):
+                if carried_tokens + tokens > overlap_tokens:
+                    break
+                carried.insert(0, (text, tokens))
+                carried_tokens += tokens
+            current, current_tokens = carried, carried_tokens
+        current.append((cue, cost))
+        current_tokens += cost
+    if current:
+        chunks.append("\n".join(text for text, _ in current))
+    return chunks
+
+
+async def summarize_transcript(
+    cues: Sequence[str],
+    generate: Callable[[str], Awaitable[str]],
+    prompt: str,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> str:
+    """長い文字起こしをmap-reduceで要約する。
+
+    予算に収まる場合は`prompt`＋全文を1回で要約する。収まらない場合はチャンクごとの
+    要約（map）を並列に行い、最後に統合（reduce）する。各チャンクの要約はLLMキャッシュに
+    残るので、一部が失敗して再実行したときは失敗したチャンクだけが再度APIを呼ぶ。
+
+    Args:
+        cues (Sequence[str]): 字幕1キュー分のテキストの列。
+        generate (Callable[[str], Awaitable[str]]): プロンプトから生成結果を返すコルーチン関数。
+        prompt (str): 1回で要約する場合のプロンプト（末尾に本文を連結する）。
+        chunk_tokens (int): 1チャンクの推定トークン数の上限。
+        overlap_tokens (int): チャンク間で重ねるトークン数。
+
+    Returns:
+        str: 動画全体の要約。
+    """
+
+    chunks = chunk_cues(cues, chunk_tokens, overlap_tokens)
+    if len(chunks) <= 1:
+        return await generate(prompt + (chunks[0] if chunks else ""))
+
+    total = len(chunks)
+    results = await asyncio.gather(
+        *(
+            generate(MAP_PROMPT.format(total=total, part=i) + chunk)
+            for i, chunk in enumerate(chunks, start=1)
+        ),
+        return_exceptions=True,
+    )
+    # 全チャンクを試してから失敗を報告する（成功分はキャッシュ済みになる）
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    merged = "\n\n".join(
+        f"## パート{i}\n{partial}" for i, partial in enumerate(results, start=1)
+    )
+    return await generate(REDUCE_PROMPT + merged)
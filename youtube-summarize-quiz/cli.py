@@ -0,0 +1,222 @@
+"""YouTube要約パイプラインのヘッドレスCLI。GUIを起動せずにcronやディスプレイのないサーバーから動かす。
+
+    python -m cli add URL [URL ...] [--file urls.txt] [--playlist PLAYLIST]
+    python -m cli fetch [--workers 4] [--watch 600]
+    python -m cli summarize [--concurrency 4] [--rpm N] [--tpm N] [--watch 600]
+    python -m cli quiz [-n 10] [--watch 600]
+    python -m cli status [--json] [--events 20]
+
+yt_dlp・google-genaiは各サブコマンドの中で必要になったときに読み込み、PySide6は読み込まない。
+`status`は動画レジストリと問題バンクを読むだけなので、それらを読み込まずにすぐ返る。
+`--watch`を付けると指定秒数ごとに新しい仕事がないか確認し続ける（Ctrl+C / SIGTERMで終了）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import signal
+import sys
+import threading
+from pathlib import Path
+from typing import Callable
+
+# Ctrl+C / SIGTERMで立てる中止フラグ。処理中の動画は最後まで終えてから止まる
+_stop = threading.Event()
+
+
+def _install_stop_handlers() -> None:
+    def _handle(signum: int, frame: object) -> None:
+        if _stop.is_set():
+            raise KeyboardInterrupt  # 2回目は待たずに終了する
+        _stop.set()
+        print("中止します（処理中の動画が終わり次第止まります。もう一度押すとすぐに終了します）", file=sys.stderr)
+
+    signal.signal(signal.SIGINT, _handle)
+    signal.signal(signal.SIGTERM, _handle)
+
+
+# ---- サブコマンド -----------------------------------------------------
+def cmd_add(args: argparse.Namespace) -> int:
+    urls = list(args.urls)
+    if args.file:
+        text = sys.stdin.read() if args.file == "-" else Path(args.file).read_text(encoding="utf-8")
+        urls += text.split()
+    if not urls and not args.playlist:
+        print("URLまたは--playlistを指定してください", file=sys.stderr)
+        return 2
+
+    code = 0
+    if urls:
+        from collections import Counter
+
+        from summarizer_core import register_urls
+
+        results = register_urls(urls)
+        counts = Counter(result.status for result in results)
+        for result in results:
+            if result.status == "invalid":
+                print(f"[INVALID] {result.url}", file=sys.stderr)
+                code = 1
+        print(
+            f"URLを登録しました（新規{counts['added']}件・登録済み{counts['exists']}件"
+            f"・重複{counts['duplicate']}件・無効{counts['invalid']}件）"
+        )
+    if args.playlist:
+        from playlist_ingest import ingest_playlists
+
+        ingest_playlists(args.playlist)
+    return code
+
+
+def cmd_fetch(args: argparse.Namespace) -> int:
+    from summarizer_core import fetch_captions
+    from video_store import get_video_store
+
+    store = get_video_store()
+    if store.pending_captions():
+        fetched = fetch_captions(store, max_workers=args.workers, cancelled=_stop.is_set)
+        print(f"字幕取得 {fetched}件")
+    return 0
+
+
+def cmd_summarize(args: argparse.Namespace) -> int:
+    from summarizer_core import load_gemini_api_key, summarize_json
+
+    load_gemini_api_key()
+    summarized = summarize_json(
+        concurrency=args.concurrency,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        fetch_workers=args.workers,
+        cancelled=_stop.is_set,
+    )
+    if summarized:
+        print(f"要約 {summarized}件")
+    return 0
+
+
+def cmd_quiz(args: argparse.Namespace) -> int:
+    from summarizer_core import load_gemini_api_key, quiz_pending
+
+    load_gemini_api_key()
+    quizzed = quiz_pending(n_per_doc=args.n, cancelled=_stop.is_set)
+    if quizzed:
+        print(f"クイズ生成 {quizzed}件")
+    return 0
+
+
+def cmd_status(args: argparse.Namespace) -> int:
+    from quiz_store import get_quiz_store
+    from video_store import VideoStore
+
+    # 読むだけなので、起動時のジャーナルとの突き合わせ（get_video_store）は省いて速く返す
+    store = VideoStore()
+    counts = store.counts()
+    status = {
+        **counts,
+        "pending_captions": counts["total"] - counts["captioned"],
+        "pending_summaries": counts["captioned"] - counts["summarized"],
+        "pending_quizzes": counts["summarized"] - counts["quizzed"],
+        "quiz_bank": get_quiz_store().stats(),
+    }
+    events = []
+    if args.events > 0:
+        from pipeline_journal import read_events
+
+        # GUIなど別のプロセスが書いている最中かもしれないので、書き込み用には開かない
+        events = read_events()[-args.events:]
+
+    if args.json:
+        status["events"] = [
+            {"seq": e.seq, "ts": e.ts, "event": e.event, "video_id": e.video_id, **e.fields} for e in events
+        ]
+        print(json.dumps(status, ensure_ascii=False))
+        return 0
+
+    print(
+        f"動画 {status['total']}本  字幕取得済み {status['captioned']}"
+        f"  要約済み {status['summarized']}  クイズ作成済み {status['quizzed']}"
+    )
+    print(
+        f"未処理: 字幕 {status['pending_captions']}"
+        f" / 要約 {status['pending_summaries']} / クイズ {status['pending_quizzes']}"
+    )
+    print(f"問題バンク: {status['quiz_bank']['sources']}件の要約に{status['quiz_bank']['items']}問")
+    if events:
+        import time
+
+        print("最近の記録:")
+        for e in events:
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(e.ts))
+            print(f"  {when} {e.event:<10} {e.video_id} {e.fields.get('title') or ''}")
+    return 0
+
+
+# ---- エントリポイント -------------------------------------------------
+def _run(command: Callable[[argparse.Namespace], int], args: argparse.Namespace) -> int:
+    watch = getattr(args, "watch", None)
+    if watch is None:
+        return command(args)
+
+    print(f"{watch:g}秒ごとに新しい仕事を確認します（Ctrl+Cで終了）")
+    code = 0
+    while not _stop.is_set():
+        try:
+            code = command(args)
+        except Exception as exc:  # noqa: BLE001
+            # 常駐中は1回の失敗で止めず、次の確認で再試行する
+            print(f"[ERROR] {exc}", file=sys.stderr)
+            code = 1
+        _stop.wait(watch)
+    return code
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m cli", description="YouTube要約パイプラインのヘッドレス実行")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="動画URL・再生リストを登録する")
+    add.add_argument("urls", nargs="*", help="YouTubeの動画URL")
+    add.add_argument("--file", "-f", help="1行に1件のURLを書いたファイル（-で標準入力）")
+    add.add_argument("--playlist", "-p", action="append", default=[], help="再生リストのURLまたはID（複数指定可）")
+    add.set_defaults(func=cmd_add)
+
+    def add_watch(sub: argparse.ArgumentParser) -> None:
+        sub.add_argument(
+            "--watch", type=float, metavar="SECONDS", help="常駐して指定秒数ごとに新しい仕事を処理する"
+        )
+
+    fetch = commands.add_parser("fetch", help="未取得の動画の字幕を取得する")
+    fetch.add_argument("--workers", type=int, default=4, help="並列に取得する動画数")
+    add_watch(fetch)
+    fetch.set_defaults(func=cmd_fetch)
+
+    summarize = commands.add_parser("summarize", help="字幕を取得して未要約の動画を要約する")
+    summarize.add_argument("--concurrency", type=int, default=4, help="同時に投げる要約リクエスト数")
+    summarize.add_argument("--rpm", type=int, help="1分あたりのリクエスト上限")
+    summarize.add_argument("--tpm", type=int, help="1分あたりの入力トークン上限")
+    summarize.add_argument("--workers", type=int, default=4, help="並列に字幕を取得する動画数")
+    add_watch(summarize)
+    summarize.set_defaults(func=cmd_summarize)
+
+    quiz = commands.add_parser("quiz", help="要約済みでクイズ未作成の動画のクイズを作る")
+    quiz.add_argument("-n", type=int, default=10, help="動画ごとの設問数")
+    add_watch(quiz)
+    quiz.set_defaults(func=cmd_quiz)
+
+    status = commands.add_parser("status", help="登録数と処理状況を表示する")
+    status.add_argument("--json", action="store_true", help="JSONで出力する")
+    status.add_argument("--events", type=int, default=0, metavar="N", help="ジャーナルの直近N件も表示する")
+    status.set_defaults(func=cmd_status)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    _install_stop_handlers()
+    return _run(args.func, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+"""リポジトリ直下の共有パッケージ`common`を読み込めるようにする。
+
+`common`のモジュールより先に`import common_setup`しておくこと。LLMキャッシュと
+呼び出しログはアプリごとにこのディレクトリへ置く（環境変数で指定済みならそちらを使う）。
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+
+_repo_root = str(APP_DIR.parent)
+if _repo_root not in sys.path:
+    sys.path.insert(0, _repo_root)
+
+os.environ.setdefault("LLM_CACHE_DIR", str(APP_DIR / ".llm_cache"))
+os.environ.setdefault("LLM_TELEMETRY_PATH", str(APP_DIR / "telemetry" / "llm_calls.jsonl"))
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from tokens import char_ngrams, estimate_tokens
+
+DEFAULT_CONTEXT_TOKENS = 12000
+
+_HEADING_REGEX = re.compile(r"^(#{1,6})\s+(.*)$")
+_BULLET_REGEX = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_MIN_UNIT_CHARS = 4
+# 同じ要約の中で既に選んだ箇条書きとほぼ同じ内容のものは選ばない
+_MAX_OVERLAP = 0.6
+
+
+@dataclass
+class _Unit:
+    """要約中の箇条書き・段落1つ。`heading`は直前の見出し行（なければ空）。"""
+
+    order: int
+    heading: str
+    text: str
+    tokens: int
+    grams: frozenset[str]
+    score: float = 0.0
+
+
+@dataclass
+class _Doc:
+    title: str
+    units: list[_Unit] = field(default_factory=list)
+    counts: Counter[str] = field(default_factory=Counter)
+
+
+def _parse_summary(title: str, markdown: str) -> _Doc:
+    doc = _Doc(title)
+    heading = ""
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped == "---":
+            continue
+        match = _HEADING_REGEX.match(stripped)
+        if match:
+            heading = stripped
+            continue
+        content = _BULLET_REGEX.sub("", stripped)
+        grams = char_ngrams(content)
+        if len(content) < _MIN_UNIT_CHARS or not grams:
+            continue
+        doc.counts.update(grams)
+        doc.units.append(_Unit(len(doc.units), heading, stripped, estimate_tokens(stripped) + 1, frozenset(grams)))
+    return doc
+
+
+def _score_units(docs: list[_Doc]) -> None:
+    """要約ごとのTF-IDFで箇条書きに点を付ける。
+
+    その要約で繰り返し出てきて（TF）、他の要約にはあまり出てこない（IDF）n-gramを
+    多く含む箇条書きほど、その動画を代表する内容とみなす。
+    """
+
+    df: Counter[str] = Counter()
+    for doc in docs:
+        df.update(doc.counts.keys())
+    n_docs = len(docs)
+    idf = {g: math.log((n_docs + 1) / (n + 1)) + 1 for g, n in df.items()}
+    for doc in docs:
+        total = sum(doc.counts.values()) or 1
+        weights = {g: n / total * idf[g] for g, n in doc.counts.items()}
+        for unit in doc.units:
+            unit.score = sum(map(weights.__getitem__, unit.grams)) / math.sqrt(len(unit.grams))
+
+
+def _overlap(unit: _Unit, chosen: list[_Unit]) -> float:
+    best = 0.0
+    for other in chosen:
+        shared = len(unit.grams & other.grams)
+        if shared:
+            best = max(best, shared / min(len(unit.grams), len(other.grams)))
+    return best
+
+
+def pack_summaries(summaries: dict[str, str], max_tokens: int = DEFAULT_CONTEXT_TOKENS) -> str:
+    """複数の要約を、各動画の代表的な見出しと箇条書きだけにしてトークン予算内に詰める。
+
+    全体が予算に収まる場合は従来どおり全文を連結して返す。収まらない場合は、
+    まず全動画のタイトルと最高得点の箇条書きを1つずつ入れ（どの動画も必ず出題対象にする）、
+    残りの予算を動画ごとに順番に1つずつ、得点の高い箇条書きで埋めていく。
+    同じ動画内で既に選んだものと内容が重なる箇条書きは飛ばす。
+
+    Args:
+        summaries (dict[str, str]): タイトル（ファイル名）→要約Markdown。
+        max_tokens (int): 出力の推定トークン数の上限。
+
+    Returns:
+        str: クイズ生成用のMarkdown。
+    """
+
+    if not summaries:
+        return ""
+    full = "\n\n".join(summaries.values())
+    if estimate_tokens(full) <= max_tokens:
+        return full
+
+    docs = [_parse_summary(title, text) for title, text in summaries.items()]
+    _score_units(docs)
+
+    used = 0
+    chosen: dict[str, list[_Unit]] = {doc.title: [] for doc in docs}
+    headers: dict[str, int] = {}
+    for doc in docs:
+        cost = estimate_tokens(doc.title) + 3
+        if used + cost > max_tokens:
+            print(f"予算内に入りきらないため{len(docs) - len(headers)}本の要約を省略しました")
+            break
+        headers[doc.title] = cost
+        used += cost
+
+    # 動画ごとの候補を得点順に並べ、1本ずつ順番に取っていく
+    candidates = {
+        doc.title: sorted(doc.units, key=lambda u: u.score, reverse=True)
+        for doc in docs
+        if doc.title in headers
+    }
+    progressed = True
+    while progressed:
+        progressed = False
+        for title, queue in candidates.items():
+            while queue:
+                unit = queue.pop(0)
+                extra = unit.tokens
+                if unit.heading and all(u.heading != unit.heading for u in chosen[title]):
+                    extra += estimate_tokens(unit.heading) + 1
+                if used + extra > max_tokens or _overlap(unit, chosen[title]) > _MAX_OVERLAP:
+                    continue
+                chosen[title].append(unit)
+                used += extra
+                progressed = True
+                break
+
+    parts: list[str] = []
+    for doc in docs:
+        if doc.title not in headers:
+            continue
+        lines = [f"# {doc.title}"]
+        heading = ""
+        for unit in sorted(chosen[doc.title], key=lambda u: u.order):
+            if unit.heading and unit.heading != heading:
+                heading = unit.heading
+                lines.append(heading)
+            lines.append(unit.text)
+        parts.append("\n".join(lines))
+    return "\n\n".join(parts)
+
+
+class ContextPacker:
+    """`summary/`の要約をパックした結果を、要約の集合が変わるまで使い回す。
+
+    要約ファイルの名前・サイズ・mtimeの組が前回と同じならファイルを読まずに前回の結果を返す。
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_CONTEXT_TOKENS):
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._signature: tuple | None = None
+        self._context = ""
+
+    def pack(self, summary_dir: Path) -> str:
+        """`summary_dir`内の全要約をトークン予算内にまとめたMarkdownを返す。"""
+
+        files = sorted(summary_dir.glob("*.md"))
+        signature_items = []
+        for path in files:
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            signature_items.append((path.name, st.st_size, st.st_mtime_ns))
+        signature = (self.max_tokens, tuple(signature_items))
+
+        with self._lock:
+            if signature == self._signature:
+                return self._context
+
+        summaries: dict[str, str] = {}
+        for path in files:
+            try:
+                summaries[path.stem] = path.read_text(encoding="utf-8")
+            except OSError:
+                continue
+        context = pack_summaries(summaries, self.max_tokens)
+        with self._lock:
+            self._signature, self._context = signature, context
+        return context
@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+BASE_DIR = Path(__file__).parent
+JOURNAL_PATH = BASE_DIR / "pipeline_journal.jsonl"
+SNAPSHOT_PATH = BASE_DIR / "pipeline_snapshot.json"
+
+DEFAULT_FSYNC_EVENTS = 32
+DEFAULT_FSYNC_SECONDS = 1.0
+DEFAULT_COMPACT_EVENTS = 5000
+
+
+@dataclass
+class JournalEvent:
+    """ジャーナルの1行。`fields`はその時点で変わった動画の列（url・title・captionedなど）。"""
+
+    seq: int
+    ts: float
+    event: str
+    video_id: str
+    fields: dict[str, Any]
+
+
+def _fsync_replace(tmp: Path, path: Path) -> None:
+    with tmp.open("rb") as f:
+        os.fsync(f.fileno())
+    tmp.replace(path)
+
+
+if os.name == "nt":
+
+    def _lock_file(f: IO[bytes]) -> None:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue  # LK_LOCKは10秒ほどで諦めるので、取れるまで繰り返す
+
+    def _unlock_file(f: IO[bytes]) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+
+    def _lock_file(f: IO[bytes]) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f: IO[bytes]) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def read_events(path: Path = JOURNAL_PATH) -> list[JournalEvent]:
+    """ジャーナルを書き込み用に開かずに読む（書きかけの最終行は切り落とさずに読み飛ばす）。
+
+    別のプロセスが書いている最中でも安全なので、状況表示など読むだけの用途に使う。
+    """
+
+    return list(_iter_events(Path(path)))
+
+
+def _iter_events(path: Path) -> Iterator[JournalEvent]:
+    if not path.exists():
+        return
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 書き込み途中で落ちた最終行
+                print(f"ジャーナルの壊れた行を読み飛ばしました : {line[:80]!r}")
+                continue
+            yield JournalEvent(
+                record["seq"], record["ts"], record["event"], record["video_id"], record.get("fields", {})
+            )
+
+
+class PipelineJournal:
+    """動画の状態変化（登録・字幕取得・要約・クイズ）を追記していくJSONLのジャーナル。
+
+    1イベント＝1行の追記なので、書き込みの手間はライブラリの大きさによらず一定。
+    各行は追記のたびにOSへ書き出すのでプロセスが落ちても失われない。fsyncだけは`fsync_events`件
+    ごとにまとめ、それに満たなくても最初の未fsyncの追記から`fsync_seconds`秒後にタイマーで行う
+    （その間に電源が落ちると最後のまとまり分は失われうる）。
+    行数が`compact_events`を超えたら、それまでの状態をスナップショットに書き出して
+    ジャーナルを空にする。現在の状態はスナップショット＋ジャーナルの再生で復元できる。
+
+    GUIと`cli --watch`のように複数のプロセスが同じジャーナルに書くので、追記・圧縮は
+    ロックファイル（`<path>.lock`）の排他ロックを取って行う。ロック中に他のプロセスが
+    書いた分を読んで通し番号を追いつかせるので、番号はプロセスをまたいでも重複しない。
+    ロックファイルには圧縮の世代番号を書いておき、他のプロセスの圧縮に気づけるようにする。
+    """
+
+    def __init__(
+        self,
+        path: Path = JOURNAL_PATH,
+        snapshot_path: Path = SNAPSHOT_PATH,
+        fsync_events: int = DEFAULT_FSYNC_EVENTS,
+        fsync_seconds: float = DEFAULT_FSYNC_SECONDS,
+        compact_events: int = DEFAULT_COMPACT_EVENTS,
+    ):
+        self.path = Path(path)
+        self.snapshot_path = Path(snapshot_path)
+        self.fsync_events = fsync_events
+        self.fsync_seconds = fsync_seconds
+        self.compact_events = compact_events
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._timer: threading.Timer | None = None
+        self._seq, _ = self._load_snapshot()
+        self._lines = 0
+        self._end = 0  # 読み終えた（自分が最後に書いた）位置。これより後ろは他のプロセスが書いた分
+        self._generation = 0
+        lock_path = self.path.with_name(self.path.name + ".lock")
+        lock_path.touch()
+        self._lock_file = lock_path.open("r+b")
+        self._file = self.path.open("ab")
+        with self._locked():
+            self._generation = self._read_generation()
+            self._catch_up()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        # スレッド間はthreading.Lock、プロセス間はロックファイルで排他する
+        with self._lock:
+            _lock_file(self._lock_file)
+            try:
+                yield
+            finally:
+                _unlock_file(self._lock_file)
+
+    def _read_generation(self) -> int:
+        self._lock_file.seek(0)
+        data = self._lock_file.read().strip()
+        return int(data) if data.isdigit() else 0
+
+    def _catch_up(self) -> None:
+        # ロック中に呼ぶ。前回読んだ後に他のプロセスが追記した行を読んで、通し番号と行数を追いつかせる
+        generation = self._read_generation()
+        if generation != self._generation:
+            # 他のプロセスが圧縮した。それまでの番号はスナップショットに入っている
+            self._generation = generation
+            self._seq = max(self._seq, self._load_snapshot()[0])
+            self._lines = 0
+            self._end = 0
+        size = os.fstat(self._file.fileno()).st_size
+        if size == self._end:
+            return
+        with self.path.open("rb") as f:
+            f.seek(self._end)
+            data = f.read(size - self._end)
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].splitlines():
+            try:
+                self._seq = max(self._seq, int(json.loads(line)["seq"]))
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                continue  # 再生時に警告を出して読み飛ばす
+            self._lines += 1
+        self._end += complete
+        if complete < len(data):
+            # 書き込み途中で落ちたプロセスが改行なしの最終行を残した（生きている書き手はロック中にしか
+            # 書かない）。そのまま追記すると次のイベントと1行につながって両方とも読めなくなる
+            os.ftruncate(self._file.fileno(), self._end)
+            os.fsync(self._file.fileno())
+            print(f"ジャーナルの書きかけの最終行を取り除きました（{len(data) - complete}バイト）")
+
+    # ---- 書き込み -----------------------------------------------------
+    def append(self, event: str, video_id: str, ts: float | None = None, **fields: Any) -> int:
+        """イベントを1行追記する。
+
+        Args:
+            event (str): イベント名（added / captioned / summarized / quizzed など）。
+            video_id (str): 対象の動画ID。
+            ts (float | None): 発生時刻。省略時は現在時刻。
+            **fields: 変わった列とその値。
+
+        Returns:
+            int: 付与した通し番号。
+        """
+
+        with self._locked():
+            self._catch_up()
+            self._seq += 1
+            record = {"seq": self._seq, "ts": time.time() if ts is None else ts, "event": event, "video_id": video_id}
+            if fields:
+                record["fields"] = fields
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            # ロックを放す前に書き出して、ファイル上の順序と通し番号の順序をそろえる
+            self._file.write(line)
+            self._file.flush()
+            self._end += len(line)
+            self._lines += 1
+            self._pending += 1
+            if self._pending >= self.fsync_events or time.monotonic() - self._last_sync >= self.fsync_seconds:
+                self._sync()
+            elif self._timer is None:
+                # 次の追記が来なくても`fsync_seconds`秒以内にfsyncする
+                self._timer = threading.Timer(self.fsync_seconds, self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+            return self._seq
+
+    def _timed_sync(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._sync()
+
+    def flush(self) -> None:
+        """まだfsyncしていない行をディスクに書き出す。"""
+
+        with self._lock:
+            self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+                self._lock_file.close()
+
+    def _sync(self) -> None:
+        if self._file.closed:
+            return
+        self._file.flush()
+        if self._pending:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    # ---- 再生 -------------------------------------------------------
+    def _load_snapshot(self) -> tuple[int, dict[str, dict[str, Any]]]:
+        if not self.snapshot_path.exists():
+            return 0, {}
+        data = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+        return int(data.get("seq", 0)), data.get("videos", {})
+
+    def _iter_journal(self) -> Iterator[JournalEvent]:
+        return _iter_events(self.path)
+
+    def events(self) -> list[JournalEvent]:
+        """スナップショット以降のイベントを発生順に返す（いつ何が起きたかの記録）。"""
+
+        with self._locked():
+            return list(self._iter_journal())
+
+    def replay(self) -> tuple[dict[str, dict[str, Any]], int]:
+        """スナップショットにジャーナルを適用して、動画ごとの現在の状態を復元する。
+
+        Returns:
+            tuple[dict[str, dict[str, Any]], int]: 動画ID→列の辞書（`updated_at`は最後のイベント時刻）と、
+            反映した最後の通し番号。
+        """
+
+        with self._locked():
+            return self._replay()
+
+    def _replay(self) -> tuple[dict[str, dict[str, Any]], int]:
+        seq, videos = self._load_snapshot()
+        for event in self._iter_journal():
+            if event.seq <= seq:
+                continue  # スナップショットに反映済み（圧縮の途中で落ちた場合）
+            state = videos.setdefault(event.video_id, {"added_at": event.ts})
+            state.update(event.fields)
+            state["updated_at"] = event.ts
+            seq = event.seq
+        return videos, seq
+
+    # ---- 圧縮 -------------------------------------------------------
+    @property
+    def needs_compaction(self) -> bool:
+        return self._lines >= self.compact_events
+
+    @property
+    def is_empty(self) -> bool:
+        """イベントもスナップショットもまだない（ジャーナルを使い始める前）ならTrue。"""
+
+        return self._seq == 0 and not self.snapshot_path.exists()
+
+    def seed(self, videos: dict[str, dict[str, Any]]) -> None:
+        """ジャーナル導入前からある状態を、最初のスナップショットとして書き出す。"""
+
+        with self._locked():
+            self._catch_up()
+            if self._seq == 0 and not self.snapshot_path.exists():
+                self._write_snapshot(videos, 0)
+
+    def _write_snapshot(self, videos: dict[str, dict[str, Any]], seq: int) -> None:
+        tmp = self.snapshot_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"seq": seq, "videos": videos}, ensure_ascii=False), encoding="utf-8")
+        _fsync_replace(tmp, self.snapshot_path)
+
+    def compact(self) -> int:
+        """現在の状態をスナップショットに書き出し、ジャーナルを空にする。
+
+        スナップショットを一時ファイルからのrenameで置き換えてからジャーナルを切り詰めるので、
+        どの時点で落ちても再生結果は変わらない。
+
+        Returns:
+            int: スナップショットに含めた動画の件数。
+        """
+
+        with self._locked():
+            self._catch_up()
+            self._sync()
+            videos, seq = self._replay()
+            self._write_snapshot(videos, seq)
+            # 他のプロセスも追記モードで開いたままなので、ファイルを置き換えずにその場で切り詰める
+            os.ftruncate(self._file.fileno(), 0)
+            os.fsync(self._file.fileno())
+            self._generation += 1
+            self._lock_file.seek(0)
+            self._lock_file.write(str(self._generation).encode("ascii"))
+            self._lock_file.truncate()
+            self._lock_file.flush()
+            self._end = 0
+            self._lines = 0
+        return len(videos)
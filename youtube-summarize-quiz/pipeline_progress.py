@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+STAGE_LABELS = {
+    "fetch": "字幕取得",
+    "summarize": "要約",
+    "quiz": "クイズ生成",
+}
+
+
+@dataclass
+class PipelineProgress:
+    """パイプラインの進捗1回分。`index`件目まで完了した時点の値。"""
+
+    stage: str
+    index: int
+    total: int
+    elapsed: float
+    eta: float | None
+    title: str = ""
+
+    @property
+    def label(self) -> str:
+        return STAGE_LABELS.get(self.stage, self.stage)
+
+
+ProgressCallback = Callable[[PipelineProgress], None]
+CancelCheck = Callable[[], bool]
+
+
+class ProgressTracker:
+    """ステージごとの完了件数を数え、経過時間と残り時間の見積もりを通知する。
+
+    残り時間はそのステージの1件あたりの平均所要時間から見積もる。
+    複数のワーカースレッドから`advance`を呼んでよい。
+    """
+
+    def __init__(self, stage: str, total: int, callback: ProgressCallback | None):
+        self.stage = stage
+        self.total = total
+        self.callback = callback
+        self.index = 0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._notify("")
+
+    def advance(self, title: str = "") -> None:
+        """1件完了したことを通知する。"""
+
+        # 通知もロック中に行い、件数が前後して届かないようにする（最後の通知が必ず最大の件数になる）
+        with self._lock:
+            self.index += 1
+            self._notify(title)
+
+    def _notify(self, title: str) -> None:
+        if self.callback is None:
+            return
+        elapsed = time.perf_counter() - self._start
+        eta = elapsed / self.index * (self.total - self.index) if self.index else None
+        self.callback(PipelineProgress(self.stage, self.index, self.total, elapsed, eta, title))
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from video_store import VideoStore, get_video_store, watch_url
+
+PLAYLIST_ITEMS_ENDPOINT = "https://www.googleapis.com/youtube/v3/playlistItems"
+PAGE_SIZE = 50  # APIで指定できる上限
+# 必要なフィールドだけを返させて応答を小さくする（ETagもこの部分応答に対して付く）
+_FIELDS = "etag,nextPageToken,items(snippet(title,resourceId/videoId))"
+_PLAYLIST_ID_REGEX = re.compile(r"[\w\-]{13,}")
+_META_PREFIX = "playlist:"
+
+
+def load_youtube_api_key() -> str | None:
+    """YOUTUBE_DATA_API_KEYを.envから読み込む。"""
+
+    load_dotenv()
+    return os.getenv("YOUTUBE_DATA_API_KEY")
+
+
+def extract_playlist_id(value: str) -> str | None:
+    """再生リストのURL（`list=`パラメータ）またはIDそのものから再生リストIDを取り出す。"""
+
+    value = value.strip()
+    ids = parse_qs(urlparse(value).query).get("list")
+    if ids:
+        return ids[0]
+    return value if _PLAYLIST_ID_REGEX.fullmatch(value) else None
+
+
+def make_session(pool_size: int = 8) -> requests.Session:
+    """接続を使い回すSession。並列に取得するページ数だけ接続をプールしておく。"""
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@dataclass
+class PlaylistPage:
+    """playlistItemsの1ページ。`etag`は次回の条件付きリクエスト（If-None-Match）に使う。"""
+
+    token: str
+    etag: str | None
+    next_token: str | None
+    items: list[tuple[str, str]] = field(default_factory=list)  # (動画ID, タイトル)
+
+
+@dataclass
+class PlaylistFetch:
+    """再生リスト全体の取得結果。`not_modified`は304で前回の内容を使ったページ数。"""
+
+    pages: list[PlaylistPage]
+    requests: int = 0
+    not_modified: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return self.not_modified < self.requests
+
+    def video_ids(self) -> list[str]:
+        return [video_id for page in self.pages for video_id, _ in page.items]
+
+
+class PlaylistClient:
+    """YouTube Data APIのplaylistItemsを全ページ取得するクライアント。
+
+    接続は1つのSessionで使い回す。前回取得したページのETagを渡すと条件付きリクエストにし、
+    変わっていないページは304（本文なし）で済ませる。前回のページトークンがわかっている
+    場合は全ページを並列に問い合わせ、変わったページ以降だけを順に取り直す。
+    """
+
+    def __init__(
+        self,
+        api_key: str | None,
+        session: requests.Session | None = None,
+        endpoint: str = PLAYLIST_ITEMS_ENDPOINT,
+        timeout: float = 20.0,
+        max_workers: int = 4,
+    ):
+        if not api_key:
+            raise RuntimeError("YOUTUBE_DATA_API_KEY が設定されていません")
+        self.api_key = api_key
+        self.session = session or make_session(max_workers)
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.max_workers = max_workers
+
+    def fetch_page(
+        self, playlist_id: str, token: str = "", cached: PlaylistPage | None = None
+    ) -> tuple[PlaylistPage, bool]:
+        """1ページ取得する。
+
+        Args:
+            playlist_id (str): 再生リストID。
+            token (str): ページトークン（先頭ページは空文字）。
+            cached (PlaylistPage | None): 前回取得した同じページ。あればETagで条件付きにする。
+
+        Returns:
+            tuple[PlaylistPage, bool]: ページと、前回から変わっていればTrue（304ならFalse）。
+        """
+
+        params = {
+            "part": "snippet",
+            "playlistId": playlist_id,
+            "maxResults": PAGE_SIZE,
+            "fields": _FIELDS,
+            "key": self.api_key,
+        }
+        if token:
+            params["pageToken"] = token
+        headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else {}
+        response = self.session.get(self.endpoint, params=params, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached is not None:
+            return cached, False
+        response.raise_for_status()
+        data = response.json()
+
+        items: list[tuple[str, str]] = []
+        for item in data.get("items", []):
+            snippet = item.get("snippet") or {}
+            video_id = (snippet.get("resourceId") or {}).get("videoId")
+            if video_id:
+                items.append((video_id, snippet.get("title") or ""))
+        etag = response.headers.get("ETag") or data.get("etag")
+        return PlaylistPage(token, etag, data.get("nextPageToken"), items), True
+
+    def fetch_playlist(self, playlist_id: str, cached: dict[str, PlaylistPage] | None = None) -> PlaylistFetch:
+        """`nextPageToken`をたどって再生リストの全ページを取得する。
+
+        Args:
+            playlist_id (str): 再生リストID。
+            cached (dict[str, PlaylistPage] | None): 前回の取得結果（ページトークン→ページ）。
+
+        Returns:
+            PlaylistFetch: 先頭から順に並べたページとリクエスト数。
+        """
+
+        cached = cached or {}
+        result = PlaylistFetch(pages=[])
+        prefetched: dict[str, tuple[PlaylistPage, bool]] = {}
+        if len(cached) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    token: executor.submit(self.fetch_page, playlist_id, token, page)
+                    for token, page in cached.items()
+                }
+                prefetched = {token: future.result() for token, future in futures.items()}
+            result.requests += len(prefetched)
+            result.not_modified += sum(not modified for _, modified in prefetched.values())
+
+        token: str | None = ""
+        seen: set[str] = set()
+        while token is not None and token not in seen:
+            seen.add(token)
+            fetched = prefetched.get(token)
+            if fetched is None:
+                # 前回なかったページ（途中のページが変わってトークンが変わった場合も含む）
+                fetched = self.fetch_page(playlist_id, token, cached.get(token))
+                result.requests += 1
+                result.not_modified += not fetched[1]
+            page = fetched[0]
+            result.pages.append(page)
+            token = page.next_token
+        return result
+
+
+@dataclass
+class IngestResult:
+    """再生リスト1件の取り込み結果。"""
+
+    playlist_id: str
+    total: int
+    added: list[str]
+    requests: int
+    not_modified: int
+
+
+def _load_pages(value: str | None) -> dict[str, PlaylistPage]:
+    if not value:
+        return {}
+    try:
+        data = json.loads(value)
+    except json.JSONDecodeError:
+        return {}
+    return {
+        token: PlaylistPage(page["token"], page.get("etag"), page.get("next_token"), [tuple(i) for i in page["items"]])
+        for token, page in data.items()
+    }
+
+
+def ingest_playlist(
+    playlist_id: str, store: VideoStore | None = None, client: PlaylistClient | None = None
+) -> IngestResult:
+    """再生リストの全動画を動画レジストリに登録する。
+
+    前回の各ページのETagと内容は`meta`テーブルに保存しておき、次回は条件付きで問い合わせる。
+    どのページも変わっていなければ登録処理自体を省く。新しい動画は1トランザクションで登録する。
+
+    Args:
+        playlist_id (str): 再生リストIDまたは再生リストのURL。
+        store (VideoStore | None): 登録先。省略時はプロセス共通のストア。
+        client (PlaylistClient | None): APIクライアント。省略時は.envのAPIキーで作る。
+
+    Returns:
+        IngestResult: 再生リストの動画数・新規登録した動画ID・リクエスト数。
+    """
+
+    playlist_id = extract_playlist_id(playlist_id) or playlist_id
+    store = store or get_video_store()
+    client = client or PlaylistClient(load_youtube_api_key())
+    key = _META_PREFIX + playlist_id
+
+    fetch = client.fetch_playlist(playlist_id, _load_pages(store.get_meta(key)))
+    video_ids = fetch.video_ids()
+    added: list[str] = []
+    if fetch.changed:
+        added = store.add_many((video_id, watch_url(video_id)) for video_id in dict.fromkeys(video_ids))
+        store.set_meta(key, json.dumps({page.token: asdict(page) for page in fetch.pages}, ensure_ascii=False))
+    print(
+        f"再生リスト {playlist_id}: {len(video_ids)}本（新規{len(added)}本）"
+        f" リクエスト{fetch.requests}回（未変更{fetch.not_modified}回）"
+    )
+    return IngestResult(playlist_id, len(video_ids), added, fetch.requests, fetch.not_modified)
+
+
+def ingest_playlists(
+    playlist_ids: list[str], store: VideoStore | None = None, client: PlaylistClient | None = None
+) -> list[IngestResult]:
+    """複数の再生リストを、接続を共有したまま並列に取り込む。"""
+
+    store = store or get_video_store()
+    client = client or PlaylistClient(load_youtube_api_key())
+    with ThreadPoolExecutor(max_workers=client.max_workers) as executor:
+        return list(executor.map(lambda playlist_id: ingest_playlist(playlist_id, store, client), playlist_ids))
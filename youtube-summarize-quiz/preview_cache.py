@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_CHARS = 32 * 1024 * 1024
+
+
+@dataclass
+class RenderedPreview:
+    """描画済みのMarkdownファイル1件。`mtime_ns`・`size`は描画したときのファイルの状態。"""
+
+    path: str
+    mtime_ns: int
+    size: int
+    markdown: str
+    html: str
+
+    @property
+    def chars(self) -> int:
+        return len(self.markdown) + len(self.html)
+
+
+class PreviewCache:
+    """Markdownファイルを描画したHTMLをパスとmtimeで引くLRUキャッシュ。
+
+    1パスにつき最新の1版だけを持ち、ファイルのmtimeかサイズが変わっていれば
+    ミス扱いにする。件数と合計文字数（Markdown＋HTML）のどちらかが上限を超えたら
+    使われていない順に捨てる。描画スレッドとUIスレッドから同時に使える。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_chars: int = DEFAULT_MAX_CHARS):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, RenderedPreview] = OrderedDict()
+        self._chars = 0
+
+    def get(self, path: Path) -> RenderedPreview | None:
+        """`path`の現在の内容を描画済みならそれを返す（statだけでファイルは読まない）。"""
+
+        try:
+            st = Path(path).stat()
+        except OSError:
+            return None
+        key = str(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.mtime_ns != st.st_mtime_ns or entry.size != st.st_size:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, preview: RenderedPreview) -> None:
+        with self._lock:
+            old = self._entries.pop(preview.path, None)
+            if old is not None:
+                self._chars -= old.chars
+            self._entries[preview.path] = preview
+            self._chars += preview.chars
+            while self._entries and (len(self._entries) > self.max_entries or self._chars > self.max_chars):
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= evicted.chars
+
+    def discard(self, path: Path) -> None:
+        with self._lock:
+            old = self._entries.pop(str(path), None)
+            if old is not None:
+                self._chars -= old.chars
+
+    def load(self, path: Path, render: Callable[[str], str]) -> RenderedPreview:
+        """キャッシュにあればそれを、なければファイルを読んで`render`で描画して返す。
+
+        Args:
+            path (Path): Markdownファイル。
+            render (Callable[[str], str]): Markdown→HTMLの変換関数（時間がかかるので描画スレッドで呼ぶ）。
+
+        Returns:
+            RenderedPreview: 描画結果。
+        """
+
+        cached = self.get(path)
+        if cached is not None:
+            return cached
+        path = Path(path)
+        # 読み込みの前にstatを取る（読み込み中に書き換えられても次回は描画し直される）
+        st = path.stat()
+        markdown = path.read_text(encoding="utf-8")
+        preview = RenderedPreview(str(path), st.st_mtime_ns, st.st_size, markdown, render(markdown))
+        self.put(preview)
+        return preview
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "chars": self._chars, "hits": self.hits, "misses": self.misses}
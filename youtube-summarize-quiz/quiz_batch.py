@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Callable, Mapping
+
+from tokens import estimate_tokens
+
+DEFAULT_BATCH_TOKENS = 24000
+
+SINGLE_QUIZ_PROMPT = (
+    "以下のMarkdown形式の文章を読んで、その内容を理解しているか確認する日本語のクイズを"
+    "{n}問作成してください。"
+    "各出力要素はJSON形式で、キーは必ず'Q'と'A'のみを使用し、値に問題文と解答を入れてください。"
+    "問題は文章中の事実や要点に基づき、単純な言い換えではなく理解度を確かめる内容にしてください。"
+    "JSON以外の余計な文字列やコードフェンスは出力しないでください。"
+    "\n\n[Markdown]\n"
+)
+
+# 問題を追加生成するときに、出題済みの問題と重ならないよう本文の後に付ける
+AVOID_QUESTIONS_PROMPT = "\n[出題済みの問題]\n以下の問題とは異なる内容の問題を作成してください。\n{questions}\n"
+
+BATCH_QUIZ_PROMPT = (
+    "以下の複数のMarkdown形式の文章をそれぞれ読んで、その内容を理解しているか確認する日本語のクイズを"
+    "文章ごとに{n}問ずつ作成してください。"
+    "出力は1つのJSONオブジェクトとし、キーは各文章の<doc id=\"...\">のid、値はその文章のクイズの配列にしてください。"
+    "配列の各要素はキーに必ず'Q'と'A'のみを使用し、値に問題文と解答を入れてください。"
+    "問題はその文章中の事実や要点だけに基づき、他の文章の内容を混ぜないでください。"
+    "JSON以外の余計な文字列やコードフェンスは出力しないでください。\n\n"
+)
+
+# プロンプトの指示文とdocタグの分の見積もり
+_PROMPT_OVERHEAD = estimate_tokens(BATCH_QUIZ_PROMPT)
+_DOC_OVERHEAD = 16
+
+
+def qa_pairs(items: Any, n: int) -> list[tuple[str, str]]:
+    """パース済みJSONから有効な(Question, Answer)を最大`n`件取り出す。"""
+
+    qa_list: list[tuple[str, str]] = []
+    if not isinstance(items, list):
+        return qa_list
+    for qa in items:
+        if not isinstance(qa, dict):
+            continue
+        question = qa.get("Q")
+        answer = qa.get("A")
+        if not question or not answer:
+            continue
+        qa_list.append((str(question).strip(), str(answer).strip()))
+        if len(qa_list) >= n:
+            break
+    return qa_list
+
+
+def parse_json_object(payload: str) -> dict[str, Any]:
+    """GeminiレスポンスからJSONオブジェクトをベストエフォートで抽出する。
+
+    Args:
+        payload (str): コードフェンス等を含む可能性がある生テキストレスポンス。
+
+    Returns:
+        dict[str, Any]: 解析したオブジェクト。失敗した場合は空の辞書。
+    """
+
+    text_response = payload.strip()
+    candidates = [text_response]
+    code_block = re.search(r"```(?:json)?\s*(.*?)```", text_response, re.DOTALL)
+    if code_block:
+        candidates.append(code_block.group(1))
+    object_match = re.search(r"(\{.*\})", text_response, re.DOTALL)
+    if object_match:
+        candidates.append(object_match.group(1))
+
+    for candidate in candidates:
+        try:
+            parsed = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    return {}
+
+
+def pack_docs(docs: Mapping[str, str], max_tokens: int = DEFAULT_BATCH_TOKENS) -> list[list[str]]:
+    """文書をトークン予算に収まるように先頭から順にまとめる。
+
+    1件で予算を超える文書はそれだけで1グループにする（単体の経路で処理される）。
+
+    Args:
+        docs (Mapping[str, str]): 文書ID→Markdown本文。
+        max_tokens (int): 1リクエストあたりの推定入力トークン数の上限。
+
+    Returns:
+        list[list[str]]: 1リクエストにまとめる文書IDのグループ。
+    """
+
+    groups: list[list[str]] = []
+    current: list[str] = []
+    current_tokens = _PROMPT_OVERHEAD
+    for doc_id, text in docs.items():
+        cost = estimate_tokens(text) + _DOC_OVERHEAD
+        if current and current_tokens + cost > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], _PROMPT_OVERHEAD
+        current.append(doc_id)
+        current_tokens += cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+def build_batch_prompt(docs: Mapping[str, str], doc_ids: list[str], n_per_doc: int) -> tuple[str, dict[str, str]]:
+    """複数文書をまとめたクイズ生成プロンプトを作る。
+
+    文書IDはファイル名などで記号を含みうるので、プロンプト内では`d1`, `d2`...の短いIDに置き換える。
+
+    Returns:
+        tuple[str, dict[str, str]]: プロンプトと、短いID→元の文書IDの対応。
+    """
+
+    aliases: dict[str, str] = {}
+    parts = [BATCH_QUIZ_PROMPT.format(n=n_per_doc)]
+    for i, doc_id in enumerate(doc_ids, start=1):
+        alias = f"d{i}"
+        aliases[alias] = doc_id
+        parts.append(f'<doc id="{alias}">\n{docs[doc_id].strip()}\n</doc>\n')
+    return "\n".join(parts), aliases
+
+
+def make_quiz_batch(
+    docs: Mapping[str, str],
+    n_per_doc: int,
+    generate: Callable[[str], str],
+    fallback: Callable[[str, int], list[tuple[str, str]]],
+    max_tokens: int = DEFAULT_BATCH_TOKENS,
+) -> dict[str, list[tuple[str, str]]]:
+    """複数の要約のクイズを、トークン予算の範囲でまとめて1リクエストで生成する。
+
+    応答は文書IDをキーにしたJSONオブジェクトとして受け取り、文書ごとに分けて検証する。
+    キーが欠けている・設問が`n_per_doc`問に満たないなど検証に通らなかった文書だけ、
+    `fallback`で1件ずつ生成し直す。1件ずつの生成も失敗した文書は空のリストのまま返す。
+
+    Args:
+        docs (Mapping[str, str]): 文書ID→Markdown本文。
+        n_per_doc (int): 文書ごとの設問数。
+        generate (Callable[[str], str]): プロンプトを受け取り応答テキストを返す関数。
+        fallback (Callable[[str, int], list[tuple[str, str]]]): 1件ずつ生成する関数（`make_quiz`）。
+        max_tokens (int): 1リクエストあたりの推定入力トークン数の上限。
+
+    Returns:
+        dict[str, list[tuple[str, str]]]: 文書ID→(Question, Answer)のリスト。
+    """
+
+    targets = {doc_id: text for doc_id, text in docs.items() if text.strip()}
+    results: dict[str, list[tuple[str, str]]] = {doc_id: [] for doc_id in docs}
+    if n_per_doc <= 0 or not targets:
+        return results
+
+    single: list[str] = []
+    failed: list[str] = []
+    for group in pack_docs(targets, max_tokens):
+        if len(group) == 1:
+            single.extend(group)  # まとめる相手がいなければ単体の経路と同じ
+            continue
+        prompt, aliases = build_batch_prompt(targets, group, n_per_doc)
+        try:
+            parsed = parse_json_object(generate(prompt))
+        except Exception as exc:  # noqa: BLE001
+            print(f"まとめてのクイズ生成に失敗しました : {exc}")
+            parsed = {}
+        for alias, doc_id in aliases.items():
+            pairs = qa_pairs(parsed.get(alias), n_per_doc)
+            if len(pairs) < n_per_doc:
+                failed.append(doc_id)
+            else:
+                results[doc_id] = pairs
+
+    for doc_id in failed:
+        print(f"まとめて生成できなかったため1件ずつ生成します : {doc_id}")
+    for doc_id in single + failed:
+        try:
+            results[doc_id] = fallback(targets[doc_id], n_per_doc)
+        except Exception as exc:  # noqa: BLE001
+            # 1件の失敗でまとめて生成できた他の文書の結果を捨てない
+            print(f"クイズ生成に失敗しました : {doc_id} : {exc}")
+    return results
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+BASE_DIR = Path(__file__).parent
+QUIZ_DB_PATH = BASE_DIR / "quiz_bank.db"
+
+# YouTubeページの「全要約からクイズ」用の出題元
+ALL_SUMMARIES_SOURCE = "all-summaries"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quiz_items (
+    item_id    INTEGER PRIMARY KEY,
+    source     TEXT NOT NULL,
+    sha256     TEXT NOT NULL,
+    question   TEXT NOT NULL,
+    answer     TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    UNIQUE (source, sha256, question)
+);
+CREATE INDEX IF NOT EXISTS idx_quiz_source ON quiz_items(source, sha256);
+"""
+
+
+def content_hash(markdown: str) -> str:
+    """出題元の本文のハッシュ。前後の空白の違いは無視する。"""
+
+    return hashlib.sha256(markdown.strip().encode("utf-8")).hexdigest()
+
+
+def source_key(path: Path) -> str:
+    """ファイルの出題元キー。アプリのフォルダ内ならそこからの相対パスにする。"""
+
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(BASE_DIR.resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+class QuizStore:
+    """生成したクイズを出題元と本文のハッシュごとに保存するSQLiteの問題バンク。
+
+    同じ要約を開き直したときは保存済みの問題をそのまま出し、LLMは呼ばない。
+    要約が書き換えられて本文のハッシュが変わった出題元は、次に問題を追加したときに
+    古い版の問題を捨てて置き換える。同じ問題文は重複して保存しない。
+    """
+
+    def __init__(self, db_path: Path = QUIZ_DB_PATH):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self.conn.executescript(_SCHEMA)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, source: str, markdown: str) -> list[tuple[str, str]]:
+        """出題元`source`の現在の本文に対して保存済みの問題を、作成順に返す。
+
+        Args:
+            source (str): 出題元キー（`source_key`の戻り値など）。
+            markdown (str): 出題元の現在の本文。
+
+        Returns:
+            list[tuple[str, str]]: (Question, Answer)タプル。本文が変わっていれば空。
+        """
+
+        rows = self.conn.execute(
+            "SELECT question, answer FROM quiz_items WHERE source = ? AND sha256 = ? ORDER BY item_id",
+            (source, content_hash(markdown)),
+        )
+        return [(question, answer) for question, answer in rows]
+
+    def is_outdated(self, source: str, markdown: str) -> bool:
+        """保存済みの問題が、書き換えられる前の本文から作られたものならTrue。"""
+
+        row = self.conn.execute(
+            "SELECT 1 FROM quiz_items WHERE source = ? AND sha256 != ? LIMIT 1",
+            (source, content_hash(markdown)),
+        ).fetchone()
+        return row is not None
+
+    def add(self, source: str, markdown: str, pairs: Iterable[tuple[str, str]]) -> int:
+        """問題を保存する。古い本文の問題は削除し、既存と同じ問題文は追加しない。
+
+        Args:
+            source (str): 出題元キー。
+            markdown (str): 問題を作成したときの本文。
+            pairs (Iterable[tuple[str, str]]): 追加する(Question, Answer)タプル。
+
+        Returns:
+            int: 新しく保存した問題数。
+        """
+
+        sha256 = content_hash(markdown)
+        now = time.time()
+        added = 0
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM quiz_items WHERE source = ? AND sha256 != ?", (source, sha256))
+            for question, answer in pairs:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO quiz_items (source, sha256, question, answer, created_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (source, sha256, question.strip(), answer.strip(), now),
+                )
+                added += cur.rowcount
+        return added
+
+    def remove(self, source: str) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM quiz_items WHERE source = ?", (source,))
+
+    def stats(self) -> dict[str, int]:
+        sources, items = self.conn.execute(
+            "SELECT COUNT(DISTINCT source), COUNT(*) FROM quiz_items"
+        ).fetchone()
+        return {"sources": sources, "items": items}
+
+
+_default_store: QuizStore | None = None
+_default_lock = threading.Lock()
+
+
+def get_quiz_store() -> QuizStore:
+    """プロセス共通のQuizStoreを返す。"""
+
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = QuizStore()
+    return _default_store
@@ -468,14 +468,12 @@ def _(mo):
 
 
 @app.cell
-def _(get_playlist_url_list, save_json):
-    # プレイリストのvideoIdを取得
-    playlist_id = "PLrtfpfxtQtGusZ5mqhKki7ZyXJBGg9fQV"
-    playlist_video_url_list = get_playlist_url_list(playlist_id)
+def _():
+    # プレイリストの全ページを取得して動画レジストリに一括登録（未変更なら304で済む）
+    from playlist_ingest import ingest_playlist
 
-    # idから動画情報をjsonファイルに保存
-    for _url in playlist_video_url_list:
-        save_json(_url)
+    playlist_id = "PLrtfpfxtQtGusZ5mqhKki7ZyXJBGg9fQV"
+    ingest_playlist(playlist_id)
     return
 
 
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+from caption_manifest import CAPTION_NAME_REGEX
+from srt_parser import load_transcript
+from tokens import char_ngrams
+
+BASE_DIR = Path(__file__).parent
+SEARCH_DB_PATH = BASE_DIR / "search_index.db"
+
+KIND_LABELS = {
+    "summary": "要約",
+    "caption": "字幕",
+    "problem": "問題集",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id   INTEGER PRIMARY KEY,
+    path     TEXT NOT NULL UNIQUE,
+    kind     TEXT NOT NULL,
+    title    TEXT NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    length   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    gram   TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    tf     INTEGER NOT NULL,
+    PRIMARY KEY (gram, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_id);
+"""
+
+# BM25のパラメータ
+_K1 = 1.2
+_B = 0.75
+
+
+@dataclass
+class Source:
+    """索引対象のディレクトリ。`loader`はファイルから(タイトル, 本文)を返す。"""
+
+    kind: str
+    directory: Path
+    pattern: str
+    loader: Callable[[Path], tuple[str, str]]
+
+
+@dataclass
+class SearchHit:
+    path: str
+    kind: str
+    title: str
+    score: float
+    matched: int
+
+    @property
+    def label(self) -> str:
+        return KIND_LABELS.get(self.kind, self.kind)
+
+
+def _load_markdown(path: Path) -> tuple[str, str]:
+    return path.stem, path.read_text(encoding="utf-8")
+
+
+def _load_caption(path: Path) -> tuple[str, str]:
+    match = CAPTION_NAME_REGEX.match(path.name)
+    lines, _ = load_transcript(path)
+    return (match[1] if match else path.stem), "\n".join(lines)
+
+
+def default_sources() -> list[Source]:
+    """要約・文字起こし（字幕を解析したもの）・Kindleの問題集。"""
+
+    return [
+        Source("summary", BASE_DIR / "summary", "*.md", _load_markdown),
+        Source("caption", BASE_DIR / "captions", "*.ja.srt", _load_caption),
+        Source("problem", BASE_DIR.parent / "kindle-summarize-quiz" / "problem_bank", "*.md", _load_markdown),
+    ]
+
+
+class SearchIndex:
+    """文字bigramの転置インデックスによる全文検索。
+
+    日本語は単語に区切れないので、記号を除いた本文の文字bigramを索引語にする。
+    インデックスはSQLiteに保存するので起動時に作り直す必要はなく、`refresh`で
+    サイズかmtimeが変わったファイルだけを索引し直す。検索はクエリのbigramを
+    すべて含む文書を優先し、その中をBM25で順位付けする。
+    """
+
+    def __init__(self, db_path: Path = SEARCH_DB_PATH, sources: list[Source] | None = None):
+        self.db_path = Path(db_path)
+        self.sources = default_sources() if sources is None else sources
+        self._local = threading.local()
+        self._norms: dict[int, float] | None = None
+        self._kinds: dict[int, str] = {}
+        self._meta_lock = threading.Lock()
+        self.conn.executescript(_SCHEMA)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ---- 索引の更新 -------------------------------------------------
+    def refresh(self, batch_size: int = 200) -> dict[str, int]:
+        """索引対象のディレクトリを走査し、追加・変更・削除されたファイルだけを反映する。
+
+        変更のないファイルはstatだけで飛ばす。`batch_size`件ごとにコミットするので、
+        初回の大量索引中も検索はそこまでの結果で行える。
+
+        Args:
+            batch_size (int): 1トランザクションで索引するファイル数。
+
+        Returns:
+            dict[str, int]: `added`・`updated`・`removed`・`failed`の件数。
+        """
+
+        known = {
+            path: (doc_id, size, mtime_ns)
+            for doc_id, path, size, mtime_ns in self.conn.execute(
+                "SELECT doc_id, path, size, mtime_ns FROM docs"
+            )
+        }
+        counts = {"added": 0, "updated": 0, "removed": 0, "failed": 0}
+        pending: list[tuple[Source, Path, os.stat_result, int | None]] = []
+        seen: set[str] = set()
+        for source in self.sources:
+            if not source.directory.is_dir():
+                continue
+            for path in source.directory.glob(source.pattern):
+                key = str(path)
+                seen.add(key)
+                st = path.stat()
+                doc = known.get(key)
+                if doc is not None and doc[1] == st.st_size and doc[2] == st.st_mtime_ns:
+                    continue
+                pending.append((source, path, st, doc[0] if doc else None))
+
+        for start in range(0, len(pending), batch_size):
+            with self.transaction():
+                for source, path, st, doc_id in pending[start:start + batch_size]:
+                    try:
+                        title, text = source.loader(path)
+                    except (OSError, UnicodeDecodeError) as exc:
+                        print(f"索引できませんでした : {path} {exc}")
+                        counts["failed"] += 1
+                        continue
+                    self.index_text(str(path), source.kind, title, text, st.st_size, st.st_mtime_ns)
+                    counts["updated" if doc_id is not None else "added"] += 1
+
+        removed = [doc_id for path, (doc_id, _, _) in known.items() if path not in seen]
+        if removed:
+            with self.transaction():
+                for doc_id in removed:
+                    self._remove(doc_id)
+            counts["removed"] = len(removed)
+        with self._meta_lock:
+            self._norms = None
+        return counts
+
+    def index_text(self, path: str, kind: str, title: str, text: str, size: int = 0, mtime_ns: int = 0) -> int:
+        """1文書を索引に追加する（同じパスの文書は置き換える）。"""
+
+        counts = Counter(char_ngrams(f"{title}\n{text}"))
+        conn = self.conn
+        row = conn.execute("SELECT doc_id FROM docs WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            self._remove(row[0])
+        cur = conn.execute(
+            "INSERT INTO docs (path, kind, title, size, mtime_ns, length) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, kind, title, size, mtime_ns, sum(counts.values())),
+        )
+        doc_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO postings (gram, doc_id, tf) VALUES (?, ?, ?)",
+            ((gram, doc_id, tf) for gram, tf in counts.items()),
+        )
+        with self._meta_lock:
+            self._norms = None
+        return doc_id
+
+    def _remove(self, doc_id: int) -> None:
+        self.conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+
+    # ---- 検索 -------------------------------------------------------
+    def _doc_meta(self) -> tuple[dict[int, float], dict[int, str]]:
+        # BM25の文書長による正規化項と種別は毎回使うのでメモリに持つ（索引の更新で破棄）
+        with self._meta_lock:
+            if self._norms is None:
+                rows = self.conn.execute("SELECT doc_id, length, kind FROM docs").fetchall()
+                avg_length = sum(length for _, length, _ in rows) / len(rows) if rows else 1.0
+                self._norms = {
+                    doc_id: _K1 * (1 - _B + _B * length / (avg_length or 1.0)) for doc_id, length, _ in rows
+                }
+                self._kinds = {doc_id: kind for doc_id, _, kind in rows}
+            return self._norms, self._kinds
+
+    def search(self, query: str, limit: int = 50, kinds: set[str] | None = None) -> list[SearchHit]:
+        """クエリに一致する文書をスコア順に返す。
+
+        Args:
+            query (str): 検索語（空白区切りの複数語も可）。
+            limit (int): 返す件数の上限。
+            kinds (set[str] | None): 絞り込む種別（summary / caption / problem）。
+
+        Returns:
+            list[SearchHit]: クエリのbigramを多く含む順、同数ならBM25の高い順。
+        """
+
+        grams = set()
+        for term in query.split():
+            grams.update(char_ngrams(term))
+        if not grams:
+            return []
+
+        norms, kinds_of = self._doc_meta()
+        n_docs = len(norms)
+        if n_docs == 0:
+            return []
+        conn = self.conn
+
+        scores: dict[int, float] = {}
+        matched: Counter[int] = Counter()
+        for gram in grams:
+            if len(gram) == 1:
+                # 1文字の検索語はその文字で始まるbigramをまとめて使う
+                rows = conn.execute(
+                    "SELECT doc_id, SUM(tf) FROM postings WHERE gram >= ? AND gram < ? GROUP BY doc_id",
+                    (gram, gram + "\U0010ffff"),
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT doc_id, tf FROM postings WHERE gram = ?", (gram,)).fetchall()
+            if not rows:
+                continue
+            weight = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5)) * (_K1 + 1)
+            for doc_id, tf in rows:
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * tf / (tf + norms.get(doc_id, _K1))
+                matched[doc_id] += 1
+
+        candidates = scores if kinds is None else [d for d in scores if kinds_of.get(d) in kinds]
+        ranked = heapq.nlargest(limit, candidates, key=lambda d: (matched[d], scores[d]))
+        if not ranked:
+            return []
+        placeholders = ",".join("?" * len(ranked))
+        rows = {
+            doc_id: (path, kind, title)
+            for doc_id, path, kind, title in conn.execute(
+                f"SELECT doc_id, path, kind, title FROM docs WHERE doc_id IN ({placeholders})", ranked
+            )
+        }
+        return [
+            SearchHit(*rows[doc_id], scores[doc_id], matched[doc_id]) for doc_id in ranked if doc_id in rows
+        ]
+
+    def stats(self) -> dict[str, int]:
+        docs, postings = self.conn.execute(
+            "SELECT (SELECT COUNT(*) FROM docs), (SELECT COUNT(*) FROM postings)"
+        ).fetchone()
+        return {"docs": docs, "postings": postings}
+
+
+_default_index: SearchIndex | None = None
+_default_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """プロセス共通のSearchIndexを返す。"""
+
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                _default_index = SearchIndex()
+    return _default_index
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import html
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from tokens import estimate_tokens
+
+_TIMING_REGEX = re.compile(
+    r"^\s*((?:\d+:)?\d{1,2}:\d{2}[,.]\d{3})\s*-->\s*((?:\d+:)?\d{1,2}:\d{2}[,.]\d{3})"
+)
+_TAG_REGEX = re.compile(r"<[^>]*>")
+_TIMESTAMP_REGEX = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{3})")
+
+# ローリング表示のキューは前のキューの終わりと重なるか、すぐ続けて始まる。これより間が空いていれば
+# 別の発話とみなし、前のキューと同じ言葉で始まっていても削らない
+ROLLING_MAX_GAP = 0.1
+
+
+class Cue(NamedTuple):
+    """字幕1キュー。`text`は複数行のキューを改行でつないだもの。時刻は秒。"""
+
+    index: int
+    start: float
+    end: float
+    text: str
+
+
+@dataclass
+class DedupStats:
+    """ローリング字幕の重複除去でどれだけ削れたかの集計。"""
+
+    cues: int = 0
+    kept_cues: int = 0
+    original_tokens: int = 0
+    kept_tokens: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.kept_tokens
+
+
+def parse_timestamp(value: str) -> float:
+    """`HH:MM:SS,mmm`（SRT）または`[HH:]MM:SS.mmm`（VTT）を秒に変換する。"""
+
+    hours, minutes, seconds, millis = _TIMESTAMP_REGEX.match(value).groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+def iter_cues(lines: Iterable[str]) -> Iterator[Cue]:
+    """SRT/VTTの行イテレータから字幕キューを順に返す。
+
+    ファイル全体を読み込まず1行ずつ処理する。複数行のキューはすべての行を保持し、
+    VTTのヘッダー・NOTEブロック・キュー識別子・書式タグは取り除く。
+
+    Args:
+        lines (Iterable[str]): 字幕ファイルの行（ファイルオブジェクトをそのまま渡せる）。
+
+    Yields:
+        Cue: 字幕キュー。
+    """
+
+    index: int | None = None
+    start: float | None = None
+    end = 0.0
+    text_lines: list[str] = []
+    count = 0
+
+    def make_cue() -> Cue:
+        return Cue(index if index is not None else count, start, end, "\n".join(text_lines))
+
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            if start is not None:
+                count += 1
+                if text_lines:
+                    yield make_cue()
+                start, index, text_lines = None, None, []
+            continue
+
+        timing = _TIMING_REGEX.match(line)
+        if timing:
+            if start is not None and text_lines:
+                # 空行なしで次のキューが始まった場合
+                count += 1
+                yield make_cue()
+            start = parse_timestamp(timing[1])
+            end = parse_timestamp(timing[2])
+            text_lines = []
+            continue
+
+        if start is None:
+            # タイミング行より前：SRTの番号、VTTのヘッダー・NOTE・識別子
+            if line.isdigit():
+                index = int(line)
+            continue
+
+        if "<" in line:
+            line = _TAG_REGEX.sub("", line).strip()
+        text = html.unescape(line) if "&" in line else line
+        if text:
+            text_lines.append(text)
+
+    if start is not None and text_lines:
+        count += 1
+        yield make_cue()
+
+
+def _overlap(previous: list[str], current: list[str]) -> int:
+    for size in range(min(len(previous), len(current)), 0, -1):
+        if previous[-size:] == current[:size]:
+            return size
+    return 0
+
+
+def dedupe_rolling(cues: Iterable[Cue], stats: DedupStats | None = None) -> Iterator[Cue]:
+    """YouTube自動字幕のローリング表示による重複を取り除く。
+
+    自動字幕は前のキューの行を繰り返しながら1行ずつ流れていくので、
+    直前のキュー末尾と重なる先頭行と、伸びていく行の既出部分を削って新しい部分だけを残す。
+    削るのは直前のキューと時間が重なるか`ROLLING_MAX_GAP`秒以内に続くキューだけで、
+    間を置いて同じ言葉を繰り返した字幕はそのまま残す。
+
+    Args:
+        cues (Iterable[Cue]): `iter_cues`の出力。
+        stats (DedupStats | None): 渡すと削減量を集計する。
+
+    Yields:
+        Cue: 新しいテキストだけを持つキュー（新しい部分がないキューは出さない）。
+    """
+
+    stats = stats if stats is not None else DedupStats()
+    previous: list[str] = []
+    previous_end = 0.0
+    for cue in cues:
+        current = cue.text.split("\n")
+        stats.cues += 1
+        stats.original_tokens += estimate_tokens(cue.text)
+
+        if cue.start - previous_end > ROLLING_MAX_GAP:
+            previous = []  # 間が空いた別の発話なので、前のキューとの重なりは見ない
+        size = _overlap(previous, current)
+        fresh = current[size:]
+        if size == 0 and fresh and previous and fresh[0].startswith(previous[-1]):
+            # 同じ行が伸びていくタイプ：既出の先頭部分を削る
+            fresh[0] = fresh[0][len(previous[-1]):].strip()
+        previous = current
+        previous_end = cue.end
+
+        fresh = [line for line in fresh if line]
+        if not fresh:
+            continue
+        text = "\n".join(fresh)
+        stats.kept_cues += 1
+        stats.kept_tokens += estimate_tokens(text)
+        yield cue._replace(text=text)
+
+
+def load_transcript(path: Path, dedupe: bool = True) -> tuple[list[str], DedupStats]:
+    """字幕ファイルを1キュー1行のテキストに変換する。
+
+    Args:
+        path (Path): SRT/VTTファイル。
+        dedupe (bool): ローリング字幕の重複を取り除くか。
+
+    Returns:
+        tuple[list[str], DedupStats]: キューごとのテキスト（キュー内の改行は空白に置換）と削減量。
+    """
+
+    stats = DedupStats()
+    with path.open(encoding="utf-8-sig") as f:
+        cues: Iterable[Cue] = iter_cues(f)
+        if dedupe:
+            cues = dedupe_rolling(cues, stats)
+        lines = [cue.text.replace("\n", " ") for cue in cues]
+    if not dedupe:
+        stats.cues = stats.kept_cues = len(lines)
+        stats.original_tokens = stats.kept_tokens = sum(estimate_tokens(line) for line in lines)
+    return lines, stats
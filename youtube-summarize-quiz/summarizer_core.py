@@ -1,11 +1,28 @@
 from pathlib import Path
-import yt_dlp
 import re
 import json
 from dotenv import load_dotenv
-from google import genai
 import os
 import json
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Sequence
+
+from async_engine import AsyncSummarizeEngine, SummaryJob
+from caption_fetcher import CaptionFetcher, slim_info
+from caption_manifest import CAPTION_DIR, PendingCaption, mark_summarized, scan_captions
+from chunked_summary import DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, summarize_transcript
+import common_setup  # noqa: F401  共有パッケージcommonを読み込めるようにする
+from common.gemini_client import get_client, get_client_manager
+from common.llm_cache import get_llm_cache, make_key
+from pipeline_progress import CancelCheck, ProgressCallback, ProgressTracker
+import quiz_batch
+from quiz_batch import AVOID_QUESTIONS_PROMPT, SINGLE_QUIZ_PROMPT, qa_pairs
+from quiz_store import get_quiz_store, source_key
+from common.resilience import get_resilience
+from srt_parser import load_transcript
+from common.telemetry import record_call
+from video_store import Video, VideoStore, extract_video_id, get_video_store, replace_chars, watch_url
 
 def load_gemini_api_key():
     """GEMINI_API_KEYを.envから読み込む。
@@ -18,44 +35,217 @@ def load_gemini_api_key():
     gemini_api_key = os.getenv("GEMINI_API_KEY")
     return gemini_api_key
 
-def LLM_gen(contents: str) -> str:
+DEFAULT_MODEL = "gemini-2.5-flash"
+SUMMARY_DIR = Path(__file__).parent / "summary"
+
+def LLM_gen(contents: str, model: str = DEFAULT_MODEL, use_cache: bool = True, stage: str = "summary") -> str:
     """Geminiを使って文章を生成する。
 
+    同じモデル・プロンプトの応答はディスクキャッシュから返し、APIを呼ばない。
+    429・503などの一時的な失敗は共通のResilience（バックオフ・AIMD・ブレーカー）で送り直す。
+    呼び出しごとのレイテンシ・トークン数・キャッシュ状態・リトライ回数はtelemetryに記録する。
+
     Args:
         contents (str): Geminiに渡す完全なプロンプト。
+        model (str): 使用するモデル名。
+        use_cache (bool): Falseならキャッシュを参照せず必ずAPIを呼ぶ（結果は保存する）。
+        stage (str): telemetryに記録する呼び出し元（summary / quiz など）。
 
     Returns:
         str: 生成結果として返されるテキスト。
     """
 
-    client = genai.Client()
+    start = time.perf_counter()
+    cache = get_llm_cache()
+    key = make_key(model, contents)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            record_call(stage, model, time.perf_counter() - start, cache="hit")
+            return cached
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash", 
-        contents= contents
+    client = get_client()
+
+    try:
+        response, retries = get_resilience().call(
+            lambda: client.models.generate_content(
+                model=model,
+                contents= contents
+            )
+        )
+    except Exception:
+        record_call(stage, model, time.perf_counter() - start, cache=_cache_status(use_cache), status="error")
+        raise
+    record_call(
+        stage, model, time.perf_counter() - start, response.usage_metadata, _cache_status(use_cache), retries=retries
     )
-    return response.text
+    text = response.text
+    if text:
+        cache.put(key, text)
+    return text
+
+def _cache_status(use_cache: bool) -> str:
+    return "miss" if use_cache else "bypass"
+
+def LLM_gen_stream(
+    contents: str, model: str = DEFAULT_MODEL, use_cache: bool = True, stage: str = "summary"
+) -> Iterator[str]:
+    """Geminiのストリーミング生成で、届いた順に部分テキストを返す。
 
-def replace_chars(s: str) -> str:
-    """ファイル名に使えない文字を安全な文字へ置換する。
+    キャッシュにある場合は全文を1回でyieldする。最後まで受信できた応答だけを保存する。
+    最初のチャンクまでの時間（TTFT）と全体の時間をtelemetryに記録する。
 
     Args:
-        s (str): 元のタイトルやファイル名候補。
+        contents (str): Geminiに渡す完全なプロンプト。
+        model (str): 使用するモデル名。
+        use_cache (bool): Falseならキャッシュを参照せず必ずAPIを呼ぶ。
+        stage (str): telemetryに記録する呼び出し元。
+
+    Yields:
+        str: 生成された部分テキスト。
+    """
+
+    start = time.perf_counter()
+    cache = get_llm_cache()
+    key = make_key(model, contents)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            elapsed = time.perf_counter() - start
+            record_call(stage, model, elapsed, cache="hit", ttft=elapsed)
+            yield cached
+            return
+
+    parts: list[str] = []
+    ttft: float | None = None
+    usage = None
+    # 最初のチャンクが届く前の失敗だけを送り直す
+    stream = get_resilience().stream(
+        lambda: get_client().models.generate_content_stream(model=model, contents=contents)
+    )
+    try:
+        for chunk in stream:
+            # usage_metadataは最後のチャンクに累計値が入る
+            usage = chunk.usage_metadata or usage
+            text = chunk.text
+            if text:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(text)
+                yield text
+    except Exception:
+        record_call(stage, model, time.perf_counter() - start, usage, _cache_status(use_cache), "error", ttft=ttft)
+        raise
+    record_call(
+        stage, model, time.perf_counter() - start, usage, _cache_status(use_cache), retries=stream.retries, ttft=ttft
+    )
+    if parts:
+        cache.put(key, "".join(parts))
+
+async def LLM_gen_async(
+    contents: str, model: str = DEFAULT_MODEL, use_cache: bool = True, stage: str = "summary"
+) -> str:
+    """`LLM_gen`の非同期版。Geminiの非同期クライアント（`client.aio`）を使う。
+
+    共有イベントループ（`GeminiClientManager.run_coroutine`）上で実行すること。
+
+    Args:
+        contents (str): Geminiに渡す完全なプロンプト。
+        model (str): 使用するモデル名。
+        use_cache (bool): Falseならキャッシュを参照せず必ずAPIを呼ぶ。
+        stage (str): telemetryに記録する呼び出し元。
 
     Returns:
-        str: 危険文字を除去した文字列。
+        str: 生成結果として返されるテキスト。
     """
 
-    remove_chars = '\\/:*?"<>|￥＜＞｜'  # 削除対象文字
-    table = str.maketrans({ch: '-' for ch in remove_chars})
-    s2 = s.translate(table)
-    s3 = s2.replace(" ","")
-    return s3
-# TODO:srtファイルを削除したときにjsonファイルのdoneを全てfalseに修正する関数
+    start = time.perf_counter()
+    cache = get_llm_cache()
+    key = make_key(model, contents)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            record_call(stage, model, time.perf_counter() - start, cache="hit")
+            return cached
+
+    try:
+        response, retries = await get_resilience().acall(
+            lambda: get_client().aio.models.generate_content(model=model, contents=contents)
+        )
+    except Exception:
+        record_call(stage, model, time.perf_counter() - start, cache=_cache_status(use_cache), status="error")
+        raise
+    record_call(
+        stage, model, time.perf_counter() - start, response.usage_metadata, _cache_status(use_cache), retries=retries
+    )
+    text = response.text
+    if text:
+        cache.put(key, text)
+    return text
+
+
+SUMMARY_PROMPT = (
+    "以下はyoutube動画の文字お越しをした文章です。"
+    "要約してください。"
+    "ただし、出力はMarkdown形式のみで行い、"
+    "要約に関係ない説明文や前置きは一切書かないでください。"
+    "見出し・箇条書きを適宜使って整理してください。\n\n"
+)
+
+@dataclass
+class UrlRegistration:
+    """URL1件分の登録結果。
+
+    `status`は added（新規登録）/ exists（登録済み）/ duplicate（同じ入力内で既出）/ invalid（YouTubeのURLでない）。
+    """
+
+    url: str
+    video_id: str | None
+    status: str
+
+
+def register_urls(urls: Iterable[str], store: VideoStore | None = None) -> list[UrlRegistration]:
+    """YouTube URLをまとめて動画レジストリに登録する。
+
+    watch?v= / youtu.be / shorts などの形式を動画IDに正規化し、入力内の重複は除いてから
+    1トランザクションで登録する。URLは正規の視聴URLに揃えて保存する。
+
+    Args:
+        urls (Iterable[str]): 登録するURL（空行は無視する）。
+        store (VideoStore | None): 登録先。省略時はプロセス共通のストア。
+
+    Returns:
+        list[UrlRegistration]: 入力順のURLごとの結果。
+    """
+
+    results: list[UrlRegistration] = []
+    seen: dict[str, None] = {}  # 入力順を保った集合
+    for url in urls:
+        url = url.strip()
+        if not url:
+            continue
+        video_id = extract_video_id(url)
+        if video_id is None:
+            results.append(UrlRegistration(url, None, "invalid"))
+        elif video_id in seen:
+            results.append(UrlRegistration(url, video_id, "duplicate"))
+        else:
+            seen[video_id] = None
+            results.append(UrlRegistration(url, video_id, "exists"))
+
+    store = store or get_video_store()
+    added = set(store.add_many((video_id, watch_url(video_id)) for video_id in seen))
+    for result in results:
+        if result.status == "exists" and result.video_id in added:
+            result.status = "added"
+    return results
+
 
-YT_LINKS_PATH = Path(__file__).parent / "youtube_links.json"
 def save_json(url: str) -> bool:
-    """YouTube URLをJSONに追記する（既知ならスキップ）。
+    """YouTube URLを動画レジストリに登録する（既知ならスキップ）。
+
+    旧実装ではyoutube_links.jsonへ追記していたため関数名はそのまま残している。
+    複数のURLは`register_urls`でまとめて登録する。
 
     Args:
         url (str): 保存対象のYouTube動画URL。
@@ -64,147 +254,149 @@ def save_json(url: str) -> bool:
         bool: バリデーション成功でTrue、URLが不正な場合はFalse。
     """
 
-    # 簡易的なバリデーション
-    _YT_REGEX = re.compile(r"^(?:https?://)?(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)([\w\-]{11})(?:$|[&#?])")
-    match = _YT_REGEX.search(url.strip())
-    if not match:
+    result = register_urls([url])
+    if not result or result[0].status == "invalid":
         print(f"Invalid YouTube URL")
         return False
+    if result[0].status == "added":
+        print(f"登録しました video_id={result[0].video_id!r}")
     else:
-        print(f"問題なし")
-        video_id = match.group(1)
-    # JSON初期値で保存、既知のURLならスキップする
-    text = YT_LINKS_PATH.read_text(encoding='utf-8')
-    # print(text)
-    youtube_link = json.loads(text)
-    exist_flg = False
-    for var in youtube_link:
-        match = _YT_REGEX.search(var['url'].strip())
-        id = match.group(1)
-        if video_id == id:
-            print(f"{video_id=}")
-            print(f"{var['title']=}")
-            print(f"{var['url']=},{id=}")
-            exist_flg = True
-            break
-    if exist_flg:
-        print('save skip')
-        return True
-    
-    print('今から初期値で保存します')
-    add_url =  {
-        "url": url,
-        "done": False,
-        "title": None,
-        "LLM_gen": False
-    }
-    youtube_link.append(add_url)
-    text = json.dumps(youtube_link, ensure_ascii=False, indent=2)
-    YT_LINKS_PATH.write_text(text, encoding='utf-8')
+        print(f"save skip video_id={result[0].video_id!r}")
     return True
 
-def summarize_json() -> None:
-    """未処理のYouTubeリンクに対して字幕取得と要約生成を行う。
+def fetch_captions(
+    store: VideoStore,
+    max_workers: int = 4,
+    fetcher: CaptionFetcher | None = None,
+    progress: ProgressCallback | None = None,
+    cancelled: CancelCheck | None = None,
+) -> int:
+    """字幕未取得の動画について、メタデータと字幕を並列に取得する。
+
+    info辞書はレジストリに保存する。保存済みのinfoがあり字幕ファイルも残っている動画は
+    YouTubeに問い合わせずに取得済みとして扱う。
+
+    Args:
+        store (VideoStore): 動画レジストリ。
+        max_workers (int): 並列に取得するスレッド数。
+        fetcher (CaptionFetcher | None): 取得に使うフェッチャー（計測用に差し替え可能）。
+        progress (ProgressCallback | None): 1本終わるごとに呼ばれる進捗コールバック。
+        cancelled (CancelCheck | None): 中止要求を確認する関数。Trueならまだ始めていない動画は取得しない。
 
     Returns:
-        None: 処理結果はファイルシステム（captions/・summary/・JSON）に反映される。
+        int: 新たに字幕取得済みになった件数。
     """
 
-    # jsonファイルのパス設定
-    youtube_links_file_name = "youtube_links.json"
-    youtube_links_path = Path(youtube_links_file_name)
-    json_text = youtube_links_path.read_text(encoding="utf-8")
-    data = json.loads(json_text)
-    ydl_opts = {
-        "skip_download": True,
-        "writesubtitles": True,
-        "writeautomaticsub": True,
-        "subtitleslangs": ["ja"],     # 日本語字幕
-        "subtitlesformat": "srt",     # 形式
-        "outtmpl": "captions/%(title)s.%(ext)s" 
-    }
-    
-
-    # 文字お越しの読み込み
-    for v in data:
-        print(v)
-        url = v['url']
-        done = v['done']
-        title = v['title']
-        
-        if done and title!=None:
-            print(f"文字お越し済み {title}")
+    pending: dict[str, Video] = {}
+    recovered = 0
+    for video in store.pending_captions():
+        info = store.get_info(video.video_id)
+        if info is not None and _caption_exists(info):
+            store.set_captioned(video.video_id, replace_chars(info['title']))
+            print(f"[CACHED] {video.url} {info['title']}")
+            recovered += 1
             continue
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ret = ydl.download([url])
-            info = ydl.extract_info(url, download=False)
-            title = info['title']
-            if ret == 0: # 成功した場合
-                v['done'] = True
-                v['title'] = title
-                print(f"[OK] {url} {title}")
-            else:
-                print(f"[FAIL] {url} {title}")
+        pending[video.video_id] = video
+    if not pending:
+        return recovered
+
+    tracker = ProgressTracker("fetch", len(pending), progress)
+
+    def _on_result(video_id: str, info: dict | None, error: Exception | None) -> None:
+        video = pending[video_id]
+        if error is not None:
+            print(f"[FAIL] {video.url} {error}")
+            tracker.advance(video.url)
+            return
+        with store.transaction():
+            store.save_info(video_id, slim_info(info))
+            store.set_captioned(video_id, replace_chars(info['title']))
+        print(f"[OK] {video.url} {info['title']}")
+        tracker.advance(info['title'])
+
+    fetcher = fetcher or CaptionFetcher(max_workers=max_workers)
+    items = ((v.video_id, v.url) for v in pending.values())
+    return recovered + fetcher.fetch_all(items, _on_result, cancelled)
+
+def _caption_exists(info: dict) -> bool:
+    subtitles = info.get('requested_subtitles') or {}
+    paths = [sub.get('filepath') for sub in subtitles.values() if isinstance(sub, dict)]
+    return any(path and Path(path).exists() for path in paths)
+
+def summarize_json(
+    concurrency: int = 4,
+    rpm: int | None = None,
+    tpm: int | None = None,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    fetch_workers: int = 4,
+    progress: ProgressCallback | None = None,
+    cancelled: CancelCheck | None = None,
+) -> int:
+    """未処理のYouTubeリンクに対して字幕取得と要約生成を行う。
+
+    要約は非同期エンジンで最大`concurrency`件を同時に生成する。
+    `chunk_tokens`を超える長い文字起こしはキュー境界で分割してmap-reduceで要約する。
+    中止は動画単位で行い、処理中の動画は最後まで終えてから止まる。
+
+    Args:
+        concurrency (int): 同時に投げる要約リクエスト数。
+        rpm (int | None): 1分あたりのリクエスト上限。Noneなら無制限。
+        tpm (int | None): 1分あたりの入力トークン上限。Noneなら無制限。
+        chunk_tokens (int): 1回の要約に入れる文字起こしの推定トークン数の上限。
+        overlap_tokens (int): 分割したチャンク同士で重ねるトークン数。
+        fetch_workers (int): 字幕を並列に取得するスレッド数。
+        progress (ProgressCallback | None): 動画1本の取得・要約が終わるごとに呼ばれる進捗コールバック。
+        cancelled (CancelCheck | None): 中止要求を確認する関数。
 
-    youtube_links_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    Returns:
+        int: 要約を保存した件数。処理結果はファイルシステム（captions/・summary/）と動画レジストリに反映される。
+    """
+
+    store = get_video_store()
+    fetch_captions(store, max_workers=fetch_workers, progress=progress, cancelled=cancelled)
+    if cancelled is not None and cancelled():
+        return 0
 
-    # パス設定
-    caption_dir= Path('captions')
-    summary_dir = Path('summary')
+    # パス設定（cronなど別のカレントディレクトリから実行しても同じ場所を使う）
+    caption_dir = CAPTION_DIR
+    summary_dir = SUMMARY_DIR
     summary_dir.mkdir(exist_ok=True)
 
-    json_text = youtube_links_path.read_text(encoding="utf-8")
-    data = json.loads(json_text)
-    # print(data)
-
-    # 正規表現を使いtextの抽出とLLMによる要約
-    text_pattern = r"\d\n.*\n(.*)\n"
-    for p in caption_dir.iterdir():
-        # print(p)
-        p_str = str(p)
-        title_pattern = r"captions\\(.*).ja.srt"
-        print(p_str)
-        try:
-            title = re.search(title_pattern, p_str)[1] # タイトル部分の抽出
-        except TypeError as e:
-            print(f"error:{e}")
-            continue
-        title = replace_chars(title) # 危険文字の変換
-
-        text = p.read_text(encoding='utf-8') # 
-        matchs = re.findall(text_pattern, text)
-        text = '\n'.join(matchs)
-        contents= (
-            "以下はyoutube動画の文字お越しをした文章です。"
-            "要約してください。"
-            "ただし、出力はMarkdown形式のみで行い、"
-            "要約に関係ない説明文や前置きは一切書かないでください。"
-            "見出し・箇条書きを適宜使って整理してください。\n\n"
-            + text
+    # マニフェストで変更・未要約の字幕だけを選び、ストリーミングで字幕を解析する
+    jobs: list[SummaryJob] = []
+    captions: dict[str, PendingCaption] = {}
+    for caption in scan_captions(store, caption_dir):
+        lines, stats = load_transcript(caption.path)
+        print(
+            f"{caption.path} cues={stats.cues}->{stats.kept_cues} "
+            f"tokens={stats.original_tokens}->{stats.kept_tokens} (saved {stats.saved_tokens})"
         )
-        
-        LLM_gen_flg = False
-        name_match_flg = False
-        for v in data:
-            # print(v['title'])
-            v['title'] = replace_chars(v['title'])
-            if title == v['title']:
-                LLM_gen_flg = v['LLM_gen']
-                print(f"titleが一致 : {title } : {LLM_gen_flg=}")
-                name_match_flg = True
-                
-                if LLM_gen_flg==True:
-                    print(f"要約済みです : {title}")
-                else:
-                    v['LLM_gen'] = True
-                    res = LLM_gen(contents)
-                    print(f"{title},{res=}")
-                
-                    file_name = summary_dir / f"{title}.md"
-                    file_name.write_text(res,encoding='utf-8')
-        if not name_match_flg:
-            print(title)
-    youtube_links_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+        captions[caption.video_id] = caption
+        jobs.append(SummaryJob(caption.video_id, '\n'.join(lines)))
+
+    tracker = ProgressTracker("summarize", len(jobs), progress)
+
+    # 1件終わるごとに要約ファイルとレジストリへ反映する（途中で止まっても完了分は残る）
+    def _commit(job: SummaryJob, res: str | None, error: Exception | None) -> None:
+        caption = captions[job.key]
+        if error is not None:
+            print(f"{caption.title} 要約失敗：{error}")
+            tracker.advance(caption.title)
+            return
+        file_name = summary_dir / f"{caption.title}.md"
+        file_name.write_text(res, encoding='utf-8')
+        mark_summarized(store, caption, file_name)
+        print(f"{file_name}要約成功")
+        tracker.advance(caption.title)
+
+    engine = AsyncSummarizeEngine(LLM_gen_async, concurrency=concurrency, rpm=rpm, tpm=tpm)
+
+    async def _summarize(job: SummaryJob) -> str:
+        cues = job.contents.split('\n')
+        return await summarize_transcript(cues, engine.call, SUMMARY_PROMPT, chunk_tokens, overlap_tokens)
+
+    return get_client_manager().run_coroutine(engine.run(jobs, _commit, _summarize, cancelled))
 
 def _parse_json_payload(payload: str) -> list[dict[str, str]]:
     """GeminiレスポンスからJSON配列をベストエフォートで抽出する。
@@ -244,12 +436,13 @@ def _parse_json_payload(payload: str) -> list[dict[str, str]]:
 
     return []
 
-def make_quiz(markdown_text: str, n: int) -> list[tuple[str, str]]:
+def make_quiz(markdown_text: str, n: int, avoid: Sequence[str] = ()) -> list[tuple[str, str]]:
     """要約MarkdownからGemini経由でクイズを生成する。
 
     Args:
         markdown_text (str): クイズの根拠となるMarkdown本文。
         n (int): 生成したい設問ペアの数。
+        avoid (Sequence[str]): 出題済みの問題文。これらと重ならない問題を作らせる。
 
     Returns:
         list[tuple[str, str]]: 最大`n`件の(Question, Answer)タプル。
@@ -259,142 +452,107 @@ def make_quiz(markdown_text: str, n: int) -> list[tuple[str, str]]:
     if not markdown or n <= 0:
         return []
 
-    prompt = (
-        "以下のMarkdown形式の文章を読んで、その内容を理解しているか確認する日本語のクイズを"
-        f"{n}問作成してください。"
-        "各出力要素はJSON形式で、キーは必ず'Q'と'A'のみを使用し、値に問題文と解答を入れてください。"
-        "問題は文章中の事実や要点に基づき、単純な言い換えではなく理解度を確かめる内容にしてください。"
-        "JSON以外の余計な文字列やコードフェンスは出力しないでください。"
-        "\n\n[Markdown]\n"
-        f"{markdown}\n"
-    )
+    prompt = SINGLE_QUIZ_PROMPT.format(n=n) + f"{markdown}\n"
+    if avoid:
+        prompt += AVOID_QUESTIONS_PROMPT.format(questions="\n".join(f"- {q}" for q in avoid))
 
-    raw_response = LLM_gen(prompt)
+    raw_response = LLM_gen(prompt, stage="quiz")
 
 
     quiz_items = _parse_json_payload(raw_response)
 
-    qa_list: list[tuple[str, str]] = []
-    for qa in quiz_items:
-        if not isinstance(qa, dict):
-            continue
-        question = qa.get("Q")
-        answer = qa.get("A")
-        if not question or not answer:
-            continue
-        qa_list.append((str(question).strip(), str(answer).strip()))
-        if len(qa_list) >= n:
-            break
+    qa_list = qa_pairs(quiz_items, n)
     print(qa_list)
     return qa_list
 
-    
+def make_quiz_batch(docs: dict[str, str], n_per_doc: int) -> dict[str, list[tuple[str, str]]]:
+    """複数の要約Markdownのクイズをまとめて生成する。
 
-# # youtubeの読み込み
-# jsonファイルの読み込み
-def app():
-    """コマンドラインから全文書き起こしと要約生成を行う補助関数。
+    トークン予算に収まる分の要約を1リクエストに詰め、文書IDをキーにしたJSONで受け取って
+    文書ごとに分ける。検証に失敗した文書だけ`make_quiz`で1件ずつ生成し直す。
+
+    Args:
+        docs (dict[str, str]): 文書ID（ファイル名など）→Markdown本文。
+        n_per_doc (int): 文書ごとの設問数。
 
     Returns:
-        None: 入出力はファイル更新と標準出力ログで確認する。
+        dict[str, list[tuple[str, str]]]: 文書ID→最大`n_per_doc`件の(Question, Answer)タプル。
     """
 
-    youtube_links_file_name = "youtube_links.json"
-    youtube_links_path = Path(youtube_links_file_name)
-    # if not youtube_links_path.exists():
-    #     raise 
-    json_text = youtube_links_path.read_text(encoding="utf-8")
-    data = json.loads(json_text)
-
-    ydl_opts = {
-        "skip_download": True,
-        "writesubtitles": True,
-        "writeautomaticsub": True,
-        "subtitleslangs": ["ja"],     # 日本語字幕
-        "subtitlesformat": "srt",     # 形式
-        "outtmpl": "captions/%(title)s.%(ext)s" 
-    }
-
-    # 文字お越しの読み込み
-    for v in data:
-        print(v)
-        url = v['url']
-        done = v['done']
-        title = v['title']
-        
-        if done and title!=None:
-            print(f"文字お越し済み {title}")
-            continue
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ret = ydl.download([url])
-            info = ydl.extract_info(url, download=False)
-            title = info['title']
-            if ret == 0: # 成功した場合
-                v['done'] = True
-                v['title'] = title
-                print(f"[OK] {url} {title}")
-            else:
-                print(f"[FAIL] {url} {title}")
+    return quiz_batch.make_quiz_batch(
+        docs,
+        n_per_doc,
+        generate=lambda prompt: LLM_gen(prompt, stage="quiz-batch"),
+        fallback=make_quiz,
+    )
 
-    youtube_links_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+def quiz_pending(
+    n_per_doc: int = 10,
+    batch_size: int = 20,
+    progress: ProgressCallback | None = None,
+    cancelled: CancelCheck | None = None,
+) -> int:
+    """要約済みでクイズ未生成の動画について、要約からクイズを作って問題バンクに保存する。
 
-    # パス設定
-    caption_dir= Path('captions')
-    summary_dir = Path('summary')
-    summary_dir.mkdir(exist_ok=True)
-    # if not caption_path.is_dir():
-    #     raise
+    `batch_size`本ずつ`make_quiz_batch`でまとめて生成し、保存してから次へ進むので、
+    途中で止めても生成済みの分は残る。GUIで既に問題を作った要約は生成せず済みにする。
 
-    # gemini api keyの読み込み
-    load_dotenv()
-    gemini_api_key = os.getenv("GEMINI_API_KEY")
+    Args:
+        n_per_doc (int): 動画ごとの設問数。
+        batch_size (int): 1回の`make_quiz_batch`に渡す要約の数。
+        progress (ProgressCallback | None): 動画1本分のクイズを保存するごとに呼ばれる進捗コールバック。
+        cancelled (CancelCheck | None): 中止要求を確認する関数。Trueなら次のバッチに進まない。
 
-    json_text = youtube_links_path.read_text(encoding="utf-8")
-    data = json.loads(json_text)
-    # print(data)
-
-    # 正規表現を使いtextの抽出とLLMによる要約
-    text_pattern = r"\d\n.*\n(.*)\n"
-    for p in caption_dir.iterdir():
-        # print(p)
-        p_str = str(p)
-        title_pattern = r"captions\\(.*).ja.srt"
-        title = re.search(title_pattern, p_str)[1] # タイトル部分の抽出
-        title = replace_chars(title) # 危険文字の変換
-
-        text = p.read_text(encoding='utf-8') # 
-        matchs = re.findall(text_pattern, text)
-        text = '\n'.join(matchs)
-        contents= (
-            "以下はyoutube動画の文字お越しをした文章です。"
-            "要約してください。"
-            "ただし、出力はMarkdown形式のみで行い、"
-            "要約に関係ない説明文や前置きは一切書かないでください。"
-            "見出し・箇条書きを適宜使って整理してください。\n\n"
-            + text
-        )
-        
-        LLM_gen_flg = False
-        name_match_flg = False
-        for v in data:
-            # print(v['title'])
-            v['title'] = replace_chars(v['title'])
-            if title == v['title']:
-                LLM_gen_flg = v['LLM_gen']
-                print(f"titleが一致 : {title } : {LLM_gen_flg=}")
-                name_match_flg = True
-                
-                if LLM_gen_flg==True:
-                    print(f"要約済みです : {title}")
-                else:
-                    v['LLM_gen'] = True
-                    res = LLM_gen(contents)
-                    print(f"{title},{res=}")
-                
-                    file_name = summary_dir / f"{title}.md"
-                    file_name.write_text(res,encoding='utf-8')
-        if not name_match_flg:
-            print(title)
-    youtube_links_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    Returns:
+        int: クイズを保存した動画の件数。
+    """
 
+    store = get_video_store()
+    quiz_store = get_quiz_store()
+    summary_dir = SUMMARY_DIR
+    docs: dict[str, str] = {}
+    videos: dict[str, str] = {}
+    missing = 0
+    for video in store.pending_quizzes():
+        path = summary_dir / f"{video.title}.md"
+        if not path.is_file():
+            missing += 1
+            continue
+        markdown = path.read_text(encoding='utf-8')
+        source = source_key(path)
+        if quiz_store.get(source, markdown):
+            store.set_quizzed(video.video_id)
+            continue
+        docs[source] = markdown
+        videos[source] = video.video_id
+    if missing:
+        print(f"[SKIP] {summary_dir}/に要約ファイルがない動画 {missing}件")
+
+    tracker = ProgressTracker("quiz", len(docs), progress)
+    sources = list(docs)
+    done = 0
+    for i in range(0, len(sources), batch_size):
+        if cancelled is not None and cancelled():
+            break
+        batch = {source: docs[source] for source in sources[i:i + batch_size]}
+        for source, pairs in make_quiz_batch(batch, n_per_doc).items():
+            if pairs:
+                quiz_store.add(source, batch[source], pairs)
+                store.set_quizzed(videos[source])
+                print(f"{source} クイズ{len(pairs)}問を保存")
+                done += 1
+            else:
+                print(f"{source} クイズ生成失敗")
+            tracker.advance(source)
+    return done
+    
+
+def app():
+    """コマンドラインから全文書き起こしと要約生成を行う補助関数。
+
+    Returns:
+        None: 入出力はファイル更新と標準出力ログで確認する。
+    """
 
+    load_gemini_api_key()
+    summarize_json()
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import math
+import re
+
+_NON_WORD_REGEX = re.compile(r"[\W_]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """文章のトークン数をAPIを呼ばずに概算する。
+
+    Geminiのトークナイザでは日本語はおおむね1〜1.5文字、英語は約4文字で1トークンになる。
+    レート制限や分割サイズの見積もりに使う値なので、多めに見積もる側に倒している。
+
+    Args:
+        text (str): 対象の文章。
+
+    Returns:
+        int: 推定トークン数。
+    """
+
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    other_chars = len(text) - ascii_chars
+    return math.ceil(ascii_chars / 4 + other_chars)
+
+
+def char_ngrams(text: str, n: int = 2) -> list[str]:
+    """記号と空白を除いた文字n-gramの列。日本語は単語の区切りがないので文字単位で扱う。
+
+    Args:
+        text (str): 対象の文章。
+        n (int): n-gramの文字数。
+
+    Returns:
+        list[str]: 出現順のn-gram（重複を含む）。`n`文字未満の文章はそのまま1要素にする。
+    """
+
+    normalized = _NON_WORD_REGEX.sub("", text.lower())
+    if len(normalized) < n:
+        return [normalized] if normalized else []
+    return [normalized[i:i + n] for i in range(len(normalized) - n + 1)]
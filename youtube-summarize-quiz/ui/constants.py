@@ -6,3 +6,4 @@ SUMMARY_DIR = Path(__file__).resolve().parent.parent / "summary"
 SUMMARIZE_STR = "要約画面"
 MARKDOWN_PREVIEW_STR = "Markdownプレビュー"
 YOUTUBE_SUMMARIZE_STR = "youtube要約"
+STATS_STR = "LLM統計"
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import fnmatch
+import os
+from pathlib import Path
+
+from PySide6 import QtCore
+
+
+class DirectoryWatcher(QtCore.QObject):
+    """Track the files matching ``pattern`` in ``directory`` with QFileSystemWatcher.
+
+    Changes are coalesced for a short moment and reported as the names that were
+    added or removed, so views can update incrementally instead of re-listing.
+    ``fileChanged`` reports in-place edits of files registered with ``watch_file``.
+    If the directory does not exist yet its parent is watched until it appears.
+    """
+
+    filesAdded = QtCore.Signal(list)
+    filesRemoved = QtCore.Signal(list)
+    fileChanged = QtCore.Signal(str)
+
+    def __init__(self, directory: Path, pattern: str = "*", parent: QtCore.QObject | None = None):
+        super().__init__(parent)
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self._names: set[str] = set()
+        self._watched_file: str | None = None
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(100)
+        self._timer.timeout.connect(self._rescan)
+        self._watcher.directoryChanged.connect(lambda _path: self._timer.start())
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._watch_directory()
+
+    def names(self) -> list[str]:
+        """Current matching file names, sorted."""
+
+        return sorted(self._names)
+
+    def rescan(self) -> list[str]:
+        """Re-list the directory now and return all names (no add/remove signals)."""
+
+        self._watch_directory()
+        self._names = self._list()
+        return self.names()
+
+    def watch_file(self, path: Path | None) -> None:
+        """Watch a single file (e.g. the one being previewed) for in-place edits."""
+
+        if self._watched_file is not None:
+            self._watcher.removePath(self._watched_file)
+            self._watched_file = None
+        if path is not None and Path(path).exists():
+            self._watched_file = str(path)
+            self._watcher.addPath(self._watched_file)
+
+    # ---- internal ---------------------------------------------------
+    def _watch_directory(self) -> None:
+        target = self.directory if self.directory.is_dir() else self.directory.parent
+        if str(target) not in self._watcher.directories():
+            if self._watcher.directories():
+                self._watcher.removePaths(self._watcher.directories())
+            if target.is_dir():
+                self._watcher.addPath(str(target))
+
+    def _list(self) -> set[str]:
+        try:
+            with os.scandir(self.directory) as entries:
+                return {e.name for e in entries if e.is_file() and fnmatch.fnmatch(e.name, self.pattern)}
+        except OSError:
+            return set()
+
+    def _rescan(self) -> None:
+        self._watch_directory()
+        names = self._list()
+        added = sorted(names - self._names)
+        removed = sorted(self._names - names)
+        self._names = names
+        if removed:
+            self.filesRemoved.emit(removed)
+        if added:
+            self.filesAdded.emit(added)
+
+    def _on_file_changed(self, path: str) -> None:
+        # Editors that save by rename drop the path from the watcher; re-add it.
+        if path == self._watched_file and Path(path).exists() and path not in self._watcher.files():
+            self._watcher.addPath(path)
+        self.fileChanged.emit(path)
@@ -1,31 +1,47 @@
 from __future__ import annotations
 
+import bisect
 from typing import Iterable
 
 from PySide6 import QtCore, QtWidgets
 
-from ui.widgets import QAItem, clear_layout
+from ui.widgets import QuizListView
+
+_QUIZ_BUTTON_TEXT = "選択Markdownからクイズ生成 (10問)"
 
 
 class MarkdownPreviewPage(QtWidgets.QWidget):
     fileSelected = QtCore.Signal(str)
     quizRequested = QtCore.Signal(str)
+    searchRequested = QtCore.Signal(str)
+    searchHitSelected = QtCore.Signal(str)
 
     def __init__(self, parent: QtWidgets.QWidget | None = None):
         super().__init__(parent)
         self.file_list = QtWidgets.QListWidget()
+        self.search_edit = QtWidgets.QLineEdit()
+        self.search_results = QtWidgets.QListWidget()
+        self._search_timer = QtCore.QTimer(self)
         self.md_viewer = QtWidgets.QTextBrowser()
-        self.md_quiz_btn = QtWidgets.QPushButton("選択Markdownからクイズ生成 (10問)")
+        self.md_quiz_btn = QtWidgets.QPushButton(_QUIZ_BUTTON_TEXT)
         self.md_quiz_progress = QtWidgets.QProgressBar()
-        self.md_quiz_scroll = QtWidgets.QScrollArea()
-        self.md_quiz_container = QtWidgets.QWidget()
-        self.md_quiz_layout = QtWidgets.QVBoxLayout(self.md_quiz_container)
+        self.md_quiz_list = QuizListView()
         self.current_markdown_content = ""
         self._build_ui()
 
     def _build_ui(self) -> None:
         self.file_list.itemClicked.connect(self._on_file_clicked)
 
+        self.search_edit.setPlaceholderText("検索（要約・字幕・問題集）")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self._on_search_text_changed)
+        # 入力のたびに検索しないよう少し待ってからまとめて検索する
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        self._search_timer.timeout.connect(self._emit_search)
+        self.search_results.itemClicked.connect(self._on_search_hit_clicked)
+        self.search_results.setVisible(False)
+
         self.md_viewer.setOpenExternalLinks(True)
         self.md_viewer.setPlaceholderText("summary フォルダの Markdown をプレビュー表示")
 
@@ -35,15 +51,13 @@ class MarkdownPreviewPage(QtWidgets.QWidget):
         self.md_quiz_progress.setRange(0, 0)
         self.md_quiz_progress.setVisible(False)
 
-        self.md_quiz_scroll.setWidgetResizable(True)
-        self.md_quiz_layout.setContentsMargins(4, 4, 4, 4)
-        self.md_quiz_layout.setSpacing(6)
-        self.md_quiz_scroll.setWidget(self.md_quiz_container)
-        self.md_quiz_scroll.setVisible(False)
+        self.md_quiz_list.setVisible(False)
 
         left = QtWidgets.QVBoxLayout()
         left.addWidget(QtWidgets.QLabel("Summary フォルダ内ファイル"))
+        left.addWidget(self.search_edit)
         left.addWidget(self.file_list, 1)
+        left.addWidget(self.search_results, 1)
 
         preview_panel = QtWidgets.QWidget()
         preview_layout = QtWidgets.QVBoxLayout(preview_panel)
@@ -58,7 +72,7 @@ class MarkdownPreviewPage(QtWidgets.QWidget):
         quiz_layout.setSpacing(6)
         quiz_layout.addWidget(self.md_quiz_btn)
         quiz_layout.addWidget(self.md_quiz_progress)
-        quiz_layout.addWidget(self.md_quiz_scroll, 1)
+        quiz_layout.addWidget(self.md_quiz_list, 1)
 
         splitter = QtWidgets.QSplitter(QtCore.Qt.Orientation.Vertical)
         splitter.setHandleWidth(6)
@@ -83,10 +97,47 @@ class MarkdownPreviewPage(QtWidgets.QWidget):
         for name in filenames:
             self.file_list.addItem(name)
 
-    def set_markdown_content(self, content: str) -> None:
+    def add_files(self, filenames: Iterable[str]) -> None:
+        """Insert names into the (sorted) file list without rebuilding it."""
+
+        names = [self.file_list.item(i).text() for i in range(self.file_list.count())]
+        for name in filenames:
+            index = bisect.bisect_left(names, name)
+            if index < len(names) and names[index] == name:
+                continue
+            names.insert(index, name)
+            self.file_list.insertItem(index, name)
+
+    def remove_files(self, filenames: Iterable[str]) -> None:
+        for name in filenames:
+            for item in self.file_list.findItems(name, QtCore.Qt.MatchFlag.MatchExactly):
+                self.file_list.takeItem(self.file_list.row(item))
+
+    def set_search_results(self, hits: Iterable[tuple[str, str]] | None) -> None:
+        """Show ``(label, path)`` hits in place of the file list; None restores the list."""
+
+        self.search_results.clear()
+        if hits is None:
+            self.search_results.setVisible(False)
+            self.file_list.setVisible(True)
+            return
+        for label, path in hits:
+            item = QtWidgets.QListWidgetItem(label)
+            item.setData(QtCore.Qt.ItemDataRole.UserRole, path)
+            item.setToolTip(path)
+            self.search_results.addItem(item)
+        self.file_list.setVisible(False)
+        self.search_results.setVisible(True)
+
+    def set_markdown_content(self, content: str, html: str | None = None) -> None:
+        """Show ``content``; pass pre-rendered ``html`` to skip markdown parsing here."""
+
         self.current_markdown_content = content
         if content:
-            self.md_viewer.setMarkdown(content)
+            if html is None:
+                self.md_viewer.setMarkdown(content)
+            else:
+                self.md_viewer.setHtml(html)
             self.md_quiz_btn.setEnabled(True)
         else:
             self.md_viewer.clear()
@@ -98,17 +149,27 @@ class MarkdownPreviewPage(QtWidgets.QWidget):
         self.md_quiz_progress.setVisible(busy)
 
     def populate_quiz(self, qa_pairs: list[tuple[str, str]]) -> None:
-        clear_layout(self.md_quiz_layout)
-        for question, answer in qa_pairs:
-            self.md_quiz_layout.addWidget(QAItem(question, answer))
-        if qa_pairs:
-            self.md_quiz_layout.addStretch(1)
-        self.md_quiz_scroll.setVisible(bool(qa_pairs))
+        self.md_quiz_list.set_pairs(qa_pairs)
+        self.md_quiz_btn.setText("さらに10問生成" if qa_pairs else _QUIZ_BUTTON_TEXT)
+        self.md_quiz_list.setVisible(bool(qa_pairs))
 
     # ---- internal slots --------------------------------------------
     def _on_file_clicked(self, item: QtWidgets.QListWidgetItem) -> None:
         self.fileSelected.emit(item.text())
 
+    def _on_search_text_changed(self, text: str) -> None:
+        if text.strip():
+            self._search_timer.start()
+        else:
+            self._search_timer.stop()
+            self.searchRequested.emit("")
+
+    def _emit_search(self) -> None:
+        self.searchRequested.emit(self.search_edit.text().strip())
+
+    def _on_search_hit_clicked(self, item: QtWidgets.QListWidgetItem) -> None:
+        self.searchHitSelected.emit(item.data(QtCore.Qt.ItemDataRole.UserRole))
+
     def _on_quiz_clicked(self) -> None:
         if not self.current_markdown_content.strip():
             QtWidgets.QMessageBox.information(self, "情報", "Markdownを選択してください。")
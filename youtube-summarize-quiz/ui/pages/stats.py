@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from PySide6 import QtCore, QtWidgets
+
+_COLUMNS = ("stage", "calls", "cache hits", "errors", "p50 (s)", "p95 (s)", "prompt tokens", "response tokens")
+
+
+class StatsPage(QtWidgets.QWidget):
+    """Per-stage LLM latency and token usage collected by telemetry."""
+
+    refreshRequested = QtCore.Signal()
+
+    def __init__(self, parent: QtWidgets.QWidget | None = None):
+        super().__init__(parent)
+        self.table = QtWidgets.QTableWidget(0, len(_COLUMNS))
+        self.refresh_btn = QtWidgets.QPushButton("更新")
+        self.prometheus_view = QtWidgets.QPlainTextEdit()
+        self._build_ui()
+
+    def _build_ui(self) -> None:
+        self.table.setHorizontalHeaderLabels(list(_COLUMNS))
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+
+        self.prometheus_view.setReadOnly(True)
+        self.prometheus_view.setPlaceholderText("Prometheus text format")
+
+        self.refresh_btn.clicked.connect(self.refreshRequested.emit)
+
+        top = QtWidgets.QHBoxLayout()
+        top.addWidget(QtWidgets.QLabel("LLM呼び出し統計（ステージ別）"))
+        top.addStretch(1)
+        top.addWidget(self.refresh_btn)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(top)
+        layout.addWidget(self.table, 2)
+        layout.addWidget(QtWidgets.QLabel("Prometheus"))
+        layout.addWidget(self.prometheus_view, 1)
+
+    # ---- public API -------------------------------------------------
+    def set_summary(self, summary: dict[str, dict[str, object]], prometheus_text: str) -> None:
+        self.table.setRowCount(len(summary))
+        for row, (stage, stats) in enumerate(summary.items()):
+            values = (
+                stage,
+                stats["count"],
+                stats["cache_hits"],
+                stats["errors"],
+                f"{stats['p50']:.2f}",
+                f"{stats['p95']:.2f}",
+                stats["prompt_tokens"],
+                stats["response_tokens"],
+            )
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QtWidgets.QTableWidgetItem(str(value)))
+        self.prometheus_view.setPlainText(prometheus_text)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from PySide6 import QtCore, QtWidgets
+from PySide6 import QtCore, QtGui, QtWidgets
 
 
 class SummarizePage(QtWidgets.QWidget):
@@ -57,6 +57,12 @@ class SummarizePage(QtWidgets.QWidget):
         self.btn.setEnabled(not busy)
         self.progress.setVisible(busy)
 
+    def append_chunk(self, text: str) -> None:
+        cursor = self.output_edit.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(text)
+        self.output_edit.ensureCursorVisible()
+
     def show_result(self, payload: str) -> None:
         self.output_edit.setPlainText(payload)
 
@@ -1,35 +1,46 @@
 from __future__ import annotations
 
-from PySide6 import QtCore, QtWidgets
+from PySide6 import QtCore, QtGui, QtWidgets
 
-from ui.widgets import QAItem, clear_layout
+from pipeline_progress import PipelineProgress
+from ui.widgets import QuizListView
 
 
 class YouTubeSummarizePage(QtWidgets.QWidget):
-    urlSubmitted = QtCore.Signal(str)
+    urlsSubmitted = QtCore.Signal(list)
     summarizeRequested = QtCore.Signal()
+    cancelRequested = QtCore.Signal()
     quizRequested = QtCore.Signal()
 
     def __init__(self, parent: QtWidgets.QWidget | None = None):
         super().__init__(parent)
-        self.url_edit = QtWidgets.QLineEdit()
+        self.url_edit = QtWidgets.QPlainTextEdit()
         self.url_btn = QtWidgets.QPushButton("登録")
         self.summarize_btn = QtWidgets.QPushButton("要約開始")
         self.quiz_btn = QtWidgets.QPushButton("クイズ生成")
         self.quiz_progress = QtWidgets.QProgressBar()
-        self.quiz_scroll = QtWidgets.QScrollArea()
-        self.quiz_container = QtWidgets.QWidget()
-        self.quiz_layout = QtWidgets.QVBoxLayout(self.quiz_container)
+        self.pipeline_progress = QtWidgets.QProgressBar()
+        self.pipeline_label = QtWidgets.QLabel()
+        self.cancel_btn = QtWidgets.QPushButton("中止")
+        self.quiz_list = QuizListView()
         self._build_ui()
 
     def _build_ui(self) -> None:
         layout = QtWidgets.QVBoxLayout(self)
 
-        self.url_edit.setPlaceholderText("YouTubeのURLを入力してください")
+        self.url_edit.setPlaceholderText(
+            "YouTubeのURLを入力してください\n複数のURLは1行に1件ずつ貼り付けると一括で登録します（Ctrl+Enterで登録）"
+        )
+        self.url_edit.setLineWrapMode(QtWidgets.QPlainTextEdit.LineWrapMode.NoWrap)
+        self.url_edit.setTabChangesFocus(True)
+        submit = QtGui.QShortcut(QtGui.QKeySequence("Ctrl+Return"), self.url_edit)
+        submit.setContext(QtCore.Qt.ShortcutContext.WidgetShortcut)
+        submit.activated.connect(self._on_url_clicked)
 
         self.url_btn.clicked.connect(self._on_url_clicked)
         self.summarize_btn.clicked.connect(self._on_summarize_clicked)
         self.quiz_btn.clicked.connect(self._on_quiz_clicked)
+        self.cancel_btn.clicked.connect(self._on_cancel_clicked)
 
         self.quiz_progress.setRange(0, 0)
         self.quiz_progress.setVisible(False)
@@ -59,41 +70,79 @@ class YouTubeSummarizePage(QtWidgets.QWidget):
         url_layout.addLayout(btn_layout, 1)
         layout.addLayout(url_layout)
 
-        self.quiz_scroll.setWidgetResizable(True)
-        self.quiz_layout.setContentsMargins(4, 4, 4, 4)
-        self.quiz_layout.setSpacing(6)
-        self.quiz_scroll.setWidget(self.quiz_container)
-        self.quiz_scroll.setVisible(False)
+        pipeline_layout = QtWidgets.QHBoxLayout()
+        pipeline_layout.addWidget(self.pipeline_progress, 1)
+        pipeline_layout.addWidget(self.cancel_btn)
+        layout.addLayout(pipeline_layout)
+        layout.addWidget(self.pipeline_label)
+        self.set_pipeline_busy(False)
+
+        self.quiz_list.setVisible(False)
 
-        layout.addWidget(self.quiz_scroll, 4)
+        layout.addWidget(self.quiz_list, 4)
         layout.addStretch(1)
 
     # ---- public API -------------------------------------------------
     def clear_url(self) -> None:
         self.url_edit.clear()
 
+    def set_urls(self, urls: list[str]) -> None:
+        """Put ``urls`` back in the box, one per line (e.g. the ones that failed)."""
+
+        self.url_edit.setPlainText("\n".join(urls))
+
     def set_quiz_busy(self, busy: bool) -> None:
         self.quiz_btn.setEnabled(not busy)
         self.quiz_progress.setVisible(busy)
 
+    def set_pipeline_busy(self, busy: bool) -> None:
+        self.summarize_btn.setEnabled(not busy)
+        self.cancel_btn.setEnabled(busy)
+        self.pipeline_progress.setVisible(busy)
+        self.cancel_btn.setVisible(busy)
+        self.pipeline_label.setVisible(busy)
+        if busy:
+            self.pipeline_progress.setRange(0, 0)
+            self.pipeline_label.setText("準備中…")
+
+    def set_pipeline_progress(self, progress: PipelineProgress) -> None:
+        self.pipeline_progress.setRange(0, max(progress.total, 1))
+        self.pipeline_progress.setValue(progress.index)
+        self.pipeline_progress.setFormat(f"{progress.label} %v/%m")
+        text = f"{progress.label} {progress.index}/{progress.total}  経過 {_format_seconds(progress.elapsed)}"
+        if progress.eta is not None:
+            text += f"  残り約 {_format_seconds(progress.eta)}"
+        if progress.title:
+            text += f"  {progress.title}"
+        self.pipeline_label.setText(text)
+
+    def set_pipeline_cancelling(self) -> None:
+        self.cancel_btn.setEnabled(False)
+        self.pipeline_label.setText("処理中の動画が終わり次第中止します…")
+
     def populate_quiz(self, qa_pairs: list[tuple[str, str]]) -> None:
-        clear_layout(self.quiz_layout)
-        for question, answer in qa_pairs:
-            self.quiz_layout.addWidget(QAItem(question, answer))
-        if qa_pairs:
-            self.quiz_layout.addStretch(1)
-        self.quiz_scroll.setVisible(bool(qa_pairs))
+        self.quiz_list.set_pairs(qa_pairs)
+        self.quiz_btn.setText("さらに10問生成" if qa_pairs else "クイズ生成")
+        self.quiz_list.setVisible(bool(qa_pairs))
 
     # ---- internal slots --------------------------------------------
     def _on_url_clicked(self) -> None:
-        url = self.url_edit.text().strip()
-        if not url:
+        urls = self.url_edit.toPlainText().split()
+        if not urls:
             QtWidgets.QMessageBox.information(self, "error", "空です。")
             return
-        self.urlSubmitted.emit(url)
+        self.urlsSubmitted.emit(urls)
 
     def _on_summarize_clicked(self) -> None:
         self.summarizeRequested.emit()
 
+    def _on_cancel_clicked(self) -> None:
+        self.cancelRequested.emit()
+
     def _on_quiz_clicked(self) -> None:
         self.quizRequested.emit()
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes}:{secs:02d}"
@@ -1,43 +1,184 @@
 from __future__ import annotations
 
-from PySide6 import QtCore, QtWidgets
+from typing import Any, Sequence
 
+from PySide6 import QtCore, QtGui, QtWidgets
 
-class QAItem(QtWidgets.QWidget):
-    """Accordion-like widget displaying a question and its answer."""
 
-    def __init__(self, question: str, answer: str, parent: QtWidgets.QWidget | None = None):
+class QuizModel(QtCore.QAbstractListModel):
+    """Question/answer pairs plus which rows are expanded to show the answer."""
+
+    AnswerRole = QtCore.Qt.ItemDataRole.UserRole + 1
+    ExpandedRole = QtCore.Qt.ItemDataRole.UserRole + 2
+
+    def __init__(self, parent: QtCore.QObject | None = None):
         super().__init__(parent)
-        self.btn = QtWidgets.QToolButton()
-        self.btn.setText(question)
-        self.btn.setCheckable(True)
-        self.btn.setChecked(False)
-        self.btn.setToolButtonStyle(QtCore.Qt.ToolButtonTextOnly)
-        self.btn.setArrowType(QtCore.Qt.RightArrow)
-
-        self.ans = QtWidgets.QLabel(answer)
-        self.ans.setWordWrap(True)
-        self.ans.setVisible(False)
-
-        self.btn.toggled.connect(self._toggle)
-
-        layout = QtWidgets.QVBoxLayout(self)
-        layout.setContentsMargins(8, 6, 8, 6)
-        layout.addWidget(self.btn)
-        layout.addWidget(self.ans)
-
-    def _toggle(self, on: bool) -> None:
-        self.ans.setVisible(on)
-        self.btn.setArrowType(QtCore.Qt.DownArrow if on else QtCore.Qt.RightArrow)
-
-
-def clear_layout(layout: QtWidgets.QLayout) -> None:
-    """Remove all widgets from *layout* safely."""
-
-    while layout.count():
-        item = layout.takeAt(0)
-        if item is None:
-            continue
-        widget = item.widget()
-        if widget is not None:
-            widget.deleteLater()
+        self._pairs: list[tuple[str, str]] = []
+        self._expanded: set[int] = set()
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:  # noqa: B008
+        return 0 if parent.isValid() else len(self._pairs)
+
+    def data(self, index: QtCore.QModelIndex, role: int = QtCore.Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role in (QtCore.Qt.ItemDataRole.DisplayRole, QtCore.Qt.ItemDataRole.ToolTipRole):
+            return self._pairs[row][0]
+        if role == self.AnswerRole:
+            return self._pairs[row][1]
+        if role == self.ExpandedRole:
+            return row in self._expanded
+        return None
+
+    def set_pairs(self, qa_pairs: Sequence[tuple[str, str]]) -> None:
+        self.beginResetModel()
+        self._pairs = list(qa_pairs)
+        self._expanded = set()
+        self.endResetModel()
+
+    def toggle(self, row: int) -> None:
+        self._expanded ^= {row}
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [self.ExpandedRole])
+
+
+class QuizDelegate(QtWidgets.QStyledItemDelegate):
+    """Paint a quiz row as an arrow, the question and (when expanded) the answer.
+
+    Row heights depend on word wrapping, so they are cached per row and expanded
+    state for the current viewport width; the cache is dropped whenever the width
+    changes or the model is reset.
+    """
+
+    _MARGIN = 8
+    _ARROW = 12
+    _GAP = 6
+
+    def __init__(self, parent: QtCore.QObject | None = None):
+        super().__init__(parent)
+        self._sizes: dict[tuple[int, bool], QtCore.QSize] = {}
+        self._width = -1
+
+    def clear_cache(self) -> None:
+        self._sizes.clear()
+
+    def _text_width(self, width: int) -> int:
+        return max(width - 2 * self._MARGIN - self._ARROW - self._GAP, 40)
+
+    @staticmethod
+    def _question_font(option: QtWidgets.QStyleOptionViewItem) -> QtGui.QFont:
+        font = QtGui.QFont(option.font)
+        font.setBold(True)
+        return font
+
+    @staticmethod
+    def _text_height(font: QtGui.QFont, width: int, text: str) -> int:
+        rect = QtGui.QFontMetrics(font).boundingRect(
+            QtCore.QRect(0, 0, width, 1 << 20), QtCore.Qt.TextFlag.TextWordWrap, text
+        )
+        return rect.height()
+
+    def sizeHint(self, option: QtWidgets.QStyleOptionViewItem, index: QtCore.QModelIndex) -> QtCore.QSize:
+        view = option.widget
+        width = view.viewport().width() if isinstance(view, QtWidgets.QAbstractScrollArea) else option.rect.width()
+        if width != self._width:
+            # 幅ごとに全行分をためると、ウィンドウのリサイズのたびにキャッシュが増え続ける
+            self._sizes.clear()
+            self._width = width
+        expanded = bool(index.data(QuizModel.ExpandedRole))
+        key = (index.row(), expanded)
+        size = self._sizes.get(key)
+        if size is None:
+            text_width = self._text_width(width)
+            height = self._text_height(self._question_font(option), text_width, index.data())
+            if expanded:
+                height += self._GAP + self._text_height(option.font, text_width, index.data(QuizModel.AnswerRole))
+            size = self._sizes[key] = QtCore.QSize(width, height + 2 * self._MARGIN)
+        return size
+
+    def paint(
+        self, painter: QtGui.QPainter, option: QtWidgets.QStyleOptionViewItem, index: QtCore.QModelIndex
+    ) -> None:
+        opt = QtWidgets.QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        opt.text = ""
+        style = opt.widget.style() if opt.widget is not None else QtWidgets.QApplication.style()
+        style.drawControl(QtWidgets.QStyle.ControlElement.CE_ItemViewItem, opt, painter, opt.widget)
+
+        expanded = bool(index.data(QuizModel.ExpandedRole))
+        rect = option.rect.adjusted(self._MARGIN, self._MARGIN, -self._MARGIN, -self._MARGIN)
+        question_font = self._question_font(option)
+        line_height = QtGui.QFontMetrics(question_font).height()
+
+        arrow = QtWidgets.QStyleOption()
+        arrow.rect = QtCore.QRect(rect.left(), rect.top() + (line_height - self._ARROW) // 2, self._ARROW, self._ARROW)
+        arrow.palette = option.palette
+        arrow.state = option.state
+        style.drawPrimitive(
+            QtWidgets.QStyle.PrimitiveElement.PE_IndicatorArrowDown
+            if expanded
+            else QtWidgets.QStyle.PrimitiveElement.PE_IndicatorArrowRight,
+            arrow,
+            painter,
+            opt.widget,
+        )
+
+        text_rect = rect.adjusted(self._ARROW + self._GAP, 0, 0, 0)
+        role = (
+            QtGui.QPalette.ColorRole.HighlightedText
+            if option.state & QtWidgets.QStyle.StateFlag.State_Selected
+            else QtGui.QPalette.ColorRole.Text
+        )
+        painter.save()
+        painter.setPen(option.palette.color(role))
+        painter.setFont(question_font)
+        flags = QtCore.Qt.TextFlag.TextWordWrap | QtCore.Qt.AlignmentFlag.AlignLeft | QtCore.Qt.AlignmentFlag.AlignTop
+        question_height = self._text_height(question_font, text_rect.width(), index.data())
+        painter.drawText(text_rect, flags, index.data())
+        if expanded:
+            painter.setFont(option.font)
+            painter.drawText(
+                text_rect.adjusted(0, question_height + self._GAP, 0, 0), flags, index.data(QuizModel.AnswerRole)
+            )
+        painter.restore()
+
+
+class QuizListView(QtWidgets.QListView):
+    """Accordion-like quiz list; click a question (or press Space/Enter) to show its answer.
+
+    Only the rows in view are painted and no widget is created per question,
+    so thousands of items load and scroll as fast as ten.
+    """
+
+    def __init__(self, parent: QtWidgets.QWidget | None = None):
+        super().__init__(parent)
+        self.quiz_model = QuizModel(self)
+        self.quiz_delegate = QuizDelegate(self)
+        self.setModel(self.quiz_model)
+        self.setItemDelegate(self.quiz_delegate)
+        self.quiz_model.modelReset.connect(self.quiz_delegate.clear_cache)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setResizeMode(QtWidgets.QListView.ResizeMode.Adjust)
+        # 大量の行はイベントループを止めないよう少しずつレイアウトする
+        self.setLayoutMode(QtWidgets.QListView.LayoutMode.Batched)
+        self.setBatchSize(200)
+        self.setSpacing(2)
+        self.setMouseTracking(True)
+        self.clicked.connect(self._toggle)
+
+    def set_pairs(self, qa_pairs: Sequence[tuple[str, str]]) -> None:
+        self.quiz_model.set_pairs(qa_pairs)
+        self.scrollToTop()
+
+    def keyPressEvent(self, event: QtGui.QKeyEvent) -> None:
+        if event.key() in (QtCore.Qt.Key.Key_Space, QtCore.Qt.Key.Key_Return, QtCore.Qt.Key.Key_Enter):
+            index = self.currentIndex()
+            if index.isValid():
+                self._toggle(index)
+                return
+        super().keyPressEvent(event)
+
+    def _toggle(self, index: QtCore.QModelIndex) -> None:
+        self.quiz_model.toggle(index.row())
+        self.quiz_delegate.sizeHintChanged.emit(index)
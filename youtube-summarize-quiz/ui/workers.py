@@ -1,47 +1,177 @@
 from __future__ import annotations
 
-from PySide6 import QtCore
+import threading
+import time
+from pathlib import Path
 
-from summarizer_core import LLM_gen, make_quiz
+from PySide6 import QtCore, QtGui
+
+from preview_cache import PreviewCache
+from quiz_store import get_quiz_store
+from search_index import get_search_index
+from summarizer_core import LLM_gen, LLM_gen_stream, make_quiz, summarize_json
 
 
 class SummarizeWorker(QtCore.QRunnable):
-    """Run text summarization in a background thread."""
+    """Run text summarization in a background thread.
+
+    In streaming mode partial text is emitted through ``chunk`` as it arrives,
+    and ``timing`` reports time-to-first-token and total time in seconds.
+    """
 
     class Signals(QtCore.QObject):
+        chunk = QtCore.Signal(str)
+        timing = QtCore.Signal(float, float)
         finished = QtCore.Signal(str, str)
 
-    def __init__(self, text: str, max_sentences: int):
+    def __init__(self, text: str, max_sentences: int, streaming: bool = True):
         super().__init__()
         self.text = text
         self.max_sentences = max_sentences
+        self.streaming = streaming
         self.signals = SummarizeWorker.Signals()
 
     @QtCore.Slot()
     def run(self) -> None:
+        contents = "以下の文章を要約してください。" + self.text
+        start = time.perf_counter()
         try:
-            result = LLM_gen(contents="以下の文章を要約してください。" + self.text)
+            if self.streaming:
+                first_token: float | None = None
+                parts: list[str] = []
+                for piece in LLM_gen_stream(contents):
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    parts.append(piece)
+                    self.signals.chunk.emit(piece)
+                result = "".join(parts)
+            else:
+                result = LLM_gen(contents=contents)
+                first_token = None
+            total = time.perf_counter() - start
+            self.signals.timing.emit(total if first_token is None else first_token, total)
             self.signals.finished.emit("ok", result)
         except Exception as exc:  # noqa: BLE001
             self.signals.finished.emit("error", str(exc))
 
 
 class QuizWorker(QtCore.QRunnable):
-    """Generate quizzes from markdown without blocking the UI."""
+    """Generate quizzes from markdown without blocking the UI.
+
+    With a ``source`` the new questions are added to the quiz bank, avoiding the
+    ones already stored, and ``finished`` carries the whole stored set.
+    """
 
     class Signals(QtCore.QObject):
         finished = QtCore.Signal(str, object)
 
-    def __init__(self, markdown_text: str, num_questions: int):
+    def __init__(self, markdown_text: str, num_questions: int, source: str | None = None):
         super().__init__()
         self.markdown_text = markdown_text
         self.num_questions = num_questions
+        self.source = source
         self.signals = QuizWorker.Signals()
 
     @QtCore.Slot()
     def run(self) -> None:
         try:
-            qa_pairs = make_quiz(self.markdown_text, self.num_questions)
+            if self.source is None:
+                qa_pairs = make_quiz(self.markdown_text, self.num_questions)
+            else:
+                store = get_quiz_store()
+                stored = store.get(self.source, self.markdown_text)
+                new_pairs = make_quiz(self.markdown_text, self.num_questions, [q for q, _ in stored])
+                store.add(self.source, self.markdown_text, new_pairs)
+                qa_pairs = store.get(self.source, self.markdown_text)
             self.signals.finished.emit("ok", qa_pairs)
         except Exception as exc:  # noqa: BLE001
             self.signals.finished.emit("error", exc)
+
+
+class PipelineWorker(QtCore.QRunnable):
+    """Fetch captions and summarize registered videos off the UI thread.
+
+    ``progress`` carries a :class:`pipeline_progress.PipelineProgress` after each
+    video. ``cancel`` stops the run between videos; the video in flight finishes.
+    """
+
+    class Signals(QtCore.QObject):
+        progress = QtCore.Signal(object)
+        finished = QtCore.Signal(str, object)
+
+    def __init__(self, concurrency: int = 4):
+        super().__init__()
+        self.concurrency = concurrency
+        self._cancel = threading.Event()
+        self.signals = PipelineWorker.Signals()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @QtCore.Slot()
+    def run(self) -> None:
+        try:
+            saved = summarize_json(
+                concurrency=self.concurrency,
+                progress=self.signals.progress.emit,
+                cancelled=self._cancel.is_set,
+            )
+            self.signals.finished.emit("cancelled" if self.cancelled else "ok", saved)
+        except Exception as exc:  # noqa: BLE001
+            self.signals.finished.emit("error", exc)
+
+
+class IndexWorker(QtCore.QRunnable):
+    """Bring the on-disk search index up to date with changed files."""
+
+    class Signals(QtCore.QObject):
+        finished = QtCore.Signal(str, object)
+
+    def __init__(self):
+        super().__init__()
+        self.signals = IndexWorker.Signals()
+
+    @QtCore.Slot()
+    def run(self) -> None:
+        try:
+            self.signals.finished.emit("ok", get_search_index().refresh())
+        except Exception as exc:  # noqa: BLE001
+            self.signals.finished.emit("error", exc)
+
+
+def markdown_to_html(markdown: str) -> str:
+    """Render markdown the same way ``QTextBrowser.setMarkdown`` does, off the UI thread."""
+
+    document = QtGui.QTextDocument()
+    document.setMarkdown(markdown)
+    return document.toHtml()
+
+
+class RenderWorker(QtCore.QRunnable):
+    """Read and render a markdown file into ``cache`` in a background thread.
+
+    ``request_id`` is passed back so the caller can ignore results for files
+    the user has already clicked away from (they stay cached either way).
+    """
+
+    class Signals(QtCore.QObject):
+        finished = QtCore.Signal(int, str, object)
+
+    def __init__(self, request_id: int, path: Path, cache: PreviewCache):
+        super().__init__()
+        self.request_id = request_id
+        self.path = path
+        self.cache = cache
+        self.signals = RenderWorker.Signals()
+
+    @QtCore.Slot()
+    def run(self) -> None:
+        try:
+            preview = self.cache.load(self.path, markdown_to_html)
+            self.signals.finished.emit(self.request_id, "ok", preview)
+        except Exception as exc:  # noqa: BLE001
+            self.signals.finished.emit(self.request_id, "error", exc)
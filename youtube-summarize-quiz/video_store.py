@@ -0,0 +1,499 @@
+from __future__ import annotations
+
+import atexit
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from pipeline_journal import PipelineJournal
+
+YT_DB_PATH = Path(__file__).parent / "youtube_links.db"
+YT_LINKS_PATH = Path(__file__).parent / "youtube_links.json"
+
+# watch?v= / youtu.be / shorts / live / embed の各形式（m.・music.・www.付きも）
+YT_URL_REGEX = re.compile(
+    r"^(?:https?://)?(?:(?:www|m|music)\.)?"
+    r"(?:youtube\.com/(?:watch\?(?:[^#\s]*&)?v=|shorts/|live/|embed/)|youtube-nocookie\.com/embed/|youtu\.be/)"
+    r"([\w\-]{11})(?:$|[&#?/])"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id   TEXT PRIMARY KEY,
+    url        TEXT NOT NULL,
+    title      TEXT,
+    captioned  INTEGER NOT NULL DEFAULT 0,
+    summarized INTEGER NOT NULL DEFAULT 0,
+    quizzed    INTEGER NOT NULL DEFAULT 0,
+    added_at   REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_videos_title ON videos(title);
+CREATE INDEX IF NOT EXISTS idx_videos_captioned ON videos(captioned);
+CREATE INDEX IF NOT EXISTS idx_videos_summarized ON videos(summarized);
+CREATE INDEX IF NOT EXISTS idx_videos_quizzed ON videos(quizzed);
+CREATE TABLE IF NOT EXISTS video_info (
+    video_id   TEXT PRIMARY KEY REFERENCES videos(video_id),
+    info_json  TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS caption_manifest (
+    path              TEXT PRIMARY KEY,
+    size              INTEGER NOT NULL,
+    mtime_ns          INTEGER NOT NULL,
+    sha256            TEXT NOT NULL,
+    video_id          TEXT,
+    summary_path      TEXT,
+    summarized_sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_manifest_video ON caption_manifest(video_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def replace_chars(s: str) -> str:
+    """ファイル名に使えない文字を安全な文字へ置換する。
+
+    Args:
+        s (str): 元のタイトルやファイル名候補。
+
+    Returns:
+        str: 危険文字を除去した文字列。
+    """
+
+    remove_chars = '\\/:*?"<>|￥＜＞｜'  # 削除対象文字
+    table = str.maketrans({ch: '-' for ch in remove_chars})
+    s2 = s.translate(table)
+    s3 = s2.replace(" ","")
+    return s3
+
+
+def extract_video_id(url: str) -> str | None:
+    """YouTube URLから11桁の動画IDを取り出す。
+
+    Args:
+        url (str): YouTube動画のURL。
+
+    Returns:
+        str | None: 動画ID。YouTubeのURLとして解釈できなければNone。
+    """
+
+    match = YT_URL_REGEX.search(url.strip())
+    return match.group(1) if match else None
+
+
+def watch_url(video_id: str) -> str:
+    """動画IDから正規の視聴URLを作る。"""
+
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+@dataclass
+class Video:
+    """登録済み動画1件分の状態。"""
+
+    video_id: str
+    url: str
+    title: str | None
+    captioned: bool
+    summarized: bool
+    quizzed: bool
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Video":
+        return cls(
+            video_id=row["video_id"],
+            url=row["url"],
+            title=row["title"],
+            captioned=bool(row["captioned"]),
+            summarized=bool(row["summarized"]),
+            quizzed=bool(row["quizzed"]),
+        )
+
+
+@dataclass
+class ManifestEntry:
+    """字幕ファイル1つ分の記録。`summarized_sha256`は要約を作ったときの内容のハッシュ。"""
+
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    video_id: str | None = None
+    summary_path: str | None = None
+    summarized_sha256: str | None = None
+
+    @property
+    def summary_is_current(self) -> bool:
+        return self.summarized_sha256 is not None and self.summarized_sha256 == self.sha256
+
+
+class VideoStore:
+    """動画IDをキーにしたSQLiteの動画レジストリ。
+
+    字幕取得・要約・クイズ生成の各状態はインデックス付きの列で持つので、
+    未処理の動画だけを全件走査なしで取り出せる。接続はスレッドごとに張り、
+    WALモードで書き込み中も他スレッドから読めるようにしている。
+    `journal`を渡すと、動画の登録と状態の変化をコミット後にジャーナルへも追記する。
+    """
+
+    def __init__(self, db_path: Path = YT_DB_PATH, journal: PipelineJournal | None = None):
+        self.db_path = Path(db_path)
+        self.journal = journal
+        self._local = threading.local()
+        self.conn.executescript(_SCHEMA)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """1つのトランザクションとして実行する。例外時はロールバックする。
+
+        中で発生したジャーナルのイベントは一番外側のコミット後にまとめて追記し、
+        ロールバックしたときは捨てる。
+        """
+
+        conn = self.conn
+        if conn.in_transaction:
+            # 入れ子の場合は外側のトランザクションに含める
+            yield conn
+            return
+        queued: list[tuple[str, str, float, dict[str, Any]]] = []
+        self._local.journal_queue = queued
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            queued.clear()
+            raise
+        conn.execute("COMMIT")
+        for event, video_id, ts, fields in queued:
+            self._append_journal(event, video_id, ts, **fields)
+        queued.clear()
+
+    # ---- 登録 -------------------------------------------------------
+    def add(self, video_id: str, url: str) -> bool:
+        """動画を未処理状態で登録する。
+
+        Returns:
+            bool: 新規に登録した場合True、登録済みならFalse。
+        """
+
+        now = time.time()
+        with self.transaction() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO videos (video_id, url, added_at, updated_at)"
+                " VALUES (?, ?, ?, ?)",
+                (video_id, url, now, now),
+            )
+        if cur.rowcount > 0:
+            self._record("added", video_id, now, url=url)
+        return cur.rowcount > 0
+
+    def add_many(self, entries: Iterable[tuple[str, str]]) -> list[str]:
+        """複数の動画を1トランザクションで未処理状態として登録する。
+
+        Args:
+            entries (Iterable[tuple[str, str]]): (動画ID, URL)の組。
+
+        Returns:
+            list[str]: 新規に登録した動画ID（登録済みと重複は含まない）。
+        """
+
+        now = time.time()
+        added: list[tuple[str, str]] = []
+        with self.transaction() as conn:
+            for video_id, url in entries:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO videos (video_id, url, added_at, updated_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (video_id, url, now, now),
+                )
+                if cur.rowcount > 0:
+                    added.append((video_id, url))
+        for video_id, url in added:
+            self._record("added", video_id, now, url=url)
+        return [video_id for video_id, _ in added]
+
+    # ---- 参照 -------------------------------------------------------
+    def get(self, video_id: str) -> Video | None:
+        row = self.conn.execute("SELECT * FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        return Video.from_row(row) if row else None
+
+    def find_by_title(self, title: str) -> Video | None:
+        row = self.conn.execute("SELECT * FROM videos WHERE title = ?", (title,)).fetchone()
+        return Video.from_row(row) if row else None
+
+    def all(self) -> list[Video]:
+        rows = self.conn.execute("SELECT * FROM videos ORDER BY added_at").fetchall()
+        return [Video.from_row(row) for row in rows]
+
+    def pending_captions(self) -> list[Video]:
+        """字幕未取得（またはタイトル未取得）の動画を返す。"""
+
+        rows = self.conn.execute(
+            "SELECT * FROM videos WHERE captioned = 0 OR title IS NULL ORDER BY added_at"
+        ).fetchall()
+        return [Video.from_row(row) for row in rows]
+
+    def pending_summaries(self) -> list[Video]:
+        """字幕取得済みで要約がまだの動画を返す。"""
+
+        rows = self.conn.execute(
+            "SELECT * FROM videos WHERE captioned = 1 AND summarized = 0 ORDER BY added_at"
+        ).fetchall()
+        return [Video.from_row(row) for row in rows]
+
+    def pending_quizzes(self) -> list[Video]:
+        """要約済みでクイズがまだの動画を返す。"""
+
+        rows = self.conn.execute(
+            "SELECT * FROM videos WHERE summarized = 1 AND quizzed = 0 ORDER BY added_at"
+        ).fetchall()
+        return [Video.from_row(row) for row in rows]
+
+    def counts(self) -> dict[str, int]:
+        """全件数と各状態の件数を返す。"""
+
+        row = self.conn.execute(
+            "SELECT COUNT(*) AS total, SUM(captioned) AS captioned,"
+            " SUM(summarized) AS summarized, SUM(quizzed) AS quizzed FROM videos"
+        ).fetchone()
+        return {key: row[key] or 0 for key in ("total", "captioned", "summarized", "quizzed")}
+
+    # ---- 状態更新 ---------------------------------------------------
+    def _update(self, event: str, video_id: str, **fields: object) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        now = time.time()
+        with self.transaction() as conn:
+            cur = conn.execute(
+                f"UPDATE videos SET {assignments}, updated_at = ? WHERE video_id = ?",
+                (*fields.values(), now, video_id),
+            )
+        if cur.rowcount > 0:
+            self._record(event, video_id, now, **fields)
+
+    def set_captioned(self, video_id: str, title: str, captioned: bool = True) -> None:
+        self._update("captioned", video_id, title=title, captioned=int(captioned))
+
+    def set_summarized(self, video_id: str, summarized: bool = True) -> None:
+        self._update("summarized", video_id, summarized=int(summarized))
+
+    def set_quizzed(self, video_id: str, quizzed: bool = True) -> None:
+        self._update("quizzed", video_id, quizzed=int(quizzed))
+
+    # ---- ジャーナル -------------------------------------------------
+    def _record(self, event: str, video_id: str, ts: float, **fields: Any) -> None:
+        if self.journal is None:
+            return
+        if self.conn.in_transaction:
+            # 外側のトランザクションがまだコミットされていない。確定するまで追記を待つ
+            self._local.journal_queue.append((event, video_id, ts, fields))
+            return
+        self._append_journal(event, video_id, ts, **fields)
+
+    def _append_journal(self, event: str, video_id: str, ts: float, **fields: Any) -> None:
+        self.journal.append(event, video_id, ts, **fields)
+        if self.journal.needs_compaction:
+            self.journal.compact()
+
+    def sync_journal(self) -> int:
+        """起動時にジャーナルとデータベースを突き合わせる。
+
+        ジャーナルを使い始める前なら、現在のデータベースの内容を最初のスナップショットにする。
+        そうでなければジャーナルを再生し、データベースより新しい状態（データベースを消した・
+        古いバックアップに戻した場合など）を書き戻す。
+
+        Returns:
+            int: ジャーナルから復元した動画の件数。
+        """
+
+        if self.journal is None:
+            return 0
+        rows = {row["video_id"]: dict(row) for row in self.conn.execute("SELECT * FROM videos")}
+        if self.journal.is_empty:
+            for row in rows.values():
+                del row["video_id"]
+            self.journal.seed(rows)
+            return 0
+
+        videos, _ = self.journal.replay()
+        restored = 0
+        with self.transaction() as conn:
+            for video_id, state in videos.items():
+                row = rows.get(video_id)
+                if row is not None and row["updated_at"] >= state["updated_at"]:
+                    continue
+                merged = {**(row or {}), **state, "video_id": video_id}
+                if not merged.get("url"):
+                    continue
+                conn.execute(
+                    "INSERT INTO videos"
+                    " (video_id, url, title, captioned, summarized, quizzed, added_at, updated_at)"
+                    " VALUES (:video_id, :url, :title, :captioned, :summarized, :quizzed, :added_at, :updated_at)"
+                    " ON CONFLICT(video_id) DO UPDATE SET"
+                    " url = excluded.url, title = excluded.title, captioned = excluded.captioned,"
+                    " summarized = excluded.summarized, quizzed = excluded.quizzed, updated_at = excluded.updated_at",
+                    {"title": None, "captioned": 0, "summarized": 0, "quizzed": 0, **merged},
+                )
+                restored += 1
+        return restored
+
+    # ---- yt_dlpのinfo辞書 -------------------------------------------
+    def save_info(self, video_id: str, info: dict) -> None:
+        """取得済みのinfo辞書を保存する（次回以降の再問い合わせを避けるため）。"""
+
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO video_info (video_id, info_json, fetched_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(video_id) DO UPDATE SET"
+                " info_json = excluded.info_json, fetched_at = excluded.fetched_at",
+                (video_id, json.dumps(info, ensure_ascii=False, default=str), time.time()),
+            )
+
+    def get_info(self, video_id: str) -> dict | None:
+        row = self.conn.execute(
+            "SELECT info_json FROM video_info WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        return json.loads(row["info_json"]) if row else None
+
+    # ---- 字幕マニフェスト -------------------------------------------
+    def manifest_entries(self) -> dict[str, ManifestEntry]:
+        """パスをキーにした全マニフェストエントリを返す。"""
+
+        rows = self.conn.execute("SELECT * FROM caption_manifest").fetchall()
+        return {row["path"]: ManifestEntry(**dict(row)) for row in rows}
+
+    def upsert_manifest(self, entry: ManifestEntry) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO caption_manifest"
+                " (path, size, mtime_ns, sha256, video_id, summary_path, summarized_sha256)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET"
+                " size = excluded.size, mtime_ns = excluded.mtime_ns, sha256 = excluded.sha256,"
+                " video_id = excluded.video_id, summary_path = excluded.summary_path,"
+                " summarized_sha256 = excluded.summarized_sha256",
+                (
+                    entry.path,
+                    entry.size,
+                    entry.mtime_ns,
+                    entry.sha256,
+                    entry.video_id,
+                    entry.summary_path,
+                    entry.summarized_sha256,
+                ),
+            )
+
+    def remove_manifest(self, path: str) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM caption_manifest WHERE path = ?", (path,))
+
+    # ---- メタ情報 ---------------------------------------------------
+    def get_meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    # ---- 移行 -------------------------------------------------------
+    def migrate_json(self, json_path: Path = YT_LINKS_PATH) -> int:
+        """旧`youtube_links.json`の内容を一度だけ取り込む。
+
+        取り込み済みかどうかはmetaテーブルに記録するので、2回目以降は何もしない。
+        元のJSONファイルは削除せずに残す。タイトルは字幕ファイル名と突き合わせられるよう
+        `replace_chars`で正規化してから保存する。
+
+        Args:
+            json_path (Path): 旧形式のJSONファイル。
+
+        Returns:
+            int: 新たに登録した動画の件数。
+        """
+
+        if self.get_meta("json_migrated") or not json_path.exists():
+            return 0
+        entries = json.loads(json_path.read_text(encoding="utf-8"))
+        now = time.time()
+        migrated: list[str] = []
+        with self.transaction() as conn:
+            for entry in entries:
+                video_id = extract_video_id(entry.get("url", ""))
+                if video_id is None:
+                    continue
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO videos"
+                    " (video_id, url, title, captioned, summarized, added_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        video_id,
+                        entry["url"],
+                        replace_chars(entry["title"]) if entry.get("title") else None,
+                        int(bool(entry.get("done"))),
+                        int(bool(entry.get("LLM_gen"))),
+                        now,
+                        now,
+                    ),
+                )
+                if cur.rowcount > 0:
+                    migrated.append(video_id)
+            self.set_meta("json_migrated", str(json_path))
+        if not migrated or self.journal is None:
+            return len(migrated)
+        for row in self.conn.execute(
+            f"SELECT * FROM videos WHERE video_id IN ({','.join('?' * len(migrated))})", migrated
+        ):
+            self._record(
+                "migrated", row["video_id"], now,
+                url=row["url"], title=row["title"], captioned=row["captioned"], summarized=row["summarized"],
+            )
+        return len(migrated)
+
+
+_default_store: VideoStore | None = None
+_default_lock = threading.Lock()
+
+
+def get_video_store() -> VideoStore:
+    """プロセス共通のVideoStoreを返す。初回に旧JSONからの移行とジャーナルとの突き合わせも行う。"""
+
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                journal = PipelineJournal()
+                atexit.register(journal.close)
+                store = VideoStore(journal=journal)
+                restored = store.sync_journal()
+                if restored:
+                    print(f"ジャーナルから {restored} 件の状態を復元しました")
+                added = store.migrate_json()
+                if added:
+                    print(f"youtube_links.json から {added} 件を移行しました")
+                _default_store = store
+    return _default_store